@@ -4,31 +4,31 @@ Day 1: Hello Agent
 -------------------
 This is the simplest AI agent possible: 
 - Takes user input from the command line
-- Sends it to the OpenAI API
+- Sends it to the OpenAI API (through the shared, cached client in shared/llm.py)
 - Prints the model's response
 """
 
-from dotenv import load_dotenv
-load_dotenv()  # Load environment variables from .env file
 import os
-from openai import OpenAI
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.llm import get_client
+from shared.startup import load_env, run_agent, stream_chat
 
 def main():
-    # Load API key from environment variable
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    load_env(__file__)  # .env with OPENAI_API_KEY, if there is one
+    # Reads OPENAI_API_KEY from the environment; one pooled client per process
+    client = get_client()
 
     # Ask user for input
     user_input = input("You: ")
 
-    # Call OpenAI model
-    response = client.chat.completions.create(
+    # Call OpenAI model, printing the response as it arrives
+    stream_chat(
+        client,
         model="gpt-4o-mini",  # small + fast model
-        messages=[{"role": "user", "content": user_input}]
+        messages=[{"role": "user", "content": user_input}],
     )
 
-    # Print response
-    print("Agent:", response.choices[0].message.content.strip())
-
 
 if __name__ == "__main__":
-    main()
+    run_agent(__file__, main)
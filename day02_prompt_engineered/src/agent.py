@@ -7,18 +7,21 @@ Adds structured prompts:
 - Style: Responses are concise and structured
 - Constraints: Agent sticks to rules
 """
-from dotenv import load_dotenv
-load_dotenv()  # Load environment variables from .env file
 import os
-from openai import OpenAI
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.llm import get_client
+from shared.startup import load_env, run_agent, stream_chat
 
 def main():
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    load_env(__file__)  # .env with OPENAI_API_KEY, if there is one
+    client = get_client()
 
     user_input = input("You: ")
 
     # Define system + user messages for better control
-    response = client.chat.completions.create(
+    stream_chat(
+        client,
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": (
@@ -27,11 +30,9 @@ def main():
                 "Keep answers under 100 words."
             )},
             {"role": "user", "content": user_input}
-        ]
+        ],
     )
 
-    print("Agent:", response.choices[0].message.content.strip())
-
 
 if __name__ == "__main__":
-    main()
+    run_agent(__file__, main)
@@ -6,16 +6,18 @@ Now the agent can:
 - Take prompts directly from the command line
 - Be used as a small tool for quick queries
 - Keep the Day 2 structured behavior (AI coding tutor)
+- Stream the answer to the terminal as it is generated
 """
 
-from dotenv import load_dotenv
-load_dotenv()  # Load environment variables from .env file
 import os
 import sys
-from openai import OpenAI
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.llm import get_client
+from shared.startup import load_env, run_agent, stream_chat
 
 def main():
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    load_env(__file__)  # .env with OPENAI_API_KEY, if there is one
+    client = get_client()
 
     # Combine all command-line args into one prompt
     if len(sys.argv) > 1:
@@ -23,7 +25,8 @@ def main():
     else:
         user_input = input("You: ")
 
-    response = client.chat.completions.create(
+    stream_chat(
+        client,
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": (
@@ -31,11 +34,9 @@ def main():
                 "Explain answers in concise bullet points under 100 words."
             )},
             {"role": "user", "content": user_input}
-        ]
+        ],
     )
 
-    print("Agent:", response.choices[0].message.content.strip())
-
 
 if __name__ == "__main__":
-    main()
+    run_agent(__file__, main)
@@ -0,0 +1,61 @@
+# benchmarks/bench_eval.py
+"""
+Calculator evaluation throughput on templated expressions.
+Usage:
+  python benchmarks/bench_eval.py [--n 100000]
+  parse+walk   the old path: ast.parse and a recursive tree walk on every call
+  safe_eval    compiled once per distinct expression (LRU), then a Python call
+  eval_batch   one compiled expression over NumPy operand arrays
+"""
+
+import os, sys, ast, time, random, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.tools import OPS, safe_eval, eval_batch
+
+def _walk(node):   # the pre-compile evaluator, kept here as the baseline
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.UnaryOp):
+        return OPS[type(node.op)](_walk(node.operand))
+    if isinstance(node, ast.BinOp):
+        return OPS[type(node.op)](_walk(node.left), _walk(node.right))
+    raise ValueError(ast.dump(node))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=100000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    prices = [round(rng.uniform(1, 500), 2) for _ in range(args.n)]
+    qtys = [rng.randint(1, 40) for _ in range(args.n)]
+    template = "({p} * {q}) * 1.2 - ({p} * {q}) // 7 + 3 ** 2"
+    exprs = [template.format(p=p, q=q) for p, q in zip(prices, qtys)]
+    repeated = [exprs[i % 100] for i in range(args.n)]   # a working set that fits the LRU
+
+    rows = []
+    t0 = time.perf_counter()
+    baseline = [_walk(ast.parse(e, mode="eval").body) for e in exprs]
+    rows.append(("parse+walk, distinct", time.perf_counter() - t0))
+    t0 = time.perf_counter()
+    values = [safe_eval(e) for e in exprs]
+    rows.append(("safe_eval, distinct (compile each)", time.perf_counter() - t0))
+    t0 = time.perf_counter()
+    for e in repeated:
+        _walk(ast.parse(e, mode="eval").body)
+    rows.append(("parse+walk, 100 repeated", time.perf_counter() - t0))
+    t0 = time.perf_counter()
+    for e in repeated:
+        safe_eval(e)
+    rows.append(("safe_eval, 100 repeated (cached)", time.perf_counter() - t0))
+    t0 = time.perf_counter()
+    batch = eval_batch(template.format(p="p", q="q"), p=prices, q=qtys)
+    rows.append(("eval_batch, one pass", time.perf_counter() - t0))
+
+    assert values == baseline
+    assert max(abs(a - b) for a, b in zip(batch, baseline)) < 1e-6
+    for label, secs in rows:
+        print(f"{label:<36} {args.n / secs:>14,.0f} expr/s")
+
+if __name__ == "__main__":
+    main()
@@ -5,18 +5,19 @@ Day 4: Calculator Agent
 - Detect math queries
 - Use safe_eval tool for math
 - Fall back to LLM for everything else
+- The calculator path never loads dotenv, the LLM client or the OpenAI SDK
 """
-from dotenv import load_dotenv
-load_dotenv()  # Load environment variables from .env file
 import os
 import sys
-from openai import OpenAI
-from tools import safe_eval, looks_like_math
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.startup import load_env, run_agent, stream_chat
+from tools import safe_eval, looks_like_math, EvalLimitError
 
 MODEL = "gpt-4o-mini"  # fast & inexpensive
 
 def llm_reply(client, user_input: str) -> str:
-    resp = client.chat.completions.create(
+    return stream_chat(
+        client,
         model=MODEL,
         messages=[
             {"role": "system", "content": (
@@ -27,11 +28,8 @@ def llm_reply(client, user_input: str) -> str:
             {"role": "user", "content": user_input}
         ],
     )
-    return resp.choices[0].message.content.strip()
 
 def main():
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
     # prompt from CLI args or interactive
     if len(sys.argv) > 1:
         user_input = " ".join(sys.argv[1:])
@@ -46,11 +44,17 @@ def main():
         except ZeroDivisionError:
             print("Agent (calculator): Division by zero is undefined.")
             return
+        except EvalLimitError as e:
+            # a real calculation, just too big: the LLM would not do better
+            print(f"Agent (calculator): That calculation is too large to evaluate ({e}).")
+            return
         except ValueError:
             # fall through to LLM if math parsing fails
             pass
 
-    print("Agent:", llm_reply(client, user_input))
+    load_env(__file__)  # .env with OPENAI_API_KEY, if there is one
+    from shared.llm import get_client
+    llm_reply(get_client(), user_input)
 
 if __name__ == "__main__":
-    main()
+    run_agent(__file__, main)
@@ -3,10 +3,50 @@
 Safe arithmetic evaluator for the Calculator tool.
 Supports +, -, *, /, //, %, ** and parentheses, unary +/-, and floats/ints.
 Prevents access to names, attributes, calls, or imports.
+- compile_expr validates the AST once and turns it into a tree of closures (no
+  isinstance dispatch or re-parse per call); results are kept in an LRU keyed on
+  the whitespace-normalized expression.
+- eval_batch evaluates one expression over NumPy arrays of operand values
+  (declared names only, e.g. "price * qty") in a single vectorized pass.
+- Bounded cost: input length, AST size and depth are capped at compile time; ** and *
+  on ints check the result's bit length before computing, and every scalar evaluation
+  has a wall-clock budget. Anything over a limit raises EvalLimitError. eval_batch
+  runs without the budget: its cost is linear in the arrays the caller passes.
 """
 
 import ast
+import math
+import time
+import functools
 import operator as op
+from typing import Callable, Iterable, List, Optional, Tuple
+
+COMPILE_CACHE = 1024   # compiled expressions kept (LRU)
+MAX_CHARS = 2000       # longer input is rejected before parsing
+MAX_NODES = 256        # AST nodes per expression
+MAX_DEPTH = 64         # AST nesting
+MAX_BITS = 10_000      # int results (~3000 digits; str() refuses past 4300 digits anyway)
+TIME_BUDGET = 0.1      # seconds of evaluation per call
+
+class EvalLimitError(ArithmeticError):
+    """The expression is valid but too large or too costly to evaluate."""
+
+def _pow(a, b, deadline):
+    # a ** b has b * log2|a| bits; estimate before computing
+    if type(a) is int and type(b) is int and b > 0 and abs(a) > 1 and b * math.log2(abs(a)) > MAX_BITS:
+        raise EvalLimitError(f"result of {a.bit_length()}-bit ** {b} exceeds {MAX_BITS} bits")
+    if time.perf_counter() > deadline:
+        raise EvalLimitError(f"evaluation exceeded {TIME_BUDGET} s")
+    return a ** b
+
+def _mul(a, b, deadline):
+    if type(a) is int and type(b) is int and a.bit_length() + b.bit_length() > MAX_BITS:
+        raise EvalLimitError(f"product exceeds {MAX_BITS} bits")
+    if time.perf_counter() > deadline:
+        raise EvalLimitError(f"evaluation exceeded {TIME_BUDGET} s")
+    return a * b
+
+GUARDED = {ast.Pow: _pow, ast.Mult: _mul}   # ops whose cost grows with operand size
 
 # Allowed operators
 OPS = {
@@ -21,36 +61,129 @@ OPS = {
     ast.USub: op.neg,
 }
 
-def _eval(node):
-    if isinstance(node, ast.Num):              # py<3.8
-        return node.n
-    if isinstance(node, ast.Constant):         # numbers only
-        if isinstance(node.value, (int, float)):
-            return node.value
+# Closures take env = (operand values, deadline)
+
+def _build_constant(node, names, depth, seen):
+    if not isinstance(node.value, (int, float)):   # numbers only
         raise ValueError("Only numeric constants are allowed.")
-    if isinstance(node, ast.UnaryOp) and type(node.op) in OPS:
-        return OPS[type(node.op)](_eval(node.operand))
-    if isinstance(node, ast.BinOp) and type(node.op) in OPS:
-        left = _eval(node.left)
-        right = _eval(node.right)
-        return OPS[type(node.op)](left, right)
-    if isinstance(node, ast.Expr):
-        return _eval(node.value)
-    raise ValueError(f"Disallowed expression: {ast.dump(node)}")
+    if type(node.value) is int and node.value.bit_length() > MAX_BITS:
+        raise EvalLimitError(f"constant exceeds {MAX_BITS} bits")
+    value = node.value
+    return lambda env: value
+
+def _build_name(node, names, depth, seen):
+    if node.id not in names:
+        raise ValueError(f"Unknown name: {node.id}")
+    i = names.index(node.id)
+    return lambda env: env[0][i]
+
+def _build_unary(node, names, depth, seen):
+    if type(node.op) not in OPS:
+        raise ValueError(f"Disallowed operator: {type(node.op).__name__}")
+    f, operand = OPS[type(node.op)], _build(node.operand, names, depth + 1, seen)
+    return lambda env: f(operand(env))
+
+def _build_binop(node, names, depth, seen):
+    if type(node.op) not in OPS:
+        raise ValueError(f"Disallowed operator: {type(node.op).__name__}")
+    left, right = _build(node.left, names, depth + 1, seen), _build(node.right, names, depth + 1, seen)
+    guarded = GUARDED.get(type(node.op))
+    if guarded is not None:
+        return lambda env: guarded(left(env), right(env), env[1])
+    f = OPS[type(node.op)]
+    return lambda env: f(left(env), right(env))
+
+BUILDERS = {
+    ast.Constant: _build_constant,
+    ast.Name: _build_name,
+    ast.UnaryOp: _build_unary,
+    ast.BinOp: _build_binop,
+}
+
+def _build(node, names: Tuple[str, ...], depth: int = 0, seen: Optional[List[int]] = None) -> Callable:
+    """
+    Closure evaluating node; ValueError unless it is arithmetic on numbers and names.
+    seen is a one-item node counter shared by the whole build.
+    """
+    seen = seen if seen is not None else [0]
+    seen[0] += 1
+    if seen[0] > MAX_NODES:
+        raise EvalLimitError(f"expression has more than {MAX_NODES} nodes")
+    if depth > MAX_DEPTH:
+        raise EvalLimitError(f"expression nests deeper than {MAX_DEPTH}")
+    build = BUILDERS.get(type(node))
+    if build is None:
+        raise ValueError(f"Disallowed expression: {ast.dump(node)}")
+    return build(node, names, depth, seen)
+
+def _normalize(expr: str) -> str:
+    return " ".join(expr.split())
+
+@functools.lru_cache(maxsize=COMPILE_CACHE)
+def _compile(expr: str, names: Tuple[str, ...]) -> Tuple[Callable, Callable]:
+    """(closure tree taking env, scalar function with the TIME_BUDGET deadline)."""
+    try:
+        tree = ast.parse(expr, mode="eval")
+    except (RecursionError, MemoryError):
+        raise EvalLimitError("expression too complex to parse") from None
+    fn = _build(tree.body, names)
+    return fn, lambda *args: fn((args, time.perf_counter() + TIME_BUDGET))
+
+def _compiled(expr: str, names: Iterable[str]) -> Tuple[Tuple[Callable, Callable], Tuple[str, ...]]:
+    if len(expr) > MAX_CHARS:
+        raise EvalLimitError(f"expression longer than {MAX_CHARS} characters")
+    names = tuple(sorted(names))
+    if any(not n.isidentifier() or n.startswith("_") for n in names):
+        raise ValueError(f"Invalid operand names: {names}")
+    try:
+        return _compile(_normalize(expr), names), names
+    except (ValueError, SyntaxError) as e:
+        raise ValueError(f"Invalid expression: {e}") from None
+
+def compile_expr(expr: str, names: Iterable[str] = ()) -> Callable:
+    """
+    Validated, cached function for expr; its positional arguments are `names`
+    (sorted). Raises ValueError on invalid expressions, EvalLimitError on ones over
+    the size limits (the function itself raises it past MAX_BITS or TIME_BUDGET).
+    """
+    return _compiled(expr, names)[0][1]
 
 def safe_eval(expr: str) -> float:
     """
     Evaluate a simple arithmetic expression safely.
-    Raises ValueError on invalid expressions.
+    Raises ValueError on invalid expressions and EvalLimitError on too costly ones.
     """
+    fn = compile_expr(expr)
     try:
-        parsed = ast.parse(expr, mode="eval")
-        return _eval(parsed.body)
-    except ZeroDivisionError:
+        return fn()
+    except (ZeroDivisionError, EvalLimitError):
         raise
     except Exception as e:
         raise ValueError(f"Invalid expression: {e}")
 
+def eval_batch(expr: str, /, **operands):
+    """
+    Evaluate expr once over arrays: eval_batch("price * qty + 2", price=[...], qty=[...]).
+    Operands are broadcast as float64 arrays (no silent int64 wrap-around), so results
+    match safe_eval to float64 precision. Division by zero raises ZeroDivisionError and
+    overflow OverflowError, as in safe_eval, instead of producing inf/nan; underflow
+    rounds to 0.0, as Python floats do.
+    """
+    import numpy as np
+    (fn, _), names = _compiled(expr, operands)
+    values = tuple(np.asarray(operands[n], dtype=np.float64) for n in names)
+    try:
+        with np.errstate(divide="raise", over="raise", invalid="raise", under="ignore"):
+            # no deadline: one pass over large arrays may rightly outlast TIME_BUDGET
+            return np.asarray(fn((values, math.inf)), dtype=np.float64)
+    except FloatingPointError as e:
+        # x/0 -> "divide by zero ..."; 0/0 and x%0 -> "invalid value ... in divide/remainder"
+        if "divide by zero" in str(e) or str(e).endswith(("divide", "remainder")):
+            raise ZeroDivisionError(str(e)) from None
+        if "overflow" in str(e):
+            raise OverflowError(str(e)) from None
+        raise ValueError(f"Invalid expression: {e}") from None
+
 def looks_like_math(text: str) -> bool:
     """
     Heuristic: if the input contains digits and math operators.
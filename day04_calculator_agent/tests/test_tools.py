@@ -25,3 +25,66 @@ def test_looks_like_math():
     assert looks_like_math("What is 2+2?")
     assert looks_like_math("100 * 3")
     assert not looks_like_math("Explain lists in Python")
+
+def test_compiled_expressions_are_cached():
+    from src.tools import compile_expr
+    assert compile_expr("2 *  (3+4)") is compile_expr(" 2 * (3+4) ")
+    assert compile_expr("x * 2", ["x"])(21) == 42
+    assert safe_eval("0x10 + 1.5e1") == 31
+    with pytest.raises(ValueError):
+        safe_eval("x + 1")                              # names only when declared
+    with pytest.raises(ValueError):
+        compile_expr("__class__", ["__class__"])
+    with pytest.raises(ValueError):
+        safe_eval("(1).real")
+    with pytest.raises(ValueError):
+        safe_eval("'a' * 3")
+
+def test_eval_batch_matches_scalar_eval():
+    import numpy as np
+    from src.tools import eval_batch
+    price, qty = np.array([1.5, 2.0, -3.0]), np.array([4, 5, 6])
+    out = eval_batch("price * qty + 10 // 3 - -qty % 4 ** 2", price=price, qty=qty)
+    expected = [safe_eval(f"{p} * {q} + 10 // 3 - -{q} % 4 ** 2") for p, q in zip(price, qty)]
+    assert out.tolist() == expected
+    assert eval_batch("x / 2", x=3).tolist() == 1.5   # scalars broadcast too
+    tiny = ["1e-200 * 1e-200", "1e-300 / 1e100", "5e-324 / 2"]   # underflow gives 0.0, as in Python
+    assert eval_batch("x * y", x=[1e-200, 1e-300], y=[1e-200, 1e-100]).tolist() == \
+        [safe_eval(tiny[0]), safe_eval(tiny[1])]
+    assert eval_batch("x / 2", x=5e-324).tolist() == safe_eval(tiny[2])
+    assert eval_batch("expr * 2", expr=[1]).tolist() == [2.0]       # any operand name, even expr
+    with pytest.raises(ZeroDivisionError):
+        eval_batch("x / y", x=[1, 2], y=[1, 0])
+    with pytest.raises(ZeroDivisionError):
+        eval_batch("x % y", x=[1], y=[0])
+    with pytest.raises(ValueError):
+        eval_batch("x + y", x=[1])
+    with pytest.raises(ValueError):
+        eval_batch("__import__('os')", x=[1])
+
+def test_costly_expressions_fail_fast(monkeypatch):
+    import time
+    from src import tools
+    from src.tools import EvalLimitError
+    assert safe_eval("2**9999") == 2 ** 9999
+    assert safe_eval("(" * 100 + "1" + ")" * 100) == 1        # parentheses add no AST depth
+    for expr in ["9**9**9", "10**4000", "(2**6000)*(2**6000)", "-" * 300 + "1",
+                 "+".join(["1"] * 300), "1" * 3000]:
+        t0 = time.perf_counter()
+        with pytest.raises(EvalLimitError):
+            safe_eval(expr)
+        assert time.perf_counter() - t0 < 0.1
+    assert not issubclass(EvalLimitError, ValueError)   # callers must not treat it as "not math"
+    monkeypatch.setattr(tools, "TIME_BUDGET", -1.0)
+    with pytest.raises(EvalLimitError):
+        safe_eval("3 * 4")
+
+def test_eval_batch_is_not_bound_by_the_scalar_budget(monkeypatch):
+    import numpy as np
+    from src import tools
+    a = np.random.default_rng(0).random(1_000_000)
+    monkeypatch.setattr(tools, "TIME_BUDGET", 1e-6)   # far less than one pass over a
+    out = tools.eval_batch("a*a*a*a*a*a*2", a=a)
+    assert np.allclose(out, a ** 6 * 2)
+    with pytest.raises(tools.EvalLimitError):
+        safe_eval("3 * 4")                            # scalar calls keep the budget
@@ -0,0 +1,66 @@
+# benchmarks/bench_batch.py
+"""
+Batch mode (src/batch.py) vs answering one question at a time, against the local
+OpenAI-compatible stub in shared/benchmarks (no API key, no network).
+Usage:
+  python benchmarks/bench_batch.py [--questions 200] [--chunks 5000] [--latency 150] [--concurrency 1,8,32,64]
+The index is built from synthetic chunks and the questions are synthetic queries
+(synth.py). The response cache is off, so every question costs one stub call.
+Reported per mode: wall time, questions/s, p50/p95/p99 LLM latency.
+  serial        retrieve() + answer_with_rag() per question, in order (what a loop over
+                agent.py did, minus process start-up)
+  batch, c=N    run_batch with N calls in flight, no rate limit
+"""
+
+import os, sys, time, asyncio, argparse, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT, "shared", "benchmarks"))
+from synth import make_chunks, make_queries
+from src import agent
+from src.batch import run_batch
+from src.retriever import fit_index, retrieve
+from shared.llm import LLMClient
+from shared.tracing import percentile
+from stub_server import Stub
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=150, help="stub response time, ms")
+    parser.add_argument("--concurrency", default="1,8,32,64")
+    args = parser.parse_args()
+    index = fit_index(make_chunks(args.chunks), "synthetic")
+    questions = [{"id": str(i), "question": q} for i, q in enumerate(make_queries(args.questions))]
+    stub = Stub(args.latency / 1000).start()
+    client = LLMClient(None, None, api_key="stub", base_url=stub.base_url)
+    client.chat([{"role": "user", "content": "warm-up"}])
+
+    rows = []
+    times = []
+    t0 = time.perf_counter()
+    for q in questions:
+        hits = retrieve(index, q["question"], k=agent.TOP_K)
+        start = time.perf_counter()
+        agent.answer_with_rag(client, q["question"], agent.format_context(hits))
+        times.append((time.perf_counter() - start) * 1000)
+    rows.append(("serial", time.perf_counter() - t0, times))
+
+    for c in [int(x) for x in args.concurrency.split(",")]:
+        with tempfile.TemporaryDirectory() as d:
+            report = asyncio.run(run_batch(index, questions, os.path.join(d, "out.jsonl"), client,
+                                           concurrency=c, rate=0))
+        assert report.answered == len(questions), report.summary()
+        rows.append((f"batch, c={c}", report.seconds, report.latencies))
+    stub.shutdown()
+
+    print(f"{args.questions} questions, {args.chunks} chunks, stub latency {args.latency:g} ms")
+    print(f"{'':<14} {'wall s':>7} {'q/s':>7} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7}")
+    for label, secs, lat in rows:
+        print(f"{label:<14} {secs:>7.2f} {len(questions) / secs:>7.1f} {percentile(lat, 50):>7.1f} "
+              f"{percentile(lat, 95):>7.1f} {percentile(lat, 99):>7.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# benchmarks/bench_dense.py
+"""
+Dense (LSA + IVF) retrieval: recall@k against exact search, latency and memory.
+Usage:
+  python benchmarks/bench_dense.py [--sizes 4000,16000] [--queries 200] [--k 10] [--dim 128]
+For each corpus size and codec (float32, pq) prints build time, mean query latency
+for IVF search and exact (all lists) search, recall@k of IVF vs exact float32
+search, and bytes stored per chunk.
+"""
+
+import argparse, time
+from synth import make_chunks, make_queries  # also puts the project root on sys.path
+from src.retriever import fit_index
+from src.dense import DenseEngine
+
+def _run(engine, qvs, k, exact=False):
+    t0 = time.perf_counter()
+    search = engine.exact_search if exact else engine.search
+    hits = [set(search(qvs[r], k)[0].tolist()) for r in range(qvs.shape[0])]
+    return (time.perf_counter() - t0) / qvs.shape[0], hits
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="4000,16000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries)
+    print(f"{'chunks':>8} {'codec':>8} {'build s':>8} {'ivf ms':>7} {'exact ms':>9} "
+          f"{'recall@k':>9} {'B/chunk':>8}")
+    for n in [int(s) for s in args.sizes.split(",")]:
+        index = fit_index(make_chunks(n), "synthetic")
+        qvs = index.vectorizer.transform(queries)
+        truth = None
+        for codec in ("float32", "pq"):
+            t0 = time.perf_counter()
+            engine = DenseEngine.build(index.matrix, dim=args.dim, codec=codec, nprobe=args.nprobe)
+            build = time.perf_counter() - t0
+            exact_ms, exact_hits = _run(engine, qvs, args.k, exact=True)
+            if truth is None:
+                truth = exact_hits   # exact float32 search is the reference for both codecs
+            ivf_ms, hits = _run(engine, qvs, args.k)
+            found = sum(len(h & t) for h, t in zip(hits, truth))
+            total = sum(len(t) for t in truth)
+            recall = found / max(total, 1)
+            print(f"{n:>8} {codec:>8} {build:>8.2f} {ivf_ms * 1000:>7.3f} {exact_ms * 1000:>9.3f} "
+                  f"{recall:>9.3f} {engine.bytes_per_chunk():>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# benchmarks/bench_engines.py
+"""
+Brute-force vs MaxScore query latency as the corpus grows.
+Usage:
+  python benchmarks/bench_engines.py [--sizes 1000,4000,16000,64000] [--queries 200] [--k 5]
+Prints mean latency per query for both engines, the share of postings MaxScore
+touched, and the smallest corpus size at which MaxScore is faster.
+"""
+
+import argparse, time
+from synth import make_chunks, make_queries  # also puts the project root on sys.path
+from src.retriever import fit_index, retrieve_many, use_engine
+
+def _time_queries(index, queries, k):
+    t0 = time.perf_counter()
+    results = [retrieve_many(index, [q], k)[0] for q in queries]
+    return (time.perf_counter() - t0) / len(queries), results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,4000,16000,64000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries)
+    crossover = None
+    print(f"{'chunks':>8} {'brute ms':>9} {'maxscore ms':>12} {'postings %':>11} {'same':>5}")
+    for n in [int(s) for s in args.sizes.split(",")]:
+        index = fit_index(make_chunks(n), "synthetic")
+        brute, expected = _time_queries(index, queries, args.k)
+
+        use_engine(index, "maxscore")
+        engine = index.engine
+        touched = 0
+        t0 = time.perf_counter()
+        results = []
+        for q in queries:
+            results.append(retrieve_many(index, [q], args.k)[0])
+            touched += engine.touched
+        fast = (time.perf_counter() - t0) / len(queries)
+        qv = index.vectorizer.transform(queries)
+        total = int(sum(engine.indptr[t + 1] - engine.indptr[t] for t in qv.indices))
+
+        same = results == expected
+        share = 100.0 * touched / max(total, 1)
+        print(f"{n:>8} {brute * 1000:>9.3f} {fast * 1000:>12.3f} {share:>10.1f}% {str(same):>5}")
+        if crossover is None and fast < brute:
+            crossover = n
+    print(f"crossover: {crossover if crossover else 'not reached'} chunks")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# benchmarks/bench_retriever.py
+"""
+End-to-end retriever benchmark on synthetic corpora, with machine-readable output.
+For each corpus size (each in a fresh subprocess, so memory figures are per size):
+  build     chunks/s of fit_index + save_index ("memory") or write_streaming ("stream")
+  disk      index size on disk
+  load      load_index wall time and RSS after loading
+  latency   p50/p95/p99 of single-query retrieve() per engine
+  recall@k  of every other engine against brute-force results on the same queries
+  peak_rss  ru_maxrss of the whole run
+Usage:
+  python benchmarks/bench_retriever.py --sizes 10000,100000 --out bench.json
+  python benchmarks/bench_retriever.py --sizes 1000000 --build stream --engines brute,maxscore
+  python benchmarks/bench_retriever.py --compare old.json new.json   # >10% regressions
+"""
+
+import argparse, os, sys, json, time, shutil, platform, resource, subprocess, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.tracing import percentile
+
+METRICS = (  # (key, higher is better) compared by --compare
+    ("build_chunks_per_s", True), ("disk_bytes", False), ("load_ms", False), ("rss_after_load_mb", False),
+    ("peak_rss_mb", False), ("p50_ms", False), ("p95_ms", False), ("p99_ms", False), ("recall_at_k", True),
+)
+
+def _rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+def _run_size(n: int, args) -> dict:
+    import numpy as np
+    from synth import iter_chunks, make_chunks, make_queries
+    from src.retriever import fit_index, save_index, load_index, use_engine, retrieve
+    from src.index_store import disk_size
+
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    path = os.path.join(tmp, "index")
+    try:
+        t0 = time.perf_counter()
+        if args.build == "stream":
+            from src.stream_index import write_streaming
+            write_streaming(iter_chunks(n), path, "synthetic")
+        else:
+            save_index(fit_index(make_chunks(n), "synthetic"), path, dtype=args.dtype)
+        build = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        index = load_index(path)
+        load = time.perf_counter() - t0
+        out = {"chunks": n, "build": args.build, "build_s": build, "build_chunks_per_s": n / build,
+               "disk_bytes": disk_size(path), "load_ms": load * 1000, "rss_after_load_mb": _rss_mb(),
+               "engines": {}}
+
+        queries = make_queries(args.queries)
+        expected = None
+        for engine in args.engines.split(","):
+            use_engine(index, engine)
+            for q in queries[:5]:          # warm-up (page faults, lazy imports)
+                retrieve(index, q, args.k)
+            times, results = [], []
+            for q in queries:
+                t0 = time.perf_counter()
+                results.append(retrieve(index, q, args.k))
+                times.append((time.perf_counter() - t0) * 1000)
+            ids = [[(c.doc_path, c.chunk_id) for c, _ in r] for r in results]
+            if expected is None:
+                expected = ids if engine == "brute" else None
+            stats = {"p50_ms": percentile(times, 50), "p95_ms": percentile(times, 95),
+                     "p99_ms": percentile(times, 99), "mean_ms": float(np.mean(times))}
+            if expected is not None:
+                found = sum(len(set(a) & set(b)) for a, b in zip(ids, expected))
+                stats["recall_at_k"] = found / max(1, sum(len(b) for b in expected))
+            out["engines"][engine] = stats
+        out["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return out
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+def _flatten(result: dict) -> dict:
+    """{(size, engine or "-", metric): value} for comparisons."""
+    flat = {}
+    for row in result["runs"]:
+        for key, _ in METRICS:
+            if key in row:
+                flat[(row["chunks"], "-", key)] = row[key]
+        for engine, stats in row["engines"].items():
+            for key, _ in METRICS:
+                if key in stats:
+                    flat[(row["chunks"], engine, key)] = stats[key]
+    return flat
+
+def compare(old_path: str, new_path: str, tolerance: float = 0.10) -> int:
+    with open(old_path) as f:
+        old = _flatten(json.load(f))
+    with open(new_path) as f:
+        new = _flatten(json.load(f))
+    better = dict(METRICS)
+    regressions = 0
+    print(f"{'chunks':>8} {'engine':>9} {'metric':>20} {'old':>12} {'new':>12} {'change':>8}")
+    for key in sorted(set(old) & set(new)):
+        a, b = old[key], new[key]
+        change = (b - a) / a if a else 0.0
+        worse = change < -tolerance if better[key[2]] else change > tolerance
+        regressions += worse
+        print(f"{key[0]:>8} {key[1]:>9} {key[2]:>20} {a:>12.3f} {b:>12.3f} {change:>+7.1%}{' !' if worse else ''}")
+    print(f"{regressions} regression(s) beyond {tolerance:.0%}")
+    return 1 if regressions else 0
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--engines", default="brute,maxscore", help="comma-separated; brute first for recall")
+    parser.add_argument("--build", choices=("memory", "stream"), default="memory")
+    parser.add_argument("--dtype", choices=("float64", "float32", "uint8"), default="float32")
+    parser.add_argument("--out", default="bench_retriever.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare)
+    if args.child:
+        print(json.dumps(_run_size(args.child, args)))
+        return 0
+
+    runs = []
+    for n in [int(s) for s in args.sizes.split(",")]:
+        cmd = [sys.executable, os.path.abspath(__file__), "--child", str(n), "--queries", str(args.queries),
+               "--k", str(args.k), "--engines", args.engines, "--build", args.build, "--dtype", args.dtype]
+        res = subprocess.run(cmd, capture_output=True, text=True)
+        if res.returncode != 0:
+            print(res.stderr, file=sys.stderr)
+            return res.returncode
+        row = json.loads(res.stdout.strip().splitlines()[-1])
+        runs.append(row)
+        print(f"{n:>9} chunks: build {row['build_chunks_per_s']:,.0f} chunks/s, "
+              f"{row['disk_bytes'] / 2**20:.1f} MB, load {row['load_ms']:.1f} ms, "
+              f"rss {row['rss_after_load_mb']:.0f} MB (peak {row['peak_rss_mb']:.0f} MB)")
+        for engine, s in row["engines"].items():
+            recall = f", recall@{args.k} {s['recall_at_k']:.3f}" if "recall_at_k" in s else ""
+            print(f"{'':>9} {engine:>9}: p50 {s['p50_ms']:.3f} / p95 {s['p95_ms']:.3f} / "
+                  f"p99 {s['p99_ms']:.3f} ms{recall}")
+
+    payload = {"commit": _git_commit(), "python": platform.python_version(), "created": time.time(),
+               "config": {k: v for k, v in vars(args).items() if k not in ("compare", "child", "out")},
+               "runs": runs}
+    with open(args.out, "w") as f:
+        json.dump(payload, f, indent=1)
+    print(f"Wrote {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
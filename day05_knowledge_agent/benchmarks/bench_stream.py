@@ -0,0 +1,46 @@
+# benchmarks/bench_stream.py
+"""
+Peak memory of the in-memory build vs the streaming (out-of-core) build.
+Usage:
+  python benchmarks/bench_stream.py [--sizes 5000,20000,80000] [--batch-size 2048]
+Each build runs in a fresh subprocess; prints wall time and peak RSS (ru_maxrss).
+"""
+
+import argparse, os, sys, json, time, resource, tempfile, subprocess
+
+def _child(mode: str, n: int, batch_size: int, out: str):
+    from synth import iter_chunks, make_chunks
+    from src.retriever import fit_index, save_index
+    from src.stream_index import write_streaming
+    t0 = time.perf_counter()
+    if mode == "memory":
+        save_index(fit_index(make_chunks(n), "synthetic"), out)
+    else:
+        write_streaming(iter_chunks(n), out, "synthetic", batch_size=batch_size)
+    secs = time.perf_counter() - t0
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+    print(json.dumps({"secs": secs, "rss_mb": rss_mb}))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="5000,20000,80000")
+    parser.add_argument("--batch-size", type=int, default=2048)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return _child(args.child[0], int(args.child[1]), args.batch_size, args.out)
+
+    print(f"{'chunks':>8} {'mode':>7} {'build s':>8} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in [int(s) for s in args.sizes.split(",")]:
+            for mode in ("memory", "stream"):
+                out = os.path.join(tmp, f"{mode}-{n}")
+                res = subprocess.run([sys.executable, __file__, "--child", mode, str(n), "--out", out,
+                                      "--batch-size", str(args.batch_size)],
+                                     capture_output=True, text=True, check=True)
+                r = json.loads(res.stdout.strip().splitlines()[-1])
+                print(f"{n:>8} {mode:>7} {r['secs']:>8.2f} {r['rss_mb']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
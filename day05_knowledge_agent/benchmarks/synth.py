@@ -0,0 +1,53 @@
+# benchmarks/synth.py
+"""
+Synthetic corpus generator for retriever benchmarks.
+Words follow a Zipf distribution over a fixed vocabulary, so a few terms are very
+common (long posting lists) and most are rare, like real documents.
+"""
+
+from __future__ import annotations
+import os, sys
+from typing import Iterator, List
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.retriever import Chunk, CHUNK_SIZE
+
+VOCAB_SIZE = 50_000
+ZIPF_A = 1.1
+
+def _vocab(size: int = VOCAB_SIZE) -> np.ndarray:
+    # deterministic pseudo-words: "qa", "qb", ..., long enough to survive the tokenizer
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    rng = np.random.default_rng(1234)
+    lengths = rng.integers(4, 10, size=size)
+    return np.array(["".join(rng.choice(letters, n)) + str(i) for i, n in enumerate(lengths)])
+
+def iter_chunks(n_chunks: int, words_per_chunk: int = CHUNK_SIZE // 7, docs: int = 0,
+                seed: int = 0, vocab_size: int = VOCAB_SIZE, block: int = 1024) -> Iterator[Chunk]:
+    """
+    n_chunks chunks spread over `docs` documents (default: 20 chunks per document),
+    generated `block` at a time so huge corpora can be streamed.
+    """
+    rng = np.random.default_rng(seed)
+    vocab = _vocab(vocab_size)
+    docs = docs or max(1, n_chunks // 20)
+    for start in range(0, n_chunks, block):
+        rows = min(block, n_chunks - start)
+        ranks = np.minimum(rng.zipf(ZIPF_A, size=(rows, words_per_chunk)), vocab_size) - 1
+        for r in range(rows):
+            i = start + r
+            doc = i * docs // n_chunks
+            yield Chunk(doc_path=f"synthetic/doc{doc:06d}.txt", chunk_id=i, text=" ".join(vocab[ranks[r]]))
+
+def make_chunks(n_chunks: int, **opts) -> List[Chunk]:
+    """All of iter_chunks as a list (same options)."""
+    return list(iter_chunks(n_chunks, **opts))
+
+def make_queries(n_queries: int, terms: int = 3, seed: int = 1, vocab_size: int = VOCAB_SIZE,
+                 max_rank: int = 5_000) -> List[str]:
+    """Short questions drawn from the head and torso of the vocabulary."""
+    rng = np.random.default_rng(seed)
+    vocab = _vocab(vocab_size)
+    ranks = np.minimum(rng.zipf(ZIPF_A, size=(n_queries, terms)), max_rank) - 1
+    return [" ".join(vocab[r]) for r in ranks]
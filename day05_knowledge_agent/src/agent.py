@@ -5,67 +5,169 @@ Day 5: Knowledge Agent (Local RAG with TF-IDF)
 - Retrieves top-k chunks for a query
 - Sends them as context to the LLM
 - Produces a grounded answer with inline citations [doc:chunk]
+- Caches retrieval/context and answers per index version (see query_cache.py)
+- Calls the LLM through the shared client (pooled connection, response cache, retries)
+- Prints the retrieved context first, then streams the answer as it is generated
+- Forwards the question to a running server.py instead, if there is one
+- Times each stage as a span (shared/tracing.py): AGENT_TRACE=trace.jsonl to record them
+
+Usage:
+  python src/agent.py "How far apart should standpipe outlets be?"
+  python src/agent.py --no-cache "..."    # bypass both cache levels and the LLM response cache
+  python src/agent.py --cache-stats       # print hit/miss/eviction counters
+  python src/agent.py --local "..."       # never use the server
+  python src/agent.py --no-stream "..."   # print the answer only once it is complete
+  python src/agent.py --profile-startup "..."   # per-package import cost of this run
 """
-from dotenv import load_dotenv
-load_dotenv()  # take environment variables from .env
-import os, sys
-from typing import List
-from openai import OpenAI
-from retriever import load_index, retrieve
+import os, sys, json, argparse
+from typing import Callable, Optional
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.startup import load_env, run_agent
+from shared import tracing
+try:
+    from .query_cache import QueryCache, index_version, answer_key
+    from . import server  # client side only imports the standard library
+except ImportError:
+    from query_cache import QueryCache, index_version, answer_key
+    import server
 
 MODEL = "gpt-4o-mini"
-MAX_CONTEXT_CHARS = 2200  # keep prompt small/cheap
+MAX_CONTEXT_TOKENS = 550  # keep prompt small/cheap (model tokens, see packing.py)
+TOP_K = 5
+NO_HITS = "No relevant passages found. Add docs to ./data and re-index."
 
 def format_context(retrieved) -> str:
-    # retrieved: List[(Chunk, score)]
-    blocks: List[str] = []
-    used = 0
-    for chunk, score in retrieved:
-        tag = f"[{chunk.doc_path}#{chunk.chunk_id}]"
-        text = chunk.text.strip()
-        # pack within a rough budget
-        piece = f"{tag}\n{text}\n"
-        if used + len(piece) > MAX_CONTEXT_CHARS and blocks:
-            break
-        blocks.append(piece)
-        used += len(piece)
-    return "\n---\n".join(blocks)
-
-def answer_with_rag(client: OpenAI, question: str, context_block: str) -> str:
+    # retrieved: List[(Chunk, score)]; overlapping neighbours are merged, repeats dropped
+    try:
+        from .packing import pack, format_passages
+    except ImportError:
+        from packing import pack, format_passages
+    return format_passages(pack(retrieved, MAX_CONTEXT_TOKENS))
+
+def answer_with_rag(client, question: str, context_block: str, cache: bool = True, on_token=None,
+                    timeout: Optional[float] = None) -> str:
     sys_prompt = (
         "You are a precise assistant that answers ONLY using the provided context. "
         "If the answer is not contained within the context, say: 'I don't know based on the provided documents.' "
-        "Cite sources inline using their tags like [doc#chunk]. Be concise."
+        "Cite sources inline using their tags like [doc#chunk] or [doc#first-last]. Be concise."
     )
     messages = [
         {"role": "system", "content": sys_prompt},
         {"role": "user", "content": f"Context:\n{context_block}\n\nQuestion: {question}\nAnswer (with citations):"}
     ]
-    resp = client.chat.completions.create(model=MODEL, messages=messages)
-    return resp.choices[0].message.content.strip()
+    return client.chat(messages, model=MODEL, cache=cache, on_token=on_token, timeout=timeout).strip()
+
+def find_index(base: str) -> Optional[str]:
+    index_path = os.path.join(base, "tfidf.index")
+    legacy_path = os.path.join(base, "tfidf.index.pkl")
+    if not os.path.exists(index_path) and os.path.exists(legacy_path):
+        print("Using legacy pickle index; migrate with: python src/index_store.py migrate tfidf.index.pkl tfidf.index")
+        index_path = legacy_path
+    return index_path if os.path.exists(index_path) else None
+
+def lookup_context(question: str, get_index: Callable, cache: Optional[QueryCache] = None) -> dict:
+    """{"hits": [[doc_path, chunk_id, score], ...], "context": packed block}; get_index is only called on a miss."""
+    with tracing.span("lookup_context") as s:
+        key = QueryCache.retrieval_key(question, TOP_K)
+        cached = cache.retrieval.get(key) if cache else None
+        if cache:
+            s.set(cache="miss" if cached is None else "hit")
+        if cached is None:
+            index = get_index()
+            try:
+                from .retriever import retrieve
+            except ImportError:
+                from retriever import retrieve
+            with tracing.span("retrieve", k=TOP_K):
+                top = retrieve(index, question, k=TOP_K)
+            with tracing.span("format_context", hits=len(top)):
+                context = format_context(top) if top else ""
+            cached = {"hits": [[c.doc_path, c.chunk_id, score] for c, score in top], "context": context}
+            if cache:
+                cache.retrieval.put(key, cached)
+        return cached
+
+def lookup_answer(question: str, context_block: str, get_client: Callable,
+                  cache: Optional[QueryCache] = None, on_token: Optional[Callable] = None) -> str:
+    """on_token receives the answer as it streams; cached answers are returned whole."""
+    with tracing.span("lookup_answer") as s:
+        key = answer_key(MODEL, context_block, question)
+        answer = cache.answers.get(key) if cache else None
+        if cache:
+            s.set(cache="miss" if answer is None else "hit")
+        if answer is None:
+            answer = answer_with_rag(get_client(), question, context_block, cache=cache is not None, on_token=on_token)
+            if cache:
+                cache.answers.put(key, answer)
+        return answer
+
+def make_client():
+    from shared.llm import get_client
+    return get_client()
 
 def main():
+    load_env(__file__)  # OPENAI_API_KEY, DAY05_SERVER, ... from .env, if there is one
+    parser = argparse.ArgumentParser(description="Ask a question about the indexed documents")
+    parser.add_argument("question", nargs="*")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the query cache")
+    parser.add_argument("--cache-stats", action="store_true", help="print cache counters and exit")
+    parser.add_argument("--local", action="store_true", help="answer in-process even if server.py is running")
+    parser.add_argument("--no-stream", action="store_true", help="print the answer once it is complete")
+    args = parser.parse_args()
+
+    if args.cache_stats and not args.local and server.is_running():
+        print(json.dumps(server.request("GET", "/stats"), indent=1))
+        return
+    question = None
+    if not args.cache_stats:
+        question = " ".join(args.question) if args.question else input("Ask a question about your docs: ")
+    if question is not None and not args.local and server.is_running():
+        result = server.request("POST", "/answer", {"question": question, "cache": not args.no_cache})
+        return print_result(result)
+
     base = os.path.dirname(os.path.dirname(__file__))
-    index_path = os.path.join(base, "tfidf.index.pkl")
-    if not os.path.exists(index_path):
+    index_path = find_index(base)
+    if index_path is None:
         print("Index not found. Run: python src/ingest.py")
         sys.exit(1)
 
-    question = " ".join(sys.argv[1:]) if len(sys.argv) > 1 else input("Ask a question about your docs: ")
+    cache = None
+    if not args.no_cache:
+        cache = QueryCache(os.path.join(base, "query_cache.json"), index_version(index_path))
+    if args.cache_stats:
+        print(json.dumps(cache.stats() if cache else {}, indent=1))
+        return
 
-    idx = load_index(index_path)
-    top = retrieve(idx, question, k=5)
-    if not top:
-        print("No relevant passages found. Add docs to ./data and re-index.")
-        sys.exit(0)
+    def get_index():
+        with tracing.span("load_index"):   # numpy/scipy are imported here too
+            from retriever import load_index
+            return load_index(index_path)
 
-    context_block = format_context(top)
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    answer = answer_with_rag(client, question, context_block)
+    with tracing.span("query"):
+        result = lookup_context(question, get_index, cache)
+        if result["hits"]:
+            # the context is on screen while the answer is generated
+            from shared.llm import StreamPrinter
+            print_context(result["context"])
+            out = StreamPrinter("", enabled=False if args.no_stream else None)
+            out.finish(lookup_answer(question, result["context"], make_client, cache, on_token=out.on_token))
+        else:
+            print(NO_HITS)
+        if cache:
+            with tracing.span("query_cache.save"):
+                cache.save()
+
+def print_context(context: str):
     print("\n=== Retrieved Context ===")
-    print(context_block)
-    print("\n=== Answer ===")
-    print(answer)
+    print(context)
+    print("\n=== Answer ===", flush=True)
+
+def print_result(result: dict):
+    if not result["hits"]:
+        print(NO_HITS)
+        sys.exit(0)
+    print_context(result["context"])
+    print(result["answer"])
 
 if __name__ == "__main__":
-    main()
+    run_agent(__file__, main)
@@ -0,0 +1,199 @@
+# src/batch.py
+"""
+Batch mode for QA sweeps: thousands of questions through retrieval + LLM in one process.
+- Questions are read from JSONL: {"id": ..., "question": ...} (id defaults to the line number).
+- Retrieval runs retrieve_many on BATCH_SIZE questions at a time (one sparse product per
+  block) in a worker thread, so the next batch is retrieved while answers are generated.
+- LLM calls run on asyncio: at most `concurrency` in flight, started no faster than a
+  token bucket allows (`rate` per second, bursts of `burst`), each bounded by `timeout`.
+- Every result is appended to the output JSONL as soon as it completes (completion order).
+  A restart skips ids already answered and retries the ones that failed.
+- Prints questions/s and p50/p95/p99 latency of the LLM calls at the end. With
+  AGENT_TRACE set, retrieval batches, context packing and LLM calls are traced as spans.
+
+Usage:
+  python src/batch.py questions.jsonl answers.jsonl [--concurrency 16] [--rate 8] [--timeout 60]
+  OPENAI_BASE_URL=http://127.0.0.1:8000/v1 python src/batch.py ...   # any OpenAI-compatible server
+"""
+
+from __future__ import annotations
+import os, sys, json, time, asyncio, argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional, Set
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))  # repo root, for shared/
+from shared import tracing
+
+try:
+    from . import agent, retriever
+except ImportError:
+    import agent, retriever
+
+CONCURRENCY = 16     # LLM calls in flight
+RATE = 8.0           # LLM calls started per second (token bucket; 0: unlimited)
+TIMEOUT = 60.0       # seconds per question, retries included
+BATCH_SIZE = retriever.QUERY_BLOCK   # questions per retrieve_many call
+
+class TokenBucket:
+    """Up to `burst` calls at once, refilled at `rate` per second; acquire() waits for one."""
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = float(burst or max(1, int(rate)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self.lock:   # waiters are served in order
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+def read_questions(path: str) -> List[dict]:
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if line.strip():
+                item = json.loads(line)
+                questions.append({"id": str(item.get("id", n)), "question": item["question"]})
+    return questions
+
+def completed_ids(path: str) -> Set[str]:
+    """
+    Ids with a result in an earlier run's output. A line cut off by a crash is
+    dropped from the file so that appending starts on a fresh line.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        try:
+            item = json.loads(line)
+        except ValueError:
+            continue
+        if item.get("error") is None:
+            done.add(str(item["id"]))
+    return done
+
+@dataclass
+class BatchReport:
+    total: int = 0
+    skipped: int = 0       # answered in an earlier run
+    answered: int = 0
+    no_hits: int = 0       # nothing retrieved, no LLM call
+    failed: int = 0        # errors and timeouts, retried on the next run
+    timeouts: int = 0
+    seconds: float = 0.0
+    latencies: List[float] = field(default_factory=list)   # ms per LLM call
+
+    def summary(self) -> str:
+        done = self.answered + self.no_hits + self.failed
+        rate = done / self.seconds if self.seconds else 0.0
+        return (f"{done}/{self.total} questions in {self.seconds:.1f} s ({rate:.1f}/s); "
+                f"{self.answered} answered, {self.no_hits} without hits, {self.failed} failed "
+                f"({self.timeouts} timeouts), {self.skipped} done earlier\n"
+                f"LLM latency p50 {tracing.percentile(self.latencies, 50):.0f}  p95 {tracing.percentile(self.latencies, 95):.0f}  "
+                f"p99 {tracing.percentile(self.latencies, 99):.0f} ms")
+
+async def run_batch(index, questions: List[dict], out_path: str, client, concurrency: int = CONCURRENCY,
+                    rate: float = RATE, burst: Optional[int] = None, timeout: float = TIMEOUT,
+                    batch_size: int = BATCH_SIZE, k: int = agent.TOP_K, cache: bool = True) -> BatchReport:
+    """Answer questions not yet in out_path, appending one JSON line per result."""
+    report = BatchReport(total=len(questions))
+    done = completed_ids(out_path)
+    pending = [q for q in questions if q["id"] not in done]
+    report.skipped = len(questions) - len(pending)
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(concurrency)
+    bucket = TokenBucket(rate, burst or concurrency)
+    # timed-out calls keep their thread until the SDK timeout ends them; spare threads for new ones
+    pool = ThreadPoolExecutor(max_workers=2 * concurrency)
+    t0 = time.perf_counter()
+
+    with open(out_path, "a", encoding="utf-8") as out:
+        def write(item: dict, hits, **result):
+            out.write(json.dumps({"id": item["id"], "question": item["question"], **result,
+                                  "hits": [[c.doc_path, c.chunk_id, s] for c, s in hits]}) + "\n")
+            out.flush()
+
+        async def answer(item: dict, hits):
+            if not hits:
+                report.no_hits += 1
+                return write(item, hits, answer=None, error=None)
+            with tracing.span("format_context", hits=len(hits)):
+                context = agent.format_context(hits)
+            async with slots:
+                await bucket.acquire()
+                start = time.perf_counter()
+                call = loop.run_in_executor(pool, lambda: agent.answer_with_rag(
+                    client, item["question"], context, cache=cache, timeout=timeout))
+                try:
+                    text = await asyncio.wait_for(call, timeout)
+                except asyncio.TimeoutError:
+                    report.failed += 1
+                    report.timeouts += 1
+                    return write(item, hits, answer=None, error=f"timeout after {timeout:g} s")
+                except Exception as e:
+                    report.failed += 1
+                    return write(item, hits, answer=None, error=f"{type(e).__name__}: {e}")
+                latency = (time.perf_counter() - start) * 1000
+            report.answered += 1
+            report.latencies.append(latency)
+            write(item, hits, answer=text, error=None, latency_ms=round(latency, 1))
+
+        def retrieve_many(questions: List[str]):
+            with tracing.span("retrieve_many", questions=len(questions), k=k):
+                return retriever.retrieve_many(index, questions, k)
+
+        tasks = []
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            results = await loop.run_in_executor(None, retrieve_many, [q["question"] for q in batch])
+            tasks += [asyncio.create_task(answer(q, hits)) for q, hits in zip(batch, results)]
+        await asyncio.gather(*tasks)
+    pool.shutdown(wait=False)
+    report.seconds = time.perf_counter() - t0
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions with the knowledge agent")
+    parser.add_argument("questions", help='JSONL, one {"id": ..., "question": ...} per line')
+    parser.add_argument("output", help="JSONL results, appended in completion order (resumable)")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="LLM calls in flight")
+    parser.add_argument("--rate", type=float, default=RATE, help="LLM calls started per second (0: unlimited)")
+    parser.add_argument("--burst", type=int, default=None, help="token bucket size (default: concurrency)")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="seconds per question")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="questions per retrieval batch")
+    parser.add_argument("--engine", choices=retriever.ENGINES, default="brute")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the LLM response cache")
+    args = parser.parse_args(argv)
+
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    index_path = agent.find_index(base)
+    if index_path is None:
+        print("Index not found. Run: python src/ingest.py")
+        return 1
+    with tracing.span("load_index", engine=args.engine):
+        index = retriever.load_index(index_path, args.engine)
+    client = agent.make_client()
+    client.client   # import openai and build the SDK client now, not inside the first timed calls
+    report = asyncio.run(run_batch(index, read_questions(args.questions), args.output, client,
+                                   concurrency=args.concurrency, rate=args.rate, burst=args.burst,
+                                   timeout=args.timeout, batch_size=args.batch_size, cache=not args.no_cache))
+    print(report.summary())
+    return 1 if report.failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+# src/dense.py
+"""
+Local dense (LSA) retrieval over the existing TF-IDF matrix, plus hybrid fusion.
+- Chunk vectors come from a truncated SVD of the TF-IDF matrix (no embedding API).
+- Vectors are kept as float32 or as product-quantized uint8 codes ("pq").
+- An IVF index (spherical k-means, NumPy only) limits each query to the nprobe
+  closest clusters instead of every chunk.
+- HybridEngine fuses brute-force lexical and dense rankings with reciprocal-rank fusion.
+Saved next to a mapped index as <index>/dense/ (see save/load) so agents do not refit.
+"""
+
+from __future__ import annotations
+import os, json, shutil
+from typing import Optional, Tuple
+import numpy as np
+from scipy import sparse
+
+try:
+    from .retriever import _top_k   # same selection and tie order as the lexical engines
+except ImportError:
+    from retriever import _top_k
+
+CODECS = ("float32", "pq")
+DENSE_DIM = 128
+PQ_CENTROIDS = 256   # uint8 codes
+KMEANS_ITERS = 12
+RRF_K = 60           # reciprocal-rank fusion constant (Cormack et al.)
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+def _kmeans(x: np.ndarray, n_clusters: int, seed: int, spherical: bool = False) -> np.ndarray:
+    """Plain Lloyd iterations; returns (n_clusters, dim) centroids."""
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(x))
+    centroids = x[rng.choice(len(x), n_clusters, replace=False)].copy()
+    for _ in range(KMEANS_ITERS):
+        if spherical:
+            assign = np.argmax(x @ centroids.T, axis=1)
+        else:
+            d = (x * x).sum(1)[:, None] - 2 * x @ centroids.T + (centroids * centroids).sum(1)[None, :]
+            assign = np.argmin(d, axis=1)
+        counts = np.bincount(assign, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        empty = counts == 0
+        sums[~empty] /= counts[~empty, None]
+        sums[empty] = x[rng.choice(len(x), int(empty.sum()))]   # reseed empty clusters
+        centroids = _normalize(sums) if spherical else sums
+    return centroids.astype(np.float32)
+
+class DenseEngine:
+    """
+    LSA vectors + IVF search. codec="pq" stores pq_m uint8 codes per chunk and scores
+    with asymmetric distance (query stays float32). nprobe >= nlist means exact search.
+    """
+    name = "dense"
+
+    def __init__(self, components: np.ndarray, centroids: np.ndarray, list_ptr: np.ndarray,
+                 list_ids: np.ndarray, vectors: Optional[np.ndarray] = None,
+                 codebooks: Optional[np.ndarray] = None, codes: Optional[np.ndarray] = None,
+                 nprobe: int = 8):
+        self.components = components    # (dim, n_terms): TF-IDF -> LSA projection
+        self.centroids = centroids      # (nlist, dim) IVF cluster centres
+        self.list_ptr = list_ptr        # (nlist + 1,) offsets into list_ids
+        self.list_ids = list_ids        # chunk ids grouped by cluster; row i of vectors/codes
+        self.vectors = vectors          # (n_chunks, dim) float32, in list_ids order
+        self.codebooks = codebooks      # (pq_m, PQ_CENTROIDS, dim / pq_m)
+        self.codes = codes              # (n_chunks, pq_m) uint8, in list_ids order
+        self.nprobe = nprobe
+
+    @property
+    def codec(self) -> str:
+        return "float32" if self.vectors is not None else "pq"
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, matrix, dim: int = DENSE_DIM, codec: str = "float32", nlist: int = 0,
+              nprobe: int = 8, pq_m: int = 16, seed: int = 0) -> "DenseEngine":
+        """
+        Fit the SVD and IVF index. nlist defaults to ~sqrt(n_chunks) (1 list for tiny
+        corpora); pq_m must divide the final dimension.
+        """
+        from sklearn.decomposition import TruncatedSVD
+        if codec not in CODECS:
+            raise ValueError(f"codec must be one of {CODECS}")
+        m = sparse.csr_matrix(matrix, dtype=np.float64)
+        n, n_terms = m.shape
+        dim = max(1, min(dim, n - 1, n_terms - 1))
+        svd = TruncatedSVD(n_components=dim, random_state=seed, algorithm="randomized")
+        vecs = _normalize(svd.fit_transform(m)).astype(np.float32)
+        components = svd.components_.astype(np.float32)
+
+        nlist = nlist or (1 if n < 1024 else int(np.sqrt(n)))
+        centroids = _kmeans(vecs, nlist, seed, spherical=True) if nlist > 1 else _normalize(
+            vecs.mean(0, keepdims=True)).astype(np.float32)
+        assign = np.argmax(vecs @ centroids.T, axis=1)
+        list_ids = np.argsort(assign, kind="stable").astype(np.int32)
+        list_ptr = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(centroids)))])
+
+        engine = cls(components, centroids, list_ptr.astype(np.int64), list_ids, nprobe=nprobe)
+        ordered = vecs[list_ids]
+        if codec == "float32":
+            engine.vectors = ordered
+            return engine
+        if dim % pq_m:
+            raise ValueError(f"pq_m={pq_m} must divide the vector dimension {dim}")
+        sub = dim // pq_m
+        books = np.zeros((pq_m, PQ_CENTROIDS, sub), dtype=np.float32)
+        codes = np.zeros((n, pq_m), dtype=np.uint8)
+        for j in range(pq_m):
+            part = ordered[:, j * sub:(j + 1) * sub]
+            book = _kmeans(part, PQ_CENTROIDS, seed + j)
+            books[j, :len(book)] = book
+            d = (part * part).sum(1)[:, None] - 2 * part @ book.T + (book * book).sum(1)[None, :]
+            codes[:, j] = np.argmin(d, axis=1)
+        engine.codebooks, engine.codes = books, codes
+        return engine
+
+    def embed(self, qv) -> np.ndarray:
+        """Project TF-IDF query rows (CSR) into the normalized LSA space."""
+        q = sparse.csr_matrix(qv, dtype=np.float32) @ self.components.T
+        return _normalize(np.asarray(q, dtype=np.float32))
+
+    def _scores(self, q: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        if self.vectors is not None:
+            return self.vectors[rows] @ q
+        pq_m, _, sub = self.codebooks.shape
+        table = np.einsum("mcs,ms->mc", self.codebooks, q.reshape(pq_m, sub))   # (pq_m, 256)
+        return table[np.arange(pq_m), self.codes[rows]].sum(axis=1)
+
+    def search(self, qv, k: int, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k chunk ids and cosine scores for one TF-IDF query row."""
+        q = self.embed(qv)[0]
+        if k <= 0 or not q.any():
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        probe = np.argsort(-(self.centroids @ q))[:nprobe]
+        rows = np.concatenate([np.arange(self.list_ptr[c], self.list_ptr[c + 1]) for c in probe])
+        ids, scores = _top_k(self._scores(q, rows).astype(np.float64), self.list_ids[rows].astype(np.int64), k)
+        return ids, scores
+
+    def exact_search(self, qv, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Exhaustive search over the stored vectors (reference for recall@k)."""
+        return self.search(qv, k, nprobe=self.nlist)
+
+    def bytes_per_chunk(self) -> float:
+        n = len(self.list_ids)
+        stored = self.vectors.nbytes if self.vectors is not None else self.codes.nbytes
+        return (stored + self.list_ids.nbytes) / max(n, 1)
+
+    def save(self, path: str):
+        tmp = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        arrays = dict(components=self.components, centroids=self.centroids,
+                      list_ptr=self.list_ptr, list_ids=self.list_ids)
+        if self.vectors is not None:
+            arrays["vectors"] = self.vectors
+        else:
+            arrays["codebooks"], arrays["codes"] = self.codebooks, self.codes
+        for name, a in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), a)
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"codec": self.codec, "nprobe": self.nprobe,
+                       "shape": [len(self.list_ids), self.components.shape[1]]}, f, indent=1)
+        shutil.rmtree(path, ignore_errors=True)
+        os.rename(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, shape: Optional[Tuple[int, int]] = None) -> Optional["DenseEngine"]:
+        """Map a saved engine; returns None if missing or built for a different matrix shape."""
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if shape is not None and tuple(meta["shape"]) != tuple(shape):
+            return None
+
+        def arr(name):
+            p = os.path.join(path, f"{name}.npy")
+            return np.load(p, mmap_mode="r") if os.path.exists(p) else None
+
+        return cls(arr("components"), np.asarray(arr("centroids")), np.asarray(arr("list_ptr")),
+                   arr("list_ids"), vectors=arr("vectors"), codebooks=arr("codebooks"),
+                   codes=arr("codes"), nprobe=meta["nprobe"])
+
+class HybridEngine:
+    """Lexical (brute-force TF-IDF) + dense results, fused by reciprocal rank."""
+    name = "hybrid"
+
+    def __init__(self, matrix, dense: DenseEngine, depth: int = 50, rrf_k: int = RRF_K):
+        self.matrix = matrix
+        self.dense = dense
+        self.depth = depth
+        self.rrf_k = rrf_k
+
+    def search(self, qv, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k chunk ids by RRF score sum(1 / (rrf_k + rank)) over both rankings."""
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        depth = max(self.depth, k)
+        lex = (self.matrix @ qv.T).tocsc()
+        lex_ids, _ = _top_k(lex.data.astype(np.float64), lex.indices.astype(np.int64), depth)
+        dense_ids, _ = self.dense.search(qv, depth)
+        fused = {}
+        for ranking in (lex_ids, dense_ids):
+            for rank, i in enumerate(ranking.tolist()):
+                fused[i] = fused.get(i, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        if not fused:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        ids = np.fromiter(fused.keys(), dtype=np.int64, count=len(fused))
+        scores = np.fromiter(fused.values(), dtype=np.float64, count=len(fused))
+        return _top_k(scores, ids, k)
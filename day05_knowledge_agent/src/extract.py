@@ -0,0 +1,135 @@
+# src/extract.py
+"""
+Text extraction for the retriever, with a process pool and an on-disk cache.
+- Fans extraction out across processes per file, and per page range for large PDFs.
+- Caches extracted text by content hash, so re-chunking or refitting never re-parses a PDF.
+- Reports failures per file instead of silently skipping them.
+"""
+
+from __future__ import annotations
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .manifest import file_sha256
+except ImportError:
+    from manifest import file_sha256
+
+EXTRACTOR_VERSION = 1     # bump when extraction output changes, to invalidate the cache
+LARGE_PDF_PAGES = 32      # PDFs with more pages than this are split across workers
+PAGES_PER_TASK = 16
+
+def read_txt(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+def read_pdf_pages(path: str, start: int = 0, stop: Optional[int] = None) -> str:
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    out = []
+    for page in reader.pages[start:stop]:
+        try:
+            out.append(page.extract_text() or "")
+        except Exception:
+            pass  # one bad page should not lose the whole document
+    return "\n".join(out)
+
+def _read_part(path: str, start: int, stop: Optional[int]) -> str:
+    if path.lower().endswith(".pdf"):
+        return read_pdf_pages(path, start, stop)
+    return read_txt(path)
+
+class TextCache:
+    """Extracted text stored as <cache_dir>/<2 hex>/<sha256>-v<version>.txt."""
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}-v{EXTRACTOR_VERSION}.txt")
+
+    def get(self, digest: str) -> Optional[str]:
+        try:
+            with open(self._path(digest), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, digest: str, text: str):
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+def _plan(path: str) -> List[Tuple[int, Optional[int]]]:
+    """Split a file into (start, stop) page ranges; non-PDFs and small PDFs are one part."""
+    if not path.lower().endswith(".pdf"):
+        return [(0, None)]
+    from pypdf import PdfReader
+    n_pages = len(PdfReader(path).pages)
+    if n_pages <= LARGE_PDF_PAGES:
+        return [(0, None)]
+    return [(s, min(n_pages, s + PAGES_PER_TASK)) for s in range(0, n_pages, PAGES_PER_TASK)]
+
+def extract_texts(paths: Iterable[str], workers: int = 1, cache_dir: Optional[str] = None,
+                  digests: Optional[Dict[str, str]] = None) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Extract text for every path.
+    workers: number of processes; 1 extracts inline without a pool.
+    cache_dir: if set, text is looked up/stored by the file's SHA-256.
+    digests: optional precomputed {path: sha256} (e.g. from the ingest manifest).
+    Returns (texts, failures), both keyed by path; failures map to an error message.
+    """
+    paths = list(paths)
+    digests = dict(digests or {})
+    cache = TextCache(cache_dir) if cache_dir else None
+    texts: Dict[str, str] = {}
+    failures: Dict[str, str] = {}
+
+    todo = []
+    for path in paths:
+        if cache is not None:
+            try:
+                if path not in digests:
+                    digests[path] = file_sha256(path)
+            except OSError as e:
+                failures[path] = f"{type(e).__name__}: {e}"
+                continue
+            hit = cache.get(digests[path])
+            if hit is not None:
+                texts[path] = hit
+                continue
+        todo.append(path)
+
+    parts: Dict[str, List[Tuple[int, Optional[int]]]] = {}
+    for path in todo:
+        try:
+            parts[path] = _plan(path) if workers > 1 else [(0, None)]
+        except Exception as e:
+            failures[path] = f"{type(e).__name__}: {e}"
+
+    def collect(path, pieces):
+        text = "\n".join(pieces)
+        texts[path] = text
+        if cache is not None:
+            cache.put(digests[path], text)
+
+    if workers <= 1 or not parts:
+        for path, ranges in parts.items():
+            try:
+                collect(path, [_read_part(path, s, e) for s, e in ranges])
+            except Exception as e:
+                failures[path] = f"{type(e).__name__}: {e}"
+        return texts, failures
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {path: [pool.submit(_read_part, path, s, e) for s, e in ranges]
+                   for path, ranges in parts.items()}
+        for path, futs in futures.items():
+            try:
+                collect(path, [f.result() for f in futs])
+            except Exception as e:
+                failures[path] = f"{type(e).__name__}: {e}"
+    return texts, failures
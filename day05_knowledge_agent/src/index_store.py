@@ -0,0 +1,392 @@
+# src/index_store.py
+"""
+Versioned, memory-mapped on-disk format for the TF-IDF index.
+An index is a directory:
+  meta.json                   format version, dtype, vectorizer settings, counts
+  indptr.npy/indices.npy/data.npy   CSR matrix (data as float64, float32 or uint8)
+  idf.npy                     IDF weight per term
+  terms.bin + terms_off.npy   sorted vocabulary as one UTF-8 blob + offsets
+  texts.bin + texts_off.npy   chunk texts as one UTF-8 blob + offsets
+  doc_ids.npy/chunk_ids.npy + docs.json   chunk -> (doc_path, chunk_id)
+Version 2 adds hashing-vectorizer indexes (written by stream_index.py): the vectorizer
+settings carry "n_features", terms.bin is empty and idf.npy has one weight per hash bucket.
+Arrays are opened with np.load(mmap_mode="r"), so loading only reads metadata and
+the pages a query touches; concurrent agents share them through the page cache.
+Queries are analyzed without sklearn (word_analyzer), so answering from a mapped
+index never imports it.
+
+Usage:
+  python src/index_store.py migrate tfidf.index.pkl tfidf.index [--dtype float32]
+  python src/index_store.py info tfidf.index
+"""
+
+from __future__ import annotations
+import os, re, sys, json, time, shutil, argparse
+from collections import Counter
+from typing import Iterator, List, Sequence
+import numpy as np
+from scipy import sparse
+
+try:
+    from .retriever import Chunk, Index
+except ImportError:
+    from retriever import Chunk, Index
+
+FORMAT_NAME = "tfidf-mmap"
+FORMAT_VERSION = 2
+DTYPES = ("float64", "float32", "uint8")
+QUANT_LEVELS = 255  # uint8 codes; TF-IDF rows are L2-normalized so weights lie in [0, 1]
+
+# TfidfVectorizer settings needed to rebuild its analyzer/weighting at query time.
+VECTORIZER_PARAMS = ("lowercase", "stop_words", "token_pattern", "strip_accents", "analyzer",
+                     "ngram_range", "norm", "use_idf", "smooth_idf", "sublinear_tf", "binary")
+# HashingVectorizer settings for indexes built by stream_index.py.
+HASHING_PARAMS = ("lowercase", "stop_words", "token_pattern", "strip_accents", "analyzer",
+                  "ngram_range", "binary", "n_features")
+DEFAULT_TOKEN_PATTERN = r"(?u)\b\w\w+\b"   # TfidfVectorizer's default
+
+class BlobArray(Sequence):
+    """Read-only sequence of strings stored as one UTF-8 blob plus an offsets array."""
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def raw(self, i: int) -> bytes:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.raw(i).decode("utf-8")
+
+    def find(self, s: str) -> int:
+        """Binary search for s; entries must be sorted (UTF-8 byte order == code point order)."""
+        key = s.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.raw(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(self) and self.raw(lo) == key else -1
+
+class ChunkStore(Sequence):
+    """Lazy list of Chunk objects backed by the mapped arrays."""
+    def __init__(self, texts: BlobArray, doc_ids: np.ndarray, chunk_ids: np.ndarray, docs: List[str]):
+        self.texts = texts
+        self.doc_ids = doc_ids
+        self.chunk_ids = chunk_ids
+        self.docs = docs
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __getitem__(self, i: int) -> Chunk:
+        return Chunk(doc_path=self.docs[self.doc_ids[i]], chunk_id=int(self.chunk_ids[i]), text=self.texts[i])
+
+    def __iter__(self) -> Iterator[Chunk]:
+        for i in range(len(self)):
+            yield self[i]
+
+def _english_stop_words() -> frozenset:
+    """
+    sklearn's ENGLISH_STOP_WORDS, for indexes whose meta.json still says "english"
+    (save_index writes the list itself). Imports sklearn (~1 s with scipy).
+    """
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    return ENGLISH_STOP_WORDS
+
+def _stored_params(params: dict) -> dict:
+    """Vectorizer settings for meta.json, with stop_words="english" spelled out as the list."""
+    if params.get("stop_words") == "english":
+        params = dict(params, stop_words=sorted(_english_stop_words()))
+    return {k: list(v) if isinstance(v, tuple) else v for k, v in params.items()}
+
+def word_analyzer(params: dict):
+    """
+    The analyzer TfidfVectorizer(**params).build_analyzer() returns, for word
+    analyzers without accent stripping: lowercase, token_pattern, stop words,
+    word n-grams. None for any other settings (the caller falls back to sklearn).
+    """
+    if params.get("analyzer", "word") != "word" or params.get("strip_accents"):
+        return None
+    token_pattern = re.compile(params.get("token_pattern") or DEFAULT_TOKEN_PATTERN)
+    if token_pattern.groups > 1:
+        return None
+    stop_words = params.get("stop_words")
+    if stop_words == "english":
+        stop_words = _english_stop_words()
+    elif isinstance(stop_words, str):
+        return None
+    elif stop_words is not None:
+        stop_words = frozenset(stop_words)
+    lowercase = params.get("lowercase", True)
+    min_n, max_n = params.get("ngram_range", (1, 1))
+
+    def analyze(doc: str) -> List[str]:
+        tokens = token_pattern.findall(doc.lower() if lowercase else doc)
+        if stop_words:
+            tokens = [w for w in tokens if w not in stop_words]
+        if max_n == 1:
+            return tokens
+        grams = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            grams.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return grams
+    return analyze
+
+class QueryVectorizer:
+    """
+    Query-side stand-in for a fitted TfidfVectorizer: same analyzer and weighting,
+    but the vocabulary is a mapped sorted blob instead of a Python dict.
+    Output vectors use the matrix dtype; for uint8 indexes the dequantization
+    scale is folded into the query so matrix @ q.T yields the original scores.
+    """
+    def __init__(self, params: dict, terms: BlobArray, idf: np.ndarray, dtype, scale: float = 1.0):
+        self.params = params
+        self.terms = terms
+        self.idf_ = idf
+        self.dtype = dtype
+        self.scale = scale
+        self._analyze = word_analyzer(params)
+        if self._analyze is None:   # settings the local analyzer does not cover
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            self._analyze = TfidfVectorizer(**params).build_analyzer()
+
+    def get_feature_names_out(self) -> np.ndarray:
+        return np.array(list(self.terms), dtype=object)
+
+    def transform(self, raw_documents) -> sparse.csr_matrix:
+        rows, cols, vals = [], [], []
+        for r, doc in enumerate(raw_documents):
+            counts = Counter(self._analyze(doc))
+            ids, tf = [], []
+            for term, n in counts.items():
+                j = self.terms.find(term)
+                if j >= 0:
+                    ids.append(j)
+                    tf.append(n)
+            if not ids:
+                continue
+            w = np.asarray(tf, dtype=np.float64)
+            if self.params.get("binary"):
+                w = np.ones_like(w)
+            if self.params.get("sublinear_tf"):
+                w = np.log(w) + 1
+            if self.params.get("use_idf", True):
+                w = w * self.idf_[ids]
+            if self.params.get("norm") == "l2":
+                w = w / np.sqrt((w * w).sum())
+            elif self.params.get("norm") == "l1":
+                w = w / np.abs(w).sum()
+            rows.extend([r] * len(ids))
+            cols.extend(ids)
+            vals.extend((w * self.scale).tolist())
+        qdtype = np.float32 if self.dtype == np.uint8 else self.dtype
+        m = sparse.csr_matrix((vals, (rows, cols)), shape=(len(raw_documents), len(self.terms)), dtype=qdtype)
+        m.sort_indices()
+        return m
+
+class HashingQueryVectorizer:
+    """
+    Query-side vectorizer for indexes built out of core: terms are hashed into
+    n_features buckets (no vocabulary), then weighted with the streamed IDF.
+    Buckets with zero IDF (unseen or pruned by max_df) never match.
+    """
+    def __init__(self, params: dict, idf: np.ndarray, dtype, scale: float = 1.0):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        self.params = params
+        self.idf_ = idf
+        self.dtype = dtype
+        self.scale = scale
+        opts = {k: v for k, v in params.items() if k in HASHING_PARAMS}
+        self._hasher = HashingVectorizer(alternate_sign=False, norm=None, **opts)
+
+    def transform(self, raw_documents) -> sparse.csr_matrix:
+        from sklearn.preprocessing import normalize
+        m = sparse.csr_matrix(self._hasher.transform(raw_documents), dtype=np.float64)
+        if self.params.get("sublinear_tf"):
+            m.data = np.log(m.data) + 1
+        m.data *= np.asarray(self.idf_)[m.indices]
+        m.eliminate_zeros()
+        m = normalize(m, norm="l2") * self.scale
+        qdtype = np.float32 if self.dtype == np.uint8 else self.dtype
+        m = sparse.csr_matrix(m, dtype=qdtype)
+        m.sort_indices()
+        return m
+
+def _vocab_and_idf(vectorizer):
+    if isinstance(vectorizer, HashingQueryVectorizer):
+        return [], np.asarray(vectorizer.idf_), dict(vectorizer.params)
+    if isinstance(vectorizer, QueryVectorizer):
+        return list(vectorizer.terms), np.asarray(vectorizer.idf_), dict(vectorizer.params)
+    params = {k: v for k, v in vectorizer.get_params().items() if k in VECTORIZER_PARAMS}
+    return list(vectorizer.get_feature_names_out()), np.asarray(vectorizer.idf_), params
+
+def _write_blob(dirpath: str, name: str, strings):
+    offsets = [0]
+    with open(os.path.join(dirpath, f"{name}.bin"), "wb") as f:
+        for s in strings:
+            b = s.encode("utf-8")
+            f.write(b)
+            offsets.append(offsets[-1] + len(b))
+    np.save(os.path.join(dirpath, f"{name}_off.npy"), np.asarray(offsets, dtype=np.int64))
+
+def _read_blob(dirpath: str, name: str) -> BlobArray:
+    path = os.path.join(dirpath, f"{name}.bin")
+    offsets = np.load(os.path.join(dirpath, f"{name}_off.npy"), mmap_mode="r")
+    if os.path.getsize(path) == 0:
+        blob = np.zeros(0, dtype=np.uint8)
+    else:
+        blob = np.memmap(path, dtype=np.uint8, mode="r")
+    return BlobArray(blob, offsets)
+
+def _replace_dir(tmp: str, path: str):
+    """Swap tmp into place. Readers that already mapped the old files keep valid mappings."""
+    old = None
+    if os.path.exists(path):
+        old = f"{path}.old-{os.getpid()}"
+        os.rename(path, old)
+    os.rename(tmp, path)
+    if old:
+        shutil.rmtree(old, ignore_errors=True)
+
+def save_mapped(index: Index, path: str, dtype: str = "float32"):
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype must be one of {DTYPES}")
+    terms, idf, params = _vocab_and_idf(index.vectorizer)
+    m = sparse.csr_matrix(index.matrix)
+    data = np.asarray(m.data, dtype=np.float64)
+    scale = 1.0
+    if isinstance(index.vectorizer, (QueryVectorizer, HashingQueryVectorizer)):
+        data = data * index.vectorizer.scale  # undo a previous quantization
+    if dtype == "uint8":
+        scale = 1.0 / QUANT_LEVELS
+        data = np.clip(np.rint(data * QUANT_LEVELS), 0, QUANT_LEVELS)
+    idx_dtype = np.int32 if m.nnz < 2**31 else np.int64
+
+    tmp = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, "indptr.npy"), m.indptr.astype(idx_dtype))
+    np.save(os.path.join(tmp, "indices.npy"), m.indices.astype(idx_dtype))
+    np.save(os.path.join(tmp, "data.npy"), data.astype(dtype))
+    np.save(os.path.join(tmp, "idf.npy"), idf.astype(np.float64))
+    _write_blob(tmp, "terms", terms)
+
+    docs: List[str] = []
+    doc_pos = {}
+    doc_ids, chunk_ids = [], []
+    def texts():
+        for c in index.chunks:
+            if c.doc_path not in doc_pos:
+                doc_pos[c.doc_path] = len(docs)
+                docs.append(c.doc_path)
+            doc_ids.append(doc_pos[c.doc_path])
+            chunk_ids.append(c.chunk_id)
+            yield c.text
+    _write_blob(tmp, "texts", texts())
+    np.save(os.path.join(tmp, "doc_ids.npy"), np.asarray(doc_ids, dtype=np.int32))
+    np.save(os.path.join(tmp, "chunk_ids.npy"), np.asarray(chunk_ids, dtype=np.int32))
+    with open(os.path.join(tmp, "docs.json"), "w", encoding="utf-8") as f:
+        json.dump(docs, f)
+
+    publish_index(tmp, path, params, dtype, scale, m.shape, m.nnz, index.data_dir)
+
+def publish_index(tmp: str, path: str, params: dict, dtype: str, scale: float,
+                  shape: Sequence[int], nnz: int, data_dir: str):
+    """
+    Write meta.json into tmp, a directory holding every other file of an index, and
+    swap it in at path. Shared by save_mapped and stream_index.write_streaming.
+    """
+    meta = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "dtype": dtype,
+        "scale": scale,
+        "shape": [int(n) for n in shape],
+        "nnz": int(nnz),
+        "data_dir": data_dir,
+        "vectorizer": _stored_params(params),
+        "created": time.time(),
+    }
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    _replace_dir(tmp, path)
+
+def load_mapped(path: str) -> Index:
+    with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != FORMAT_NAME or meta.get("version", 0) > FORMAT_VERSION:
+        raise ValueError(f"Unsupported index format in {path}: {meta.get('format')} v{meta.get('version')}")
+
+    def arr(name):
+        return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+    matrix = sparse.csr_matrix((arr("data"), arr("indices"), arr("indptr")),
+                               shape=tuple(meta["shape"]), copy=False)
+    params = dict(meta["vectorizer"])
+    params["ngram_range"] = tuple(params["ngram_range"])
+    dtype = np.dtype(meta["dtype"]).type
+    if "n_features" in params:
+        vectorizer = HashingQueryVectorizer(params, arr("idf"), dtype, meta["scale"])
+    else:
+        vectorizer = QueryVectorizer(params, _read_blob(path, "terms"), arr("idf"), dtype, meta["scale"])
+    with open(os.path.join(path, "docs.json"), "r", encoding="utf-8") as f:
+        docs = json.load(f)
+    chunks = ChunkStore(_read_blob(path, "texts"), arr("doc_ids"), arr("chunk_ids"), docs)
+    return Index(vectorizer=vectorizer, matrix=matrix, chunks=chunks, data_dir=meta["data_dir"])
+
+def is_mapped(path: str) -> bool:
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, "meta.json"))
+
+def is_hashed(path: str) -> bool:
+    """True for a mapped index built by stream_index.py (hashed terms, no vocabulary)."""
+    if not is_mapped(path):
+        return False
+    with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+        return "n_features" in json.load(f)["vectorizer"]
+
+def disk_size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, n)) for root, _, names in os.walk(path) for n in names)
+    return os.path.getsize(path)
+
+def main(argv=None):
+    try:
+        from .retriever import load_index
+    except ImportError:
+        from retriever import load_index
+    parser = argparse.ArgumentParser(description="Inspect or migrate TF-IDF index files")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    mig = sub.add_parser("migrate", help="convert a pickled index to the mapped format")
+    mig.add_argument("src")
+    mig.add_argument("dst")
+    mig.add_argument("--dtype", choices=DTYPES, default="float32")
+    info = sub.add_parser("info", help="print size and load time of an index")
+    info.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "migrate":
+        idx = load_index(args.src)
+        save_mapped(idx, args.dst, dtype=args.dtype)
+        print(f"Migrated {len(idx.chunks)} chunks: {args.src} ({disk_size(args.src):,} B) "
+              f"-> {args.dst} ({disk_size(args.dst):,} B, {args.dtype})")
+        return 0
+
+    t0 = time.perf_counter()
+    idx = load_index(args.path)
+    secs = time.perf_counter() - t0
+    kind = "mapped" if is_mapped(args.path) else "pickle"
+    print(f"{args.path}: {kind}, {len(idx.chunks)} chunks, {idx.matrix.shape[1]} terms, "
+          f"{disk_size(args.path):,} B on disk, loaded in {secs * 1000:.1f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
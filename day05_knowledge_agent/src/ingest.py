@@ -2,19 +2,114 @@
 """
 Builds and saves the TF-IDF index from the ./data directory.
 Usage:
-  python src/ingest.py
+  python src/ingest.py                 # full rebuild into ./tfidf.index (memory-mapped)
+  python src/ingest.py --incremental   # only re-read added/changed files (not after --stream)
+  python src/ingest.py --workers 8 --cache-dir /tmp/textcache
+  python src/ingest.py --stream       # out-of-core build, bounded memory (hashed terms)
+  python src/ingest.py --dense pq     # also fit LSA vectors for engine="dense"/"hybrid"
 """
-import os
-from retriever import build_index, save_index
+import os, time, argparse
+from retriever import build_index, update_index, list_source_files, save_index, load_index, DENSE_DIR
+from manifest import scan, diff, load_manifest, save_manifest
+from index_store import is_hashed
+
+class PhaseTimer:
+    """Collects wall-clock durations for named ingest phases."""
+    def __init__(self):
+        self.phases = []
+
+    def run(self, name, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        out = fn(*args, **kwargs)
+        self.phases.append((name, time.perf_counter() - t0))
+        return out
+
+    def report(self):
+        for name, secs in self.phases:
+            print(f"  {name:<10} {secs:8.3f}s")
+
+def indexed_entries(current, failures):
+    """Manifest entries of the files that made it into the index; failed ones are retried next run."""
+    return {rel: e for rel, e in current.items() if rel not in failures}
 
 def main():
+    parser = argparse.ArgumentParser(description="Build the TF-IDF index from ./data")
+    parser.add_argument("--incremental", action="store_true",
+                        help="re-extract only files added/changed since the last run")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="extraction processes (default: all cores; 1 = no pool)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="extracted-text cache location (default: ./.text_cache)")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the text cache")
+    parser.add_argument("--dtype", choices=("float64", "float32", "uint8"), default="float32",
+                        help="storage type for TF-IDF weights (uint8 = quantized)")
+    parser.add_argument("--stream", action="store_true",
+                        help="out-of-core build: batched hashing vectorizer, text spilled to disk")
+    parser.add_argument("--batch-size", type=int, default=2048, help="chunks per batch for --stream")
+    parser.add_argument("--dense", choices=("float32", "pq"), default=None,
+                        help="also build the LSA/IVF dense index with this vector codec")
+    parser.add_argument("--dense-dim", type=int, default=128, help="LSA dimensions for --dense")
+    args = parser.parse_args()
+
     base = os.path.dirname(os.path.dirname(__file__))
     data_dir = os.path.join(base, "data")
-    out_path = os.path.join(base, "tfidf.index.pkl")
-    idx = build_index(data_dir)
-    save_index(idx, out_path)
+    out_path = os.path.join(base, "tfidf.index")
+    if args.incremental and not args.stream and is_hashed(out_path):
+        parser.error(f"{out_path} was built with --stream; --incremental would refit it as a vocabulary "
+                     "index. Rebuild it with --stream, or drop --incremental for a full vocabulary build.")
+    manifest_path = os.path.join(base, "tfidf.manifest.json")
+    cache_dir = None if args.no_cache else (args.cache_dir or os.path.join(base, ".text_cache"))
+    timer = PhaseTimer()
+
+    previous = load_manifest(manifest_path)
+    paths = timer.run("scan", list_source_files, data_dir)
+    current = timer.run("hash", scan, data_dir, paths, previous)
+    failures = {}
+    corpus_opts = dict(
+        workers=args.workers,
+        cache_dir=cache_dir,
+        digests={os.path.join(data_dir, rel): e.sha256 for rel, e in current.items()},
+        failures=failures,
+    )
+
+    incremental = args.incremental and previous and os.path.exists(out_path) and not args.stream
+    if args.incremental and not incremental:
+        print("No previous index/manifest found (or --stream given); doing a full build.")
+
+    if incremental:
+        changes = diff(previous, current)
+        print(f"Changes: {changes.summary()}")
+        for label, rels in (("+", changes.added), ("~", changes.changed), ("-", changes.removed)):
+            for rel in rels:
+                print(f"  {label} {rel}")
+        if changes.is_empty():
+            save_manifest(indexed_entries(current, failures), manifest_path)  # refresh mtimes of touched files
+            print("Index is up to date.")
+            timer.report()
+            return
+        old = timer.run("load", load_index, out_path)
+        idx = timer.run("update", update_index, old, data_dir, changes.refresh, changes.removed,
+                        **corpus_opts)
+    elif args.stream:
+        from stream_index import build_streaming
+        timer.run("stream", build_streaming, data_dir, out_path, batch_size=args.batch_size,
+                  dtype=args.dtype, **corpus_opts)
+        idx = load_index(out_path)
+    else:
+        idx = timer.run("build", build_index, data_dir, **corpus_opts)
+
+    for rel, err in sorted(failures.items()):
+        print(f"  ! failed to read {rel}: {err}")
+    if not args.stream:
+        timer.run("save", save_index, idx, out_path, dtype=args.dtype)
+    if args.dense:
+        from dense import DenseEngine
+        dense = timer.run("dense", DenseEngine.build, idx.matrix, dim=args.dense_dim, codec=args.dense)
+        dense.save(os.path.join(out_path, DENSE_DIR))
+    save_manifest(indexed_entries(current, failures), manifest_path)
     print(f"Indexed {len(idx.chunks)} chunks from {data_dir}")
     print(f"Saved index to {out_path}")
+    timer.report()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,97 @@
+# src/manifest.py
+"""
+Per-file manifest for incremental ingest.
+- Records path, size, mtime and SHA-256 of every indexed file.
+- Diffs a fresh scan against the previous manifest (added/changed/removed).
+- Only re-hashes files whose size or mtime moved, so scans stay cheap.
+"""
+
+from __future__ import annotations
+import os, json, hashlib
+from dataclasses import dataclass, asdict, field
+from typing import Dict, Iterable, List, Optional
+
+MANIFEST_VERSION = 1
+
+@dataclass
+class FileEntry:
+    path: str      # relative to data_dir
+    size: int
+    mtime: float
+    sha256: str
+
+@dataclass
+class ManifestDiff:
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+
+    @property
+    def refresh(self) -> List[str]:
+        return self.added + self.changed
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.changed or self.removed)
+
+    def summary(self) -> str:
+        return (f"{len(self.added)} added, {len(self.changed)} changed, "
+                f"{len(self.removed)} removed, {len(self.unchanged)} unchanged")
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def scan(data_dir: str, paths: Iterable[str],
+         previous: Optional[Dict[str, FileEntry]] = None) -> Dict[str, FileEntry]:
+    """
+    Build manifest entries for paths (absolute or relative to cwd).
+    Hashes are reused from previous when size and mtime are unchanged.
+    """
+    previous = previous or {}
+    entries: Dict[str, FileEntry] = {}
+    for path in paths:
+        rel = os.path.relpath(path, data_dir)
+        st = os.stat(path)
+        old = previous.get(rel)
+        if old is not None and old.size == st.st_size and old.mtime == st.st_mtime:
+            digest = old.sha256
+        else:
+            digest = file_sha256(path)
+        entries[rel] = FileEntry(path=rel, size=st.st_size, mtime=st.st_mtime, sha256=digest)
+    return entries
+
+def diff(old: Dict[str, FileEntry], new: Dict[str, FileEntry]) -> ManifestDiff:
+    """Compare by content hash; a touched-but-identical file counts as unchanged."""
+    d = ManifestDiff()
+    for rel in sorted(new):
+        if rel not in old:
+            d.added.append(rel)
+        elif old[rel].sha256 != new[rel].sha256:
+            d.changed.append(rel)
+        else:
+            d.unchanged.append(rel)
+    d.removed = sorted(rel for rel in old if rel not in new)
+    return d
+
+def load_manifest(path: str) -> Dict[str, FileEntry]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    if payload.get("version") != MANIFEST_VERSION:
+        return {}
+    return {e["path"]: FileEntry(**e) for e in payload.get("files", [])}
+
+def save_manifest(entries: Dict[str, FileEntry], path: str):
+    payload = {
+        "version": MANIFEST_VERSION,
+        "files": [asdict(entries[rel]) for rel in sorted(entries)],
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=1)
+    os.replace(tmp, path)
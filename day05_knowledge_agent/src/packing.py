@@ -0,0 +1,119 @@
+# src/packing.py
+"""
+Context packing for the LLM prompt.
+- Hits from the same document whose character spans touch or overlap (neighbouring
+  chunks share CHUNK_OVERLAP characters) are merged into one passage, with one
+  citation tag covering the chunk range, e.g. [doc.pdf#3-4].
+- Passages that are near-duplicates of a better-ranked one (word-shingle Jaccard)
+  are dropped.
+- The budget is counted in model tokens (tiktoken when installed, else ~4 chars/token).
+"""
+
+from __future__ import annotations
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+try:
+    from .retriever import CHUNK_SIZE, CHUNK_OVERLAP
+except ImportError:
+    from retriever import CHUNK_SIZE, CHUNK_OVERLAP
+
+MAX_CONTEXT_TOKENS = 550   # roughly the old 2200-character budget
+DUP_THRESHOLD = 0.8        # shingle Jaccard above which a passage counts as a repeat
+SHINGLE_WORDS = 5
+SEPARATOR = "\n---\n"
+
+@dataclass
+class Passage:
+    doc_path: str
+    first: int        # first chunk_id covered
+    last: int         # last chunk_id covered
+    start: int        # character span in the normalized document text
+    end: int
+    text: str
+    score: float      # best score of the merged hits
+
+    @property
+    def tag(self) -> str:
+        ids = f"{self.first}" if self.first == self.last else f"{self.first}-{self.last}"
+        return f"[{self.doc_path}#{ids}]"
+
+    def block(self) -> str:
+        return f"{self.tag}\n{self.text.strip()}\n"
+
+def merge_hits(retrieved, stride: int = CHUNK_SIZE - CHUNK_OVERLAP) -> List[Passage]:
+    """
+    retrieved: List[(Chunk, score)]. Chunk i of a document starts at i * stride, so
+    spans are known without storing offsets. Returns passages ordered by best score.
+    """
+    by_doc: Dict[str, List[Tuple[object, float]]] = {}
+    for chunk, score in retrieved:
+        by_doc.setdefault(chunk.doc_path, []).append((chunk, score))
+    passages: List[Passage] = []
+    for doc_path, hits in by_doc.items():
+        cur: Optional[Passage] = None
+        for chunk, score in sorted(hits, key=lambda h: h[0].chunk_id):
+            start = chunk.chunk_id * stride
+            end = start + len(chunk.text)
+            if cur is not None and start <= cur.end:
+                if end > cur.end:
+                    cur.text += chunk.text[cur.end - start:]
+                    cur.end = end
+                cur.last = max(cur.last, chunk.chunk_id)
+                cur.score = max(cur.score, score)
+                continue
+            cur = Passage(doc_path, chunk.chunk_id, chunk.chunk_id, start, end, chunk.text, score)
+            passages.append(cur)
+    order = {id(p): i for i, p in enumerate(passages)}
+    return sorted(passages, key=lambda p: (-p.score, order[id(p)]))
+
+def _shingles(text: str, n: int = SHINGLE_WORDS) -> Set[Tuple[str, ...]]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= n:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+def drop_near_duplicates(passages: List[Passage], threshold: float = DUP_THRESHOLD) -> List[Passage]:
+    """Keep passages in order, skipping any too similar to one already kept."""
+    kept: List[Passage] = []
+    seen: List[Set[Tuple[str, ...]]] = []
+    for p in passages:
+        sh = _shingles(p.text)
+        if any(sh and len(sh & s) / len(sh | s) >= threshold for s in seen):
+            continue
+        kept.append(p)
+        seen.append(sh)
+    return kept
+
+def _token_counter() -> Callable[[str], int]:
+    try:
+        import tiktoken
+        enc = tiktoken.get_encoding("o200k_base")
+        return lambda s: len(enc.encode(s))
+    except Exception:   # not installed, or no encoding files offline
+        return lambda s: (len(s) + 3) // 4
+
+_count: Optional[Callable[[str], int]] = None
+
+def count_tokens(text: str) -> int:
+    global _count
+    if _count is None:
+        _count = _token_counter()
+    return _count(text)
+
+def pack(retrieved, max_tokens: int = MAX_CONTEXT_TOKENS) -> List[Passage]:
+    """Merge, de-duplicate and fit passages into max_tokens (the best one always goes in)."""
+    out: List[Passage] = []
+    used = 0
+    sep = count_tokens(SEPARATOR)
+    for p in drop_near_duplicates(merge_hits(retrieved)):
+        cost = count_tokens(p.block()) + (sep if out else 0)
+        if used + cost > max_tokens and out:
+            continue   # a shorter, lower-ranked passage may still fit
+        out.append(p)
+        used += cost
+    return out
+
+def format_passages(passages: List[Passage]) -> str:
+    return SEPARATOR.join(p.block() for p in passages)
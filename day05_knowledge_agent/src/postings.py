@@ -0,0 +1,115 @@
+# src/postings.py
+"""
+Inverted-index top-k engine (MaxScore) over the existing TF-IDF weights.
+- Posting lists are per-term chunk ids (ascending) with their TF-IDF weights.
+- Each term keeps its max weight, giving an upper bound on its score contribution.
+- Query terms whose combined bound cannot beat the current k-th score are only
+  probed for candidates found through the other terms, so most postings of
+  frequent terms are never touched.
+Scores of the final top-k are recomputed with the same sparse product as
+brute-force retrieval, so returned values match retriever.retrieve.
+"""
+
+from __future__ import annotations
+import heapq
+from typing import List, Tuple
+import numpy as np
+from scipy import sparse
+
+class PostingsEngine:
+    name = "maxscore"
+
+    def __init__(self, matrix):
+        csc = sparse.csc_matrix(matrix, dtype=np.float64)
+        csc.sort_indices()
+        self.matrix = matrix
+        self.indptr = csc.indptr
+        self.docs = csc.indices
+        self.weights = csc.data
+        n_terms = csc.shape[1]
+        self.max_weight = np.zeros(n_terms, dtype=np.float64)
+        nonempty = np.diff(self.indptr) > 0
+        self.max_weight[nonempty] = np.maximum.reduceat(self.weights, self.indptr[:-1][nonempty])
+        self.touched = 0  # postings visited by the last search (for benchmarks)
+
+    def _postings(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        lo, hi = self.indptr[term], self.indptr[term + 1]
+        return self.docs[lo:hi], self.weights[lo:hi]
+
+    def search(self, qv, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k chunk ids and scores for one query vector (1 x n_terms CSR row).
+        Ordered by score desc, then chunk id asc; only positive scores are returned.
+        """
+        self.touched = 0
+        q_terms = qv.indices
+        q_weights = qv.data.astype(np.float64)
+        if k <= 0 or len(q_terms) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        # Terms sorted by increasing upper bound; prefix sums give the non-essential cut.
+        ub = q_weights * self.max_weight[q_terms]
+        order = np.argsort(ub, kind="stable")
+        terms = [self._postings(t) for t in q_terms[order]]
+        qw = q_weights[order]
+        ub = ub[order]
+        prefix = np.cumsum(ub)
+        n = len(terms)
+        cursors = [0] * n
+
+        heap: List[Tuple[float, int]] = []   # (score, -doc): min-heap of current top-k
+        theta = 0.0
+        first_essential = 0                  # terms [0, first_essential) are non-essential
+
+        while True:
+            # next candidate = smallest current doc among essential lists
+            doc = -1
+            for t in range(first_essential, n):
+                docs = terms[t][0]
+                c = cursors[t]
+                if c < len(docs) and (doc < 0 or docs[c] < doc):
+                    doc = docs[c]
+            if doc < 0:
+                break
+
+            score = 0.0
+            for t in range(first_essential, n):
+                docs, w = terms[t]
+                c = cursors[t]
+                if c < len(docs) and docs[c] == doc:
+                    score += qw[t] * w[c]
+                    cursors[t] = c + 1
+                    self.touched += 1
+            # probe non-essential lists, highest bound first, while the doc can still win
+            for t in range(first_essential - 1, -1, -1):
+                if score + prefix[t] <= theta:
+                    break
+                docs, w = terms[t]
+                lo = cursors[t]   # candidates arrive in increasing doc order, so never look back
+                c = lo + int(np.searchsorted(docs[lo:], doc))
+                cursors[t] = c
+                self.touched += 1
+                if c < len(docs) and docs[c] == doc:
+                    score += qw[t] * w[c]
+
+            if score <= 0:
+                continue
+            if len(heap) < k:
+                heapq.heappush(heap, (score, -doc))
+            elif score > theta:
+                heapq.heapreplace(heap, (score, -doc))
+            else:
+                continue
+            if len(heap) == k:
+                theta = heap[0][0]
+                while first_essential < n and prefix[first_essential] <= theta:
+                    first_essential += 1
+
+        ids = np.array(sorted(-d for _, d in heap), dtype=np.int64)
+        if len(ids) == 0:
+            return ids, np.zeros(0)
+        # exact rescoring with the same arithmetic as the brute-force path
+        exact = (self.matrix[ids] @ qv.T).toarray().ravel()
+        keep = exact > 0
+        ids, exact = ids[keep], exact[keep]
+        rank = np.lexsort((ids, -exact))
+        return ids[rank], exact[rank]
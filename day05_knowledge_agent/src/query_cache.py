@@ -0,0 +1,151 @@
+# src/query_cache.py
+"""
+Two-level result cache for the knowledge agent.
+- Level 1: normalized question (+ k) -> retrieved hits and the packed context block.
+- Level 2: SHA-256 of (model, context block, question) -> LLM answer text.
+- Each level is a size-bounded LRU with a TTL; both persist to one JSON file.
+- Entries are tagged with the index version, so rebuilding the index empties the cache.
+"""
+
+from __future__ import annotations
+import os, re, json, time, hashlib, threading
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
+
+CACHE_VERSION = 2   # bump when the packed context format changes
+MAX_ENTRIES = 512
+TTL_SECONDS = 7 * 24 * 3600
+
+def normalize_query(q: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the retrieval."""
+    return re.sub(r"\s+", " ", q).strip().lower().rstrip("?!. ")
+
+def index_version(path: str) -> str:
+    """
+    Cheap fingerprint of an index on disk, without loading it: meta.json of a
+    mapped index directory (rewritten on every save), or size+mtime of a pickle.
+    """
+    meta = os.path.join(path, "meta.json")
+    if os.path.isdir(path) and os.path.exists(meta):
+        with open(meta, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()[:16]
+    st = os.stat(path)
+    return f"{st.st_size:x}-{st.st_mtime_ns:x}"
+
+def answer_key(model: str, context_block: str, question: str) -> str:
+    h = hashlib.sha256()
+    for part in (model, context_block, question):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0     # dropped to stay within max_entries
+    expired: int = 0       # dropped because older than ttl
+
+class LRUCache:
+    """
+    OrderedDict-backed LRU; values are stored with their insertion time.
+    A lock makes one instance safe to share between server worker threads.
+    """
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl: float = TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.stats = CacheStats()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Any]:
+        with self.lock:
+            return self._get(key, time.time() if now is None else now)
+
+    def _get(self, key: str, now: float) -> Optional[Any]:
+        item = self.entries.get(key)
+        if item is not None and now - item[0] > self.ttl:
+            del self.entries[key]
+            self.stats.expired += 1
+            item = None
+        if item is None:
+            self.stats.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats.hits += 1
+        return item[1]
+
+    def put(self, key: str, value: Any, now: Optional[float] = None):
+        with self.lock:
+            self._put(key, value, time.time() if now is None else now)
+
+    def _put(self, key: str, value: Any, now: float):
+        self.entries[key] = (now, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def to_payload(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"entries": [[k, t, v] for k, (t, v) in self.entries.items()], "stats": asdict(self.stats)}
+
+    def load_payload(self, payload: Dict[str, Any]):
+        for k, t, v in payload.get("entries", []):
+            self.put(k, v, now=t)
+        self.stats = CacheStats(**payload.get("stats", {}))
+
+class QueryCache:
+    """
+    Both cache levels for one index. path: JSON file; version: index_version() of
+    the index the entries were computed from. A version mismatch on load starts empty.
+    """
+    def __init__(self, path: str, version: str, max_entries: int = MAX_ENTRIES, ttl: float = TTL_SECONDS):
+        self.path = path
+        self.version = version
+        self.retrieval = LRUCache(max_entries, ttl)
+        self.answers = LRUCache(max_entries, ttl)
+        self.invalidated = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return  # a corrupt cache is just a cold cache
+        if payload.get("cache_version") != CACHE_VERSION:
+            return
+        if payload.get("index_version") != self.version:
+            self.invalidated = True
+            return
+        self.retrieval.load_payload(payload.get("retrieval", {}))
+        self.answers.load_payload(payload.get("answers", {}))
+
+    def save(self):
+        payload = {
+            "cache_version": CACHE_VERSION,
+            "index_version": self.version,
+            "retrieval": self.retrieval.to_payload(),
+            "answers": self.answers.to_payload(),
+        }
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def retrieval_key(question: str, k: int) -> str:
+        return f"{k}:{normalize_query(question)}"
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            "retrieval": {**asdict(self.retrieval.stats), "entries": len(self.retrieval)},
+            "answers": {**asdict(self.answers.stats), "entries": len(self.answers)},
+        }
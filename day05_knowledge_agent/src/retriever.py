@@ -1,21 +1,31 @@
 # src/retriever.py
 """
-Simple local TF-IDF retriever with chunking and pickle persistence.
-- Supports .txt and .pdf from a data directory.
+Simple local TF-IDF retriever with chunking and on-disk persistence.
+- Supports .txt and .pdf from a data directory (extraction lives in extract.py).
 - Chunks text into ~800-character windows with 200-character overlap.
-- Builds a TF-IDF matrix for fast top-k retrieval.
+- Builds a TF-IDF matrix for fast top-k retrieval. sklearn is only imported to fit one.
 """
 
 from __future__ import annotations
 import os, re, pickle
-from dataclasses import dataclass
-from typing import List, Tuple
+from dataclasses import dataclass, replace
+from typing import Dict, Iterable, Iterator, List, Optional, Protocol, Tuple
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from pypdf import PdfReader
+
+try:
+    from .extract import extract_texts
+except ImportError:
+    from extract import extract_texts
 
 CHUNK_SIZE = 800
 CHUNK_OVERLAP = 200
+SUPPORTED_EXTS = (".txt", ".pdf")
+FILE_BATCH = 64   # files extracted per batch by iter_corpus
+QUERY_BLOCK = 256  # queries scored per sparse product in retrieve_many
+DENSE_DIR = "dense"  # saved dense.DenseEngine inside a mapped index directory
+
+# shared by TfidfVectorizer (fit_index) and the hashing path (stream_index.py)
+VECTORIZER_OPTS = dict(lowercase=True, stop_words="english", max_df=0.9, ngram_range=(1, 2))
 
 @dataclass
 class Chunk:
@@ -23,20 +33,6 @@ class Chunk:
     chunk_id: int
     text: str
 
-def _read_txt(path: str) -> str:
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        return f.read()
-
-def _read_pdf(path: str) -> str:
-    reader = PdfReader(path)
-    out = []
-    for page in reader.pages:
-        try:
-            out.append(page.extract_text() or "")
-        except Exception:
-            pass
-    return "\n".join(out)
-
 def _normalize(s: str) -> str:
     s = re.sub(r"\s+", " ", s).strip()
     return s
@@ -54,57 +50,193 @@ def _chunk(text: str, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP) -> List[str]
             break
     return chunks
 
-def load_corpus(data_dir: str) -> List[Chunk]:
-    chunks: List[Chunk] = []
+def list_source_files(data_dir: str) -> List[str]:
+    """Return all indexable files under data_dir, sorted for stable chunk order."""
+    paths = []
     for root, _, files in os.walk(data_dir):
         for name in files:
-            path = os.path.join(root, name)
-            ext = os.path.splitext(name.lower())[1]
-            if ext not in [".txt", ".pdf"]:
-                continue
-            try:
-                text = _read_txt(path) if ext == ".txt" else _read_pdf(path)
-                if not text.strip():
-                    continue
-                for i, c in enumerate(_chunk(text)):
-                    chunks.append(Chunk(doc_path=os.path.relpath(path, data_dir), chunk_id=i, text=c))
-            except Exception:
-                # Skip unreadable files gracefully
+            if os.path.splitext(name.lower())[1] in SUPPORTED_EXTS:
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+def iter_corpus(data_dir: str, paths: Optional[Iterable[str]] = None, workers: int = 1,
+                cache_dir: Optional[str] = None, digests: Optional[Dict[str, str]] = None,
+                failures: Optional[Dict[str, str]] = None, file_batch: int = FILE_BATCH) -> Iterator[Chunk]:
+    """
+    Read and chunk files under data_dir, yielding chunks as they are produced.
+    Files are extracted file_batch at a time, so only one batch of text is in memory.
+    paths: only read these files (used by incremental ingest); default is every source file.
+    workers / cache_dir / digests: passed to extract.extract_texts.
+    failures: if given, filled with {relative path: error} for files that could not be read.
+    """
+    if paths is None:
+        paths = list_source_files(data_dir)
+    paths = [p for p in paths if os.path.splitext(p.lower())[1] in SUPPORTED_EXTS]
+    for start in range(0, len(paths), file_batch):
+        batch = paths[start:start + file_batch]
+        texts, errors = extract_texts(batch, workers=workers, cache_dir=cache_dir, digests=digests)
+        if failures is not None:
+            failures.update({os.path.relpath(p, data_dir): err for p, err in errors.items()})
+        for path in batch:
+            text = texts.get(path, "")
+            if not text.strip():
                 continue
-    return chunks
+            for i, c in enumerate(_chunk(text)):
+                yield Chunk(doc_path=os.path.relpath(path, data_dir), chunk_id=i, text=c)
+
+def load_corpus(data_dir: str, **opts) -> List[Chunk]:
+    """All chunks of iter_corpus as a list (same options)."""
+    return list(iter_corpus(data_dir, **opts))
+
+class Vectorizer(Protocol):
+    """What retrieval needs of a vectorizer: a fitted TfidfVectorizer, or index_store's
+    QueryVectorizer / HashingQueryVectorizer for a memory-mapped index."""
+    def transform(self, raw_documents): ...
 
 @dataclass
 class Index:
-    vectorizer: TfidfVectorizer
-    matrix: np.ndarray
-    chunks: List[Chunk]
+    vectorizer: Vectorizer        # TfidfVectorizer, or index_store.QueryVectorizer when memory-mapped
+    matrix: np.ndarray            # scipy CSR, one row per chunk
+    chunks: List[Chunk]           # or index_store.ChunkStore when memory-mapped
     data_dir: str
+    engine: Optional[object] = None   # e.g. postings.PostingsEngine; None = brute-force scoring
 
-def build_index(data_dir: str) -> Index:
-    chunks = load_corpus(data_dir)
+def fit_index(chunks: List[Chunk], data_dir: str) -> Index:
     texts = [c.text for c in chunks]
     if not texts:
         raise RuntimeError(f"No usable .txt or .pdf files found in {data_dir}")
-    vectorizer = TfidfVectorizer(
-        lowercase=True,
-        stop_words="english",
-        max_df=0.9,
-        min_df=1,
-        ngram_range=(1,2)
-    )
+    from sklearn.feature_extraction.text import TfidfVectorizer   # ~1 s; queries on a mapped index never need it
+    vectorizer = TfidfVectorizer(min_df=1, **VECTORIZER_OPTS)
     matrix = vectorizer.fit_transform(texts)
     return Index(vectorizer=vectorizer, matrix=matrix, chunks=chunks, data_dir=data_dir)
 
-def save_index(index: Index, path: str):
-    with open(path, "wb") as f:
-        pickle.dump(index, f)
+def build_index(data_dir: str, **corpus_opts) -> Index:
+    """corpus_opts are forwarded to load_corpus (workers, cache_dir, digests, failures)."""
+    return fit_index(load_corpus(data_dir, **corpus_opts), data_dir)
+
+def update_index(index: Index, data_dir: str, refresh: Iterable[str] = (), drop: Iterable[str] = (),
+                 **corpus_opts) -> Index:
+    """
+    Rebuild an index after some files changed, without re-reading the others.
+    refresh: paths (relative to data_dir) that were added or modified.
+    drop: paths (relative to data_dir) that were deleted.
+    Chunks of untouched files are reused as-is; only the refreshed files are
+    extracted again. The vectorizer is refit on the combined chunk texts,
+    because IDF weights and the n-gram vocabulary depend on the whole corpus.
+    Indexes built by stream_index.py (hashed terms) are rejected: refitting would
+    turn them into an in-memory vocabulary index.
+    """
+    if "n_features" in getattr(index.vectorizer, "params", {}):
+        raise ValueError("update_index cannot refresh a hashed (streamed) index; rebuild it with stream_index")
+    refresh = list(refresh)
+    stale = set(refresh) | set(drop)
+    kept = [c for c in index.chunks if c.doc_path not in stale]
+    fresh = load_corpus(data_dir, paths=[os.path.join(data_dir, p) for p in refresh], **corpus_opts)
+    return fit_index(kept + fresh, data_dir)
+
+def _index_store():
+    try:
+        from . import index_store
+    except ImportError:
+        import index_store
+    return index_store
+
+def save_index(index: Index, path: str, dtype: str = "float32"):
+    """
+    Paths ending in .pkl are pickled (legacy); anything else is written as a
+    memory-mapped index directory (see index_store.py). dtype applies to the latter.
+    """
+    if path.endswith(".pkl"):
+        with open(path, "wb") as f:
+            pickle.dump(replace(index, engine=None), f)
+        return
+    _index_store().save_mapped(index, path, dtype=dtype)
+
+ENGINES = ("brute", "maxscore", "dense", "hybrid")
+
+def _postings():
+    try:
+        from . import postings
+    except ImportError:
+        import postings
+    return postings
+
+def _dense():
+    try:
+        from . import dense
+    except ImportError:
+        import dense
+    return dense
+
+def use_engine(index: Index, engine: str = "brute", dense_path: Optional[str] = None, **opts) -> Index:
+    """
+    Select the query engine: "brute" scores every chunk with one sparse product;
+    "maxscore" walks posting lists and skips chunks that cannot reach the top-k
+    (pays off on large corpora, see benchmarks/bench_engines.py); "dense" searches
+    LSA vectors through an IVF index and "hybrid" fuses brute + dense by reciprocal
+    rank (see dense.py). dense_path: saved DenseEngine to map instead of refitting;
+    opts go to DenseEngine.build when it has to be fitted.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {ENGINES}")
+    if engine == "brute":
+        index.engine = None
+    elif engine == "maxscore":
+        index.engine = _postings().PostingsEngine(index.matrix)
+    else:
+        dense = _dense()
+        vecs = dense.DenseEngine.load(dense_path, index.matrix.shape) if dense_path else None
+        vecs = vecs or dense.DenseEngine.build(index.matrix, **opts)
+        index.engine = vecs if engine == "dense" else dense.HybridEngine(index.matrix, vecs)
+    return index
+
+def load_index(path: str, engine: str = "brute", **opts) -> Index:
+    """engine/opts: see use_engine; mapped indexes pick up a saved <path>/dense/ engine."""
+    if os.path.isdir(path):
+        index = _index_store().load_mapped(path)
+        opts.setdefault("dense_path", os.path.join(path, DENSE_DIR))
+    else:
+        with open(path, "rb") as f:
+            index = pickle.load(f)
+    return use_engine(index, engine, **opts)
+
+def _top_k(scores: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Best k (id, score) pairs among positive scores, ordered by score desc then id asc.
+    Uses argpartition-style selection (O(n)) and only sorts the survivors.
+    """
+    keep = scores > 0
+    scores, ids = scores[keep], ids[keep]
+    if len(scores) > k:
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        keep = scores >= kth          # keep ties at the boundary so the cut is deterministic
+        scores, ids = scores[keep], ids[keep]
+    order = np.lexsort((ids, -scores))[:k]
+    return ids[order], scores[order]
 
-def load_index(path: str) -> Index:
-    with open(path, "rb") as f:
-        return pickle.load(f)
+def retrieve_many(index: Index, queries: List[str], k: int = 4,
+                  block_size: int = QUERY_BLOCK) -> List[List[Tuple[Chunk, float]]]:
+    """
+    Retrieve top-k chunks for many queries at once.
+    Queries are vectorized and scored block_size at a time with one sparse-sparse
+    product per block, so memory stays bounded by block_size x matching chunks.
+    """
+    results: List[List[Tuple[Chunk, float]]] = []
+    if k <= 0:
+        return [[] for _ in queries]
+    for start in range(0, len(queries), block_size):
+        qv = index.vectorizer.transform(queries[start:start + block_size])
+        if index.engine is not None:
+            for r in range(qv.shape[0]):
+                ids, vals = index.engine.search(qv[r], k)
+                results.append([(index.chunks[int(i)], float(v)) for i, v in zip(ids, vals)])
+            continue
+        scores = (index.matrix @ qv.T).T.tocsr()   # (block, n_chunks), sparse
+        for r in range(scores.shape[0]):
+            lo, hi = scores.indptr[r], scores.indptr[r + 1]
+            ids, vals = _top_k(scores.data[lo:hi], scores.indices[lo:hi], k)
+            results.append([(index.chunks[int(i)], float(v)) for i, v in zip(ids, vals)])
+    return results
 
 def retrieve(index: Index, query: str, k: int = 4) -> List[Tuple[Chunk, float]]:
-    qv = index.vectorizer.transform([query])
-    scores = (index.matrix @ qv.T).toarray().ravel()
-    top = np.argsort(scores)[::-1][:k]
-    return [(index.chunks[i], float(scores[i])) for i in top if scores[i] > 0]
+    return retrieve_many(index, [query], k)[0]
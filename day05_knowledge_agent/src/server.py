@@ -0,0 +1,253 @@
+# src/server.py
+"""
+Resident retrieval service for the knowledge agent.
+- Loads the index, query cache and LLM client (shared/llm.py) once and keeps them warm.
+- Serves JSON over local HTTP with asyncio; retrieval and LLM calls run in a thread pool.
+- Polls the index fingerprint and hot-swaps to a new index after ingest.py writes one.
+  Requests already running keep the index object they started with.
+- The client half (is_running/request) only needs the standard library, so agent.py
+  can forward questions without importing numpy, sklearn or openai. asyncio, the
+  thread pool and urllib are imported where they are used: with no server listening,
+  is_running() costs one refused TCP connect. /health is answered on the event loop,
+  so a pool busy with retrieval and LLM calls does not make the probe time out.
+
+Usage:
+  python src/server.py [--host 127.0.0.1] [--port 8765] [--workers 4] [--engine brute]
+  DAY05_SERVER=127.0.0.1:9000 python src/agent.py "..."   # client side
+
+Endpoints:
+  GET  /health                              {"index_version", "chunks"}
+  GET  /stats                               query cache counters (+ "llm" once the client exists)
+  POST /retrieve {"question", "k"}          {"hits": [[doc_path, chunk_id, score], ...]}
+  POST /answer   {"question", "cache"}      {"hits", "context", "answer"}
+  GET  /metrics                             per-stage latency histograms, Prometheus text
+"""
+
+from __future__ import annotations
+import os, sys, json, socket, threading, argparse
+from typing import Optional, Tuple
+
+DEFAULT_ADDR = "127.0.0.1:8765"
+POLL_SECONDS = 2.0       # how often the index fingerprint is checked
+HEALTH_TIMEOUT = 2.0     # is_running's /health probe; answered on the event loop, not behind the pool
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+def server_addr() -> Tuple[str, int]:
+    host, port = os.getenv("DAY05_SERVER", DEFAULT_ADDR).rsplit(":", 1)
+    return host, int(port)
+
+def request(method: str, path: str, payload: Optional[dict] = None,
+            addr: Optional[Tuple[str, int]] = None, timeout: float = 120.0) -> dict:
+    import urllib.request, urllib.error
+    host, port = addr or server_addr()
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(f"http://{host}:{port}{path}", data=data, method=method,
+                                 headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(f"server error {e.code}: {e.read().decode('utf-8', 'replace')}") from None
+
+def is_running(addr: Optional[Tuple[str, int]] = None, timeout: float = HEALTH_TIMEOUT) -> bool:
+    addr = addr or server_addr()
+    try:
+        socket.create_connection(addr, timeout=timeout).close()   # nothing listening: done, no urllib
+        request("GET", "/health", addr=addr, timeout=timeout)
+        return True
+    except (OSError, ValueError, RuntimeError):
+        return False
+
+def _modules():
+    """(agent, retriever, query_cache), imported on first use so clients stay light."""
+    try:
+        from . import agent, retriever, query_cache
+    except ImportError:
+        import agent, retriever, query_cache
+    return agent, retriever, query_cache
+
+class IndexHolder:
+    """The current index, its fingerprint and the query cache that belongs to it."""
+    def __init__(self, index_path: str, cache_path: Optional[str], engine: str = "brute"):
+        self.index_path = index_path
+        self.cache_path = cache_path
+        self.engine = engine
+        self.lock = threading.Lock()     # guards the swap, not the reads
+        self.save_lock = threading.Lock()
+        self._saved = None               # cache stats at the last save, to skip idle writes
+        self.version = None
+        self.index = None
+        self.cache = None
+        self.refresh()
+
+    def snapshot(self):
+        with self.lock:
+            return self.index, self.cache
+
+    def refresh(self) -> bool:
+        """Load the index again if its fingerprint changed; returns True on a swap."""
+        _, retriever, query_cache = _modules()
+        version = query_cache.index_version(self.index_path)
+        if version == self.version:
+            return False
+        from shared import tracing
+        with tracing.span("load_index", engine=self.engine):
+            index = retriever.load_index(self.index_path, engine=self.engine)
+        cache = query_cache.QueryCache(self.cache_path, version) if self.cache_path else None
+        with self.lock:
+            self.index, self.cache, self.version = index, cache, version
+        return True
+
+    def save_cache(self):
+        _, cache = self.snapshot()
+        if cache is None:
+            return
+        with self.save_lock:
+            stats = (cache.version, cache.stats())
+            if stats != self._saved:
+                cache.save()
+                self._saved = stats
+
+class Server:
+    def __init__(self, holder: IndexHolder, workers: int = 4, client_factory=None):
+        self.holder = holder
+        from concurrent.futures import ThreadPoolExecutor
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.client_factory = client_factory
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.port = None
+
+    def get_client(self):
+        with self._client_lock:
+            if self._client is None:
+                if self.client_factory is None:
+                    self.client_factory = _modules()[0].make_client
+                self._client = self.client_factory()
+            return self._client
+
+    def health(self) -> dict:
+        index, _ = self.holder.snapshot()
+        return {"index_version": self.holder.version, "chunks": len(index.chunks)}
+
+    def dispatch(self, method: str, path: str, payload: dict) -> Tuple[int, dict]:
+        """(status, JSON body); /metrics returns its text body as a str."""
+        agent, retriever, _ = _modules()
+        from shared import tracing
+        index, cache = self.holder.snapshot()
+        if method == "GET" and path == "/health":
+            return 200, self.health()
+        if method == "GET" and path == "/stats":
+            stats = dict(cache.stats()) if cache else {}
+            if hasattr(self._client, "stats_dict"):
+                stats["llm"] = self._client.stats_dict()
+            return 200, stats
+        if method == "GET" and path == "/metrics":
+            return 200, tracing.render_metrics()
+        if method == "POST" and path == "/retrieve":
+            with tracing.span("retrieve", k=int(payload.get("k", 4))):
+                hits = retriever.retrieve(index, payload["question"], k=int(payload.get("k", 4)))
+            return 200, {"hits": [[c.doc_path, c.chunk_id, s] for c, s in hits]}
+        if method == "POST" and path == "/answer":
+            question = payload["question"]
+            use = cache if payload.get("cache", True) else None
+            with tracing.span("query"):
+                result = agent.lookup_context(question, lambda: index, use)
+                if result["hits"]:
+                    result = dict(result, answer=agent.lookup_answer(question, result["context"], self.get_client, use))
+            return 200, result
+        return 404, {"error": f"no route for {method} {path}"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        import asyncio
+        try:
+            method, path, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            payload = json.loads(body) if body else {}
+            if method == "GET" and path == "/health":   # on the loop: a busy pool must not look like no server
+                status, out = 200, self.health()
+            else:
+                loop = asyncio.get_running_loop()
+                status, out = await loop.run_in_executor(self.pool, self.dispatch, method, path, payload)
+        except (ValueError, KeyError) as e:
+            status, out = 400, {"error": f"{type(e).__name__}: {e}"}
+        except Exception as e:
+            status, out = 500, {"error": f"{type(e).__name__}: {e}"}
+        if isinstance(out, str):
+            data, ctype = out.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            data, ctype = json.dumps(out).encode("utf-8"), "application/json"
+        writer.write((f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: {ctype}\r\n"
+                      f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n").encode("latin-1") + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def watch(self, interval: float = POLL_SECONDS):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(self.pool, self.holder.save_cache)
+                if await loop.run_in_executor(self.pool, self.holder.refresh):
+                    print(f"Swapped to index {self.holder.version}", flush=True)
+            except Exception as e:   # e.g. ingest mid-write; try again next tick
+                print(f"Index refresh failed: {type(e).__name__}: {e}", file=sys.stderr, flush=True)
+
+    async def serve(self, host: str, port: int, ready: Optional[threading.Event] = None,
+                    poll: float = POLL_SECONDS):
+        import asyncio
+        srv = await asyncio.start_server(self.handle, host, port)
+        self.port = srv.sockets[0].getsockname()[1]
+        watcher = asyncio.create_task(self.watch(poll))
+        if ready is not None:
+            ready.set()
+        try:
+            async with srv:
+                await srv.serve_forever()
+        finally:
+            watcher.cancel()
+            self.holder.save_cache()
+            self.pool.shutdown(wait=True)
+
+def main(argv=None):
+    import asyncio
+    agent, retriever, _ = _modules()
+    from shared import tracing
+    host, port = server_addr()
+    parser = argparse.ArgumentParser(description="Keep the knowledge-agent index warm behind a local HTTP API")
+    parser.add_argument("--host", default=host)
+    parser.add_argument("--port", type=int, default=port)
+    parser.add_argument("--workers", type=int, default=4, help="threads for retrieval and LLM calls")
+    parser.add_argument("--engine", choices=retriever.ENGINES, default="brute")
+    parser.add_argument("--no-cache", action="store_true", help="do not use query_cache.json")
+    args = parser.parse_args(argv)
+
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    index_path = agent.find_index(base)
+    if index_path is None:
+        print("Index not found. Run: python src/ingest.py")
+        return 1
+    cache_path = None if args.no_cache else os.path.join(base, "query_cache.json")
+    # /metrics is always on; AGENT_TRACE / AGENT_METRICS add the trace file and the exit dump
+    tracing.configure(os.getenv(tracing.TRACE_ENV) or None, metrics=True,
+                      metrics_path=os.getenv(tracing.METRICS_ENV) or None)
+    server = Server(IndexHolder(index_path, cache_path, args.engine), workers=args.workers)
+    print(f"Serving {index_path} on http://{args.host}:{args.port} ({args.workers} workers)", flush=True)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+# src/stream_index.py
+"""
+Out-of-core index build for corpora that do not fit in RAM.
+- Chunks are consumed from a generator (retriever.iter_corpus) in fixed-size batches.
+- Each batch is hashed into n_features buckets (no vocabulary to hold in memory);
+  chunk text is appended straight to the index's texts.bin and term counts are
+  spilled to disk while document frequencies accumulate.
+- A second pass over the spilled batches applies IDF (max_df pruning included),
+  L2-normalizes and appends the CSR arrays to .npy files of known length.
+Peak memory is one batch plus the n_features-sized DF/IDF arrays, whatever the
+corpus size. The result is a regular mapped index (index_store format v2), so
+load_index/retrieve use it unchanged.
+"""
+
+from __future__ import annotations
+import os, json, shutil
+from array import array
+from typing import Dict, Iterable, List
+import numpy as np
+from scipy import sparse
+
+try:
+    from .retriever import Chunk, VECTORIZER_OPTS, iter_corpus
+    from . import index_store
+except ImportError:
+    from retriever import Chunk, VECTORIZER_OPTS, iter_corpus
+    import index_store
+
+BATCH_SIZE = 2048          # chunks vectorized per batch
+N_FEATURES = 1 << 20       # hash buckets; collisions are rare below a few million n-grams
+
+class _NpyWriter:
+    """Appends to a 1-D .npy file of known length with plain writes (no dirty mmap pages)."""
+    def __init__(self, path: str, dtype, length: int):
+        self.dtype = np.dtype(dtype)
+        self.f = open(path, "wb")
+        np.lib.format.write_array_header_1_0(
+            self.f, {"descr": np.lib.format.dtype_to_descr(self.dtype), "fortran_order": False,
+                     "shape": (length,)})
+
+    def write(self, values: np.ndarray):
+        self.f.write(np.ascontiguousarray(values, dtype=self.dtype).tobytes())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.f.close()
+
+def _hasher(n_features: int):
+    from sklearn.feature_extraction.text import HashingVectorizer
+    opts = {k: v for k, v in VECTORIZER_OPTS.items() if k != "max_df"}
+    return HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None, **opts)
+
+def write_streaming(chunks: Iterable[Chunk], path: str, data_dir: str, batch_size: int = BATCH_SIZE,
+                    n_features: int = N_FEATURES, dtype: str = "float32") -> int:
+    """Write a mapped index from a chunk stream; returns the number of chunks."""
+    if dtype not in index_store.DTYPES:
+        raise ValueError(f"dtype must be one of {index_store.DTYPES}")
+    hasher = _hasher(n_features)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    spill = os.path.join(tmp, "spill")
+    os.makedirs(spill)
+
+    # pass 1: texts to disk, hashed counts spilled per batch, document frequencies
+    df = np.zeros(n_features, dtype=np.int64)
+    text_off = array("q", [0])
+    doc_ids, chunk_ids = array("i"), array("i")
+    docs: List[str] = []
+    doc_pos: Dict[str, int] = {}
+    n_batches = 0
+    with open(os.path.join(tmp, "texts.bin"), "wb") as texts:
+        batch: List[str] = []
+
+        def flush():
+            nonlocal n_batches
+            counts = sparse.csr_matrix(hasher.transform(batch), dtype=np.float32)
+            counts.sum_duplicates()
+            df[:] += np.bincount(counts.indices, minlength=n_features)
+            sparse.save_npz(os.path.join(spill, f"{n_batches:06d}.npz"), counts, compressed=False)
+            n_batches += 1
+            batch.clear()
+
+        for c in chunks:
+            b = c.text.encode("utf-8")
+            texts.write(b)
+            text_off.append(text_off[-1] + len(b))
+            if c.doc_path not in doc_pos:
+                doc_pos[c.doc_path] = len(docs)
+                docs.append(c.doc_path)
+            doc_ids.append(doc_pos[c.doc_path])
+            chunk_ids.append(c.chunk_id)
+            batch.append(c.text)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    n = len(doc_ids)
+    if n == 0:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise RuntimeError(f"No usable .txt or .pdf files found in {data_dir}")
+
+    # smooth IDF as in TfidfVectorizer; unseen and max_df-pruned buckets get weight 0
+    idf = np.log((1 + n) / (1 + df)) + 1
+    idf[(df == 0) | (df > VECTORIZER_OPTS["max_df"] * n)] = 0
+    del df
+
+    # pass 2: count surviving entries, then weight + normalize batch by batch
+    batch_files = [os.path.join(spill, f"{i:06d}.npz") for i in range(n_batches)]
+    nnz = sum(int(np.count_nonzero(idf[np.load(f)["indices"]])) for f in batch_files)
+    idx_dtype = np.int32 if nnz < 2**31 else np.int64
+    scale = 1.0 / index_store.QUANT_LEVELS if dtype == "uint8" else 1.0
+    indptr = np.zeros(n + 1, dtype=idx_dtype)   # n ints: small next to the matrix itself
+    row = pos = 0
+    with _NpyWriter(os.path.join(tmp, "indices.npy"), idx_dtype, nnz) as indices, \
+         _NpyWriter(os.path.join(tmp, "data.npy"), dtype, nnz) as data:
+        for f in batch_files:
+            m = sparse.load_npz(f).astype(np.float64)
+            m.data *= idf[m.indices]
+            m.eliminate_zeros()
+            norms = np.sqrt(np.asarray(m.multiply(m).sum(axis=1)).ravel())
+            norms[norms == 0] = 1.0
+            m = sparse.csr_matrix(sparse.diags(1.0 / norms) @ m)
+            m.sort_indices()
+            vals = m.data
+            if dtype == "uint8":
+                vals = np.clip(np.rint(vals * index_store.QUANT_LEVELS), 0, index_store.QUANT_LEVELS)
+            indices.write(m.indices)
+            data.write(vals)
+            indptr[row + 1:row + 1 + m.shape[0]] = m.indptr[1:] + pos
+            row += m.shape[0]
+            pos += m.nnz
+            os.remove(f)
+    np.save(os.path.join(tmp, "indptr.npy"), indptr)
+    os.rmdir(spill)
+
+    np.save(os.path.join(tmp, "idf.npy"), idf)
+    np.save(os.path.join(tmp, "texts_off.npy"), np.frombuffer(text_off, dtype=np.int64))
+    open(os.path.join(tmp, "terms.bin"), "wb").close()
+    np.save(os.path.join(tmp, "terms_off.npy"), np.zeros(1, dtype=np.int64))
+    np.save(os.path.join(tmp, "doc_ids.npy"), np.frombuffer(doc_ids, dtype=np.int32))
+    np.save(os.path.join(tmp, "chunk_ids.npy"), np.frombuffer(chunk_ids, dtype=np.int32))
+    with open(os.path.join(tmp, "docs.json"), "w", encoding="utf-8") as f:
+        json.dump(docs, f)
+
+    params = {k: v for k, v in hasher.get_params().items() if k in index_store.HASHING_PARAMS}
+    params.update(norm="l2", use_idf=True, smooth_idf=True, sublinear_tf=False)
+    index_store.publish_index(tmp, path, params, dtype, scale, (n, n_features), nnz, data_dir)
+    return n
+
+def build_streaming(data_dir: str, path: str, batch_size: int = BATCH_SIZE, n_features: int = N_FEATURES,
+                    dtype: str = "float32", **corpus_opts) -> int:
+    """iter_corpus(data_dir, **corpus_opts) -> write_streaming; returns the number of chunks."""
+    return write_streaming(iter_corpus(data_dir, **corpus_opts), path, data_dir,
+                           batch_size=batch_size, n_features=n_features, dtype=dtype)
@@ -0,0 +1,80 @@
+# tests/test_batch.py
+import json, time, asyncio, threading
+from src.retriever import build_index
+from src.batch import run_batch, read_questions, completed_ids, TokenBucket
+
+class FakeLLM:
+    """Offline stand-in for the shared client: sleeps `delay` (longer for "slow" questions)."""
+    def __init__(self, delay=0.02, slow=0.0):
+        self.delay, self.slow = delay, slow
+        self.calls, self.active, self.peak = [], 0, 0
+        self.lock = threading.Lock()
+
+    def chat(self, messages, model=None, cache=True, on_token=None, timeout=None):
+        question = messages[-1]["content"].rsplit("Question: ", 1)[1].split("\n")[0]
+        with self.lock:
+            self.calls.append(question)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.slow if "slow" in question else self.delay)
+        with self.lock:
+            self.active -= 1
+        return f"answer to {question}"
+
+def _index(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("Python lists are ordered collections.")
+    (data / "b.txt").write_text("Dictionaries map keys to values.")
+    return build_index(str(data))
+
+def _questions(tmp_path, items):
+    path = tmp_path / "questions.jsonl"
+    path.write_text("".join(json.dumps(q) + "\n" for q in items))
+    return read_questions(str(path))
+
+def test_answers_concurrently_and_resumes(tmp_path):
+    index = _index(tmp_path)
+    questions = _questions(tmp_path, [{"question": f"python lists {i}"} for i in range(20)]
+                           + [{"id": "none", "question": "zebra"}])
+    out = str(tmp_path / "answers.jsonl")
+    llm = FakeLLM()
+    report = asyncio.run(run_batch(index, questions, out, llm, concurrency=4, rate=0, batch_size=8))
+    assert (report.answered, report.no_hits, report.failed) == (20, 1, 0)
+    assert llm.peak == 4
+    lines = [json.loads(l) for l in open(out)]
+    assert {l["id"] for l in lines} == {str(i) for i in range(1, 21)} | {"none"}
+    assert lines[0]["id"] == "none" and lines[0]["answer"] is None    # no LLM call, so done first
+    first = next(l for l in lines if l["id"] == "1")
+    assert first["hits"][0][0] == "a.txt" and first["answer"] == "answer to python lists 0"
+
+    again = FakeLLM()
+    report = asyncio.run(run_batch(index, questions, out, again, rate=0))
+    assert report.skipped == 21 and again.calls == []
+
+def test_timeouts_are_recorded_and_retried_on_restart(tmp_path):
+    index = _index(tmp_path)
+    questions = _questions(tmp_path, [{"id": "fast", "question": "python lists"},
+                                      {"id": "slow", "question": "slow dictionaries"}])
+    out = str(tmp_path / "answers.jsonl")
+    report = asyncio.run(run_batch(index, questions, out, FakeLLM(slow=1.0), rate=0, timeout=0.2))
+    assert (report.answered, report.timeouts) == (1, 1)
+    assert json.loads(open(out).readlines()[-1])["error"] == "timeout after 0.2 s"
+
+    with open(out, "a") as f:
+        f.write('{"id": "cut off by a cra')    # partial line from a crash
+    llm = FakeLLM()
+    report = asyncio.run(run_batch(index, questions, out, llm, rate=0, timeout=0.2))
+    assert llm.calls == ["slow dictionaries"] and report.answered == 1
+    assert completed_ids(out) == {"fast", "slow"}
+    assert all(json.loads(l) for l in open(out))
+
+def test_token_bucket_limits_the_start_rate():
+    async def starts(n):
+        bucket = TokenBucket(rate=50, burst=2)
+        t0 = time.perf_counter()
+        for _ in range(n):
+            await bucket.acquire()
+        return time.perf_counter() - t0
+    assert asyncio.run(starts(2)) < 0.01       # the burst is free
+    assert asyncio.run(starts(7)) >= 0.09      # then 50/s: 5 more take >= 0.1 s
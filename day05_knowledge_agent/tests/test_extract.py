@@ -0,0 +1,36 @@
+# tests/test_extract.py
+from src.extract import extract_texts
+from src.retriever import load_corpus
+
+def test_pool_and_inline_agree(tmp_path):
+    paths = []
+    for i in range(4):
+        p = tmp_path / f"doc{i}.txt"
+        p.write_text(f"document number {i}")
+        paths.append(str(p))
+    inline, _ = extract_texts(paths, workers=1)
+    pooled, failures = extract_texts(paths, workers=2)
+    assert inline == pooled
+    assert failures == {}
+
+def test_cache_serves_text_without_rereading(tmp_path):
+    src = tmp_path / "a.txt"
+    src.write_text("cached text")
+    cache = str(tmp_path / "cache")
+    texts, _ = extract_texts([str(src)], cache_dir=cache, digests={str(src): "ab" * 32})
+    assert texts[str(src)] == "cached text"
+
+    src.unlink()  # a cache hit must not touch the file
+    texts, failures = extract_texts([str(src)], cache_dir=cache, digests={str(src): "ab" * 32})
+    assert texts[str(src)] == "cached text"
+    assert failures == {}
+
+def test_unreadable_file_is_reported(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "good.txt").write_text("Python lists are ordered.")
+    (data / "broken.pdf").write_bytes(b"not really a pdf")
+    failures = {}
+    chunks = load_corpus(str(data), failures=failures)
+    assert [c.doc_path for c in chunks] == ["good.txt"]
+    assert list(failures) == ["broken.pdf"]
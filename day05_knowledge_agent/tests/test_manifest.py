@@ -0,0 +1,45 @@
+# tests/test_manifest.py
+import os
+from src.manifest import scan, diff, load_manifest, save_manifest
+
+def _paths(d):
+    return sorted(str(p) for p in d.iterdir())
+
+def test_diff_detects_added_changed_removed(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("alpha")
+    (data / "b.txt").write_text("beta")
+    old = scan(str(data), _paths(data))
+
+    (data / "a.txt").write_text("alpha v2")
+    (data / "b.txt").unlink()
+    (data / "c.txt").write_text("gamma")
+    changes = diff(old, scan(str(data), _paths(data), old))
+
+    assert changes.added == ["c.txt"]
+    assert changes.changed == ["a.txt"]
+    assert changes.removed == ["b.txt"]
+    assert changes.refresh == ["c.txt", "a.txt"]
+
+def test_touch_without_edit_is_unchanged(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    f = data / "a.txt"
+    f.write_text("alpha")
+    old = scan(str(data), _paths(data))
+    st = os.stat(f)
+    os.utime(f, (st.st_atime, st.st_mtime + 10))
+    changes = diff(old, scan(str(data), _paths(data), old))
+    assert changes.is_empty()
+    assert changes.unchanged == ["a.txt"]
+
+def test_manifest_roundtrip(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("alpha")
+    entries = scan(str(data), _paths(data))
+    path = str(tmp_path / "manifest.json")
+    save_manifest(entries, path)
+    assert load_manifest(path) == entries
+    assert load_manifest(str(tmp_path / "missing.json")) == {}
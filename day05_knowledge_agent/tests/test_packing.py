@@ -0,0 +1,34 @@
+# tests/test_packing.py
+from src.retriever import Chunk, _chunk
+from src.packing import merge_hits, drop_near_duplicates, pack, format_passages, count_tokens
+
+def _doc_chunks(doc, text):
+    return [Chunk(doc_path=doc, chunk_id=i, text=c) for i, c in enumerate(_chunk(text))]
+
+def test_neighbouring_chunks_merge_into_one_passage():
+    text = " ".join(f"word{i}" for i in range(600))
+    chunks = _doc_chunks("a.txt", text)
+    hits = [(chunks[2], 0.9), (chunks[1], 0.5), (chunks[4], 0.4)]
+    passages = merge_hits(hits)
+    assert [p.tag for p in passages] == ["[a.txt#1-2]", "[a.txt#4]"]
+    assert passages[0].text == _chunk(text)[1] + _chunk(text)[2][200:]
+    assert passages[0].text in " ".join(text.split())
+    assert passages[0].score == 0.9
+
+def test_near_duplicates_are_dropped():
+    body = " ".join(f"clause {i} of the standpipe code" for i in range(40))
+    a = Chunk("a.pdf", 0, body)
+    b = Chunk("b.pdf", 0, body + " appendix")
+    c = Chunk("c.pdf", 0, "completely different text about sprinklers")
+    kept = drop_near_duplicates(merge_hits([(a, 0.9), (b, 0.8), (c, 0.7)]))
+    assert [p.doc_path for p in kept] == ["a.pdf", "c.pdf"]
+
+def test_pack_respects_token_budget():
+    text = " ".join(f"word{i}" for i in range(2000))
+    chunks = _doc_chunks("a.txt", text)
+    hits = [(chunks[i], 1.0 - i / 100) for i in (0, 1, 5, 9)]
+    packed = pack(hits, max_tokens=400)
+    block = format_passages(packed)
+    assert packed[0].tag == "[a.txt#0-1]"
+    assert count_tokens(block) <= 400
+    assert block.count("[a.txt#") == len(packed)
@@ -0,0 +1,44 @@
+# tests/test_query_cache.py
+from src.query_cache import LRUCache, QueryCache, normalize_query, index_version
+from src.retriever import build_index, save_index
+
+def test_lru_evicts_oldest_and_expires():
+    cache = LRUCache(max_entries=2, ttl=10)
+    cache.put("a", 1, now=0)
+    cache.put("b", 2, now=0)
+    assert cache.get("a", now=1) == 1      # a is now most recent
+    cache.put("c", 3, now=2)               # evicts b
+    assert cache.get("b", now=2) is None
+    assert cache.get("c", now=20) is None  # past ttl
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 2
+    assert cache.stats.evictions == 1
+    assert cache.stats.expired == 1
+
+def test_persists_and_invalidates_on_rebuild(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("Python lists are ordered collections.")
+    (data / "b.txt").write_text("Dictionaries map keys to values.")
+    index_path = str(tmp_path / "index")
+    save_index(build_index(str(data)), index_path)
+    path = str(tmp_path / "cache.json")
+
+    cache = QueryCache(path, index_version(index_path))
+    key = cache.retrieval_key("What are lists?", 5)
+    assert key == cache.retrieval_key("  what are   LISTS ", 5)
+    assert normalize_query("Lists?") == "lists"
+    cache.retrieval.put(key, {"hits": [["a.txt", 0, 0.5]], "context": "ctx"})
+    cache.answers.put("k", "answer")
+    cache.save()
+
+    reopened = QueryCache(path, index_version(index_path))
+    assert reopened.retrieval.get(key)["context"] == "ctx"
+    assert reopened.stats()["answers"]["entries"] == 1
+
+    (data / "c.txt").write_text("Sets hold unique members.")
+    save_index(build_index(str(data)), index_path)
+    rebuilt = QueryCache(path, index_version(index_path))
+    assert rebuilt.invalidated
+    assert rebuilt.retrieval.get(key) is None
+    assert rebuilt.answers.get("k") is None
@@ -1,6 +1,9 @@
 # tests/test_retriever.py
-import os, tempfile, shutil
-from src.retriever import build_index, retrieve
+import os, json, tempfile, shutil
+import numpy as np
+import pytest
+from src.retriever import (build_index, retrieve, retrieve_many, update_index, save_index,
+                           load_index, use_engine)
 
 def test_build_and_search_txt(tmp_path):
     data = tmp_path / "data"
@@ -14,3 +17,154 @@ def test_build_and_search_txt(tmp_path):
     top_chunk, score = results[0]
     assert "lists" in top_chunk.text.lower()
     assert score > 0
+
+def test_update_index_refreshes_and_drops(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("Python lists are ordered collections.")
+    (data / "b.txt").write_text("Dictionaries map keys to values.")
+    idx = build_index(str(data))
+
+    (data / "a.txt").write_text("Tuples are immutable sequences.")
+    (data / "b.txt").unlink()
+    (data / "c.txt").write_text("Sets hold unique members.")
+    idx = update_index(idx, str(data), refresh=["a.txt", "c.txt"], drop=["b.txt"])
+
+    docs = sorted(c.doc_path for c in idx.chunks)
+    assert docs == ["a.txt", "c.txt"]
+    assert "tuples" in retrieve(idx, "immutable tuples", k=1)[0][0].text.lower()
+    assert retrieve(idx, "dictionaries keys", k=3) == []
+
+def test_mapped_index_matches_pickle(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("Python lists are ordered collections. They support indexing and slicing.")
+    (data / "b.txt").write_text("Dictionaries map keys to values. Keys should be immutable.")
+    idx = build_index(str(data))
+    query = "Are dictionary keys immutable?"
+    expected = retrieve(idx, query, k=2)
+
+    for dtype in ("float64", "float32", "uint8"):
+        path = str(tmp_path / f"index-{dtype}")
+        save_index(idx, path, dtype=dtype)
+        mapped = load_index(path)
+        got = retrieve(mapped, query, k=2)
+        assert [c for c, _ in got] == [c for c, _ in expected]
+        tol = 1e-2 if dtype == "uint8" else 1e-6
+        assert all(abs(a - b) < tol for (_, a), (_, b) in zip(got, expected))
+    with open(os.path.join(path, "meta.json")) as f:
+        stop_words = json.load(f)["vectorizer"]["stop_words"]
+    assert "the" in stop_words and len(stop_words) > 300      # the list itself, not "english"
+
+def test_retrieve_many_matches_retrieve(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("Python lists are ordered collections. They support indexing and slicing. " * 20)
+    (data / "b.txt").write_text("Dictionaries map keys to values. Keys should be immutable. " * 20)
+    (data / "c.txt").write_text("Sets store unique values and support fast membership tests. " * 20)
+    (data / "d.txt").write_text("Python lists are ordered collections. They support indexing and slicing. " * 20)
+    idx = build_index(str(data))
+    queries = ["python lists", "immutable keys", "unique values", "quantum chromodynamics", "values"]
+
+    def reference(q, k):
+        """Dense scores of every chunk, full stable sort: score desc, then chunk id asc."""
+        scores = (idx.matrix @ idx.vectorizer.transform([q]).T).toarray().ravel()
+        order = np.argsort(-scores, kind="stable")
+        return [(int(i), float(scores[i])) for i in order if scores[i] > 0][:k]
+
+    n = len(idx.chunks)
+    for k in (1, 3, n, n + 10):   # repeated text gives tied scores; k past the number of chunks
+        batched = retrieve_many(idx, queries, k=k, block_size=2)
+        for q, hits in zip(queries, batched):
+            expected = reference(q, k)
+            assert [idx.chunks.index(c) for c, _ in hits] == [i for i, _ in expected], (q, k)
+            assert [s for _, s in hits] == pytest.approx([s for _, s in expected])
+    tied = reference("python lists", n)
+    assert len({s for _, s in tied}) < len(tied)   # d.txt repeats a.txt: equal scores, ordered by chunk id
+    assert retrieve_many(idx, queries, k=3)[3] == []
+
+def test_maxscore_engine_matches_brute_force(tmp_path):
+    import random
+    random.seed(7)
+    words = [f"w{i}" for i in range(60)]
+    data = tmp_path / "data"
+    data.mkdir()
+    for d in range(12):
+        text = " ".join(random.choice(words[: 10 + d * 4]) for _ in range(400))
+        (data / f"doc{d}.txt").write_text(text)
+    idx = build_index(str(data))
+    queries = [" ".join(random.sample(words, 3)) for _ in range(25)] + ["w1", "nothing here"]
+
+    brute = retrieve_many(idx, queries, k=5)
+    use_engine(idx, "maxscore")
+    fast = retrieve_many(idx, queries, k=5)
+    assert fast == brute
+
+def test_dense_and_hybrid_engines(tmp_path):
+    from src.dense import DenseEngine
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("Python lists are ordered collections. They support indexing and slicing. " * 20)
+    (data / "b.txt").write_text("Dictionaries map keys to values. Keys should be immutable. " * 20)
+    (data / "c.txt").write_text("Sets store unique values and support fast membership tests. " * 20)
+    idx = build_index(str(data))
+    query = "immutable dictionary keys"
+    lexical_top = retrieve(idx, query, k=1)[0][0]
+
+    for codec in ("float32", "pq"):
+        dense = DenseEngine.build(idx.matrix, dim=4, codec=codec, nlist=2, pq_m=2)
+        qv = idx.vectorizer.transform([query])
+        assert dense.search(qv, 3, nprobe=2)[0].tolist() == dense.exact_search(qv, 3)[0].tolist()
+
+    use_engine(idx, "dense", dim=4)
+    assert retrieve(idx, query, k=1)[0][0] == lexical_top
+    assert retrieve(idx, "quantum chromodynamics", k=3) == []
+    use_engine(idx, "hybrid", dim=4)
+    hits = retrieve(idx, query, k=3)
+    assert hits[0][0] == lexical_top
+    assert [s for _, s in hits] == sorted((s for _, s in hits), reverse=True)
+
+    path = str(tmp_path / "index")
+    save_index(idx, path)
+    dense.save(os.path.join(path, "dense"))
+    mapped = load_index(path, engine="dense")
+    assert mapped.engine.codec == "pq"
+
+def test_streaming_build_matches_in_memory(tmp_path):
+    from src.stream_index import build_streaming
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("Python lists are ordered collections. They support indexing and slicing. " * 20)
+    (data / "b.txt").write_text("Dictionaries map keys to values. Keys should be immutable. " * 20)
+    (data / "c.txt").write_text("Sets store unique values and support fast membership tests. " * 20)
+    idx = build_index(str(data))
+    path = str(tmp_path / "index")
+    n = build_streaming(str(data), path, batch_size=2, file_batch=1, dtype="float64")
+    streamed = load_index(path)
+
+    assert n == len(idx.chunks)
+    assert list(streamed.chunks) == list(idx.chunks)
+    for q in ["python lists", "immutable keys", "unique values", "values", "quantum chromodynamics"]:
+        expected, got = retrieve(idx, q, k=3), retrieve(streamed, q, k=3)
+        assert [c for c, _ in got] == [c for c, _ in expected]
+        assert all(abs(a - b) < 1e-9 for (_, a), (_, b) in zip(got, expected))
+
+    from src.index_store import is_hashed
+    assert is_hashed(path) and not is_hashed(str(tmp_path / "missing"))
+    with pytest.raises(ValueError):
+        update_index(streamed, str(data), refresh=["a.txt"])   # would refit as a vocabulary index
+
+def test_local_query_analyzer_matches_sklearn():
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from src.index_store import word_analyzer
+    from src.retriever import VECTORIZER_OPTS
+    docs = ["What is the Maximum spacing between standpipe outlets, in metres?",
+            "Café naïve résumé: the and of a", "a", "", "Python3 x_y 42 ab-cd e.g. U.S.A."]
+    settings = [VECTORIZER_OPTS, {}, {"ngram_range": (2, 3), "lowercase": False},
+                {"stop_words": ["python3", "ab"], "token_pattern": r"(?u)\b\w+\b", "ngram_range": (1, 3)}]
+    for params in settings:
+        ours, theirs = word_analyzer(params), TfidfVectorizer(**params).build_analyzer()
+        for doc in docs:
+            assert ours(doc) == theirs(doc), (params, doc)
+    assert word_analyzer({"analyzer": "char_wb"}) is None
+    assert word_analyzer({"strip_accents": "unicode"}) is None
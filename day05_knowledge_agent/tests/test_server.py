@@ -0,0 +1,131 @@
+# tests/test_server.py
+import asyncio, threading, time
+import pytest
+from src.retriever import build_index, save_index, retrieve
+from src.server import IndexHolder, Server, request, is_running
+
+def _start(holder, **kwargs):
+    """Server on a loop in a thread; returns (server, addr, stop). stop() ends serve() and joins."""
+    server = Server(holder, workers=2, **kwargs)
+    ready = threading.Event()
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(server.serve("127.0.0.1", 0, ready, poll=0.05))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            loop.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert ready.wait(10)
+
+    def stop():
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join(10)
+        assert not thread.is_alive()
+    return server, ("127.0.0.1", server.port), stop
+
+@pytest.fixture
+def start():
+    """_start, with every server stopped when the test ends."""
+    stops = []
+    def start(holder, **kwargs):
+        server, addr, stop = _start(holder, **kwargs)
+        stops.append(stop)
+        return server, addr
+    yield start
+    for stop in stops:
+        stop()
+
+def test_serves_retrieval_and_hot_swaps_index(tmp_path, start):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("Python lists are ordered collections.")
+    (data / "b.txt").write_text("Dictionaries map keys to values.")
+    index_path = str(tmp_path / "index")
+    save_index(build_index(str(data)), index_path)
+    holder = IndexHolder(index_path, str(tmp_path / "cache.json"))
+    server, addr = start(holder, client_factory=lambda: None)
+
+    hits = request("POST", "/retrieve", {"question": "python lists", "k": 2}, addr=addr)["hits"]
+    assert hits[0][0] == "a.txt"
+    assert request("GET", "/health", addr=addr)["chunks"] == 2
+
+    (data / "c.txt").write_text("Sets hold unique members.")
+    save_index(build_index(str(data)), index_path)
+    deadline = time.time() + 10
+    while request("GET", "/health", addr=addr)["chunks"] != 3 and time.time() < deadline:
+        time.sleep(0.05)
+    hits = request("POST", "/retrieve", {"question": "unique sets", "k": 1}, addr=addr)["hits"]
+    assert hits[0][0] == "c.txt"
+
+def test_health_answers_while_the_pool_is_busy(tmp_path, monkeypatch, start):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("Python lists are ordered collections.")
+    (data / "b.txt").write_text("Dictionaries map keys to values.")
+    index_path = str(tmp_path / "index")
+    save_index(build_index(str(data)), index_path)
+    server, addr = start(IndexHolder(index_path, None), client_factory=lambda: None)
+    release = threading.Event()
+    blocking = lambda *args, **kwargs: release.wait(10) and []
+    monkeypatch.setattr("src.retriever.retrieve", blocking)
+    busy = [threading.Thread(target=request, args=("POST", "/retrieve", {"question": "x"}),
+                             kwargs={"addr": addr}, daemon=True) for _ in range(2)]   # both workers
+    for t in busy:
+        t.start()
+    time.sleep(0.2)
+    t0 = time.perf_counter()
+    assert is_running(addr, timeout=0.5)
+    assert time.perf_counter() - t0 < 0.5
+    release.set()
+    for t in busy:
+        t.join(10)
+
+def test_answer_uses_cache(tmp_path, monkeypatch, start):
+    from src import agent
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("Python lists are ordered collections.")
+    (data / "b.txt").write_text("Dictionaries map keys to values.")
+    index_path = str(tmp_path / "index")
+    save_index(build_index(str(data)), index_path)
+    calls = []
+    monkeypatch.setattr(agent, "answer_with_rag", lambda client, q, ctx, **kw: calls.append(q) or "Lists are ordered.")
+    server, addr = start(IndexHolder(index_path, str(tmp_path / "cache.json")), client_factory=object)
+
+    for _ in range(2):
+        out = request("POST", "/answer", {"question": "What are python lists?"}, addr=addr)
+        assert out["answer"] == "Lists are ordered."
+        assert "[a.txt#0]" in out["context"]
+    assert len(calls) == 1
+    assert request("GET", "/stats", addr=addr)["answers"]["hits"] == 1
+    assert request("POST", "/answer", {"question": "zzz qqq"}, addr=addr)["hits"] == []
+
+def test_metrics_endpoint_reports_stages(tmp_path, start):
+    import urllib.request
+    from src import agent   # puts the repo root on sys.path
+    from shared import tracing
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.txt").write_text("Python lists are ordered collections.")
+    (data / "b.txt").write_text("Dictionaries map keys to values.")
+    index_path = str(tmp_path / "index")
+    save_index(build_index(str(data)), index_path)
+    tracing.configure(metrics=True)
+    try:
+        server, addr = start(IndexHolder(index_path, None), client_factory=lambda: None)
+        request("POST", "/retrieve", {"question": "python lists", "k": 1}, addr=addr)
+        request("POST", "/answer", {"question": "zzz qqq"}, addr=addr)
+        with urllib.request.urlopen(f"http://{addr[0]}:{addr[1]}/metrics") as resp:
+            assert resp.headers["Content-Type"].startswith("text/plain")
+            text = resp.read().decode()
+    finally:
+        tracing.configure()
+    assert 'agent_stage_seconds_count{stage="retrieve"} 2' in text   # /retrieve, and inside /answer
+    assert 'agent_stage_seconds_count{stage="lookup_context"} 1' in text
+    assert 'agent_stage_seconds_bucket{stage="query",le="+Inf"} 1' in text
@@ -0,0 +1,72 @@
+# benchmarks/bench_semantic.py
+"""
+Semantic recall cost at growing DB sizes.
+Usage:
+  python benchmarks/bench_semantic.py [--sizes 10000,100000,1000000] [--queries 200]
+For each size, one conversation of that many turns is written with precomputed
+vectors (embedding 1M texts one by one would dominate the run). Reported:
+  build   time of the first recall_semantic (loads the BLOBs, trains the IVF)
+  p50/p95/p99 of later recall_semantic calls (embed + ANN search + row fetch)
+  add     per-turn cost of add_interaction with vectors on vs off
+"""
+
+import os, sys, time, random, sqlite3, argparse, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.memory import MemoryStore
+from shared.tracing import percentile
+from src import vectors
+
+TOPICS = ["trading", "forex", "stops", "journal", "python", "sqlite", "memory", "holiday", "sister",
+          "running", "budget", "invoice", "garden", "recipe", "travel", "meeting", "deadline", "server"]
+
+def _texts(n_distinct: int, rng: random.Random):
+    return [f"note {i} about {' '.join(rng.sample(TOPICS, 3))} and {rng.choice(TOPICS)}ing"
+            for i in range(n_distinct)]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    texts = _texts(20000, rng)
+    blobs = [vectors.encode(vectors.embed(t)) for t in texts]
+    queries = [f"what did I say about {rng.choice(TOPICS)} {rng.choice(TOPICS)}" for _ in range(args.queries)]
+
+    for n in [int(s) for s in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as d:
+            db = os.path.join(d, "mem.db")
+            MemoryStore(db).close()   # schema
+            conn = sqlite3.connect(db)
+            with conn:
+                conn.executemany("INSERT INTO turns(role, text, ts, vec) VALUES ('user', ?, '2026-01-01T00:00:00', ?)",
+                                 ((texts[i % len(texts)], blobs[i % len(blobs)]) for i in range(n)))
+            conn.close()
+
+            m = MemoryStore(db, semantic=True)
+            t0 = time.perf_counter()
+            m.recall_semantic(queries[0])
+            build = time.perf_counter() - t0
+            times = []
+            for q in queries:
+                t0 = time.perf_counter()
+                m.recall_semantic(q, limit=4)
+                times.append((time.perf_counter() - t0) * 1000)
+            m.close()
+        print(f"{n:>9} turns: build {build:6.2f} s  recall_semantic p50 {percentile(times, 50):5.2f}  "
+              f"p95 {percentile(times, 95):5.2f}  p99 {percentile(times, 99):5.2f} ms")
+
+    for semantic in (False, True):
+        with tempfile.TemporaryDirectory() as d:
+            m = MemoryStore(os.path.join(d, "mem.db"), semantic=semantic)
+            pairs = [(texts[i], "ok") for i in range(2000)]
+            t0 = time.perf_counter()
+            m.add_interactions(pairs)
+            secs = time.perf_counter() - t0
+            m.close()
+        print(f"add_interactions, vectors {'on ' if semantic else 'off'}: {2 * len(pairs) / secs:>10,.0f} turns/s")
+
+if __name__ == "__main__":
+    main()
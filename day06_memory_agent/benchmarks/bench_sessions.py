@@ -0,0 +1,77 @@
+# benchmarks/bench_sessions.py
+"""
+Concurrent-session load test for MemoryStore.
+Usage:
+  python benchmarks/bench_sessions.py [--sessions 32] [--turns 50] [--history 20000]
+Every session is a thread that, per turn, recalls recent + ranked memory and then
+writes the turn (what agent.py does). Compares one shared connection behind a
+lock (readers=0) with the pooled store (one writer, N readers under WAL), and
+prints turns/s and p50/p95/p99 latency of a whole turn.
+"""
+
+import os, sys, time, sqlite3, argparse, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.memory import MemoryStore
+from shared.tracing import percentile
+
+MODES = [
+    # (label, MemoryStore options)
+    ("shared connection + lock", {"journal_mode": "wal", "synchronous": "normal"}),
+    ("pooled, 4 readers", {"readers": 4, "synchronous": "normal"}),
+    ("pooled, 8 readers", {"readers": 8, "synchronous": "normal"}),
+    ("pooled, 8 readers + write-behind", {"readers": 8, "synchronous": "normal", "write_behind": True}),
+]
+
+class _Unpooled(MemoryStore):
+    """readers=0 is single-threaded; a lock around every call is the naive way to share it."""
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        self.conn.close()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--turns", type=int, default=50, help="turns per session")
+    parser.add_argument("--history", type=int, default=20000, help="interactions already stored")
+    args = parser.parse_args()
+    for label, opts in MODES:
+        with tempfile.TemporaryDirectory() as d:
+            db = os.path.join(d, "mem.db")
+            seed = MemoryStore(db)
+            for n in range(args.sessions):
+                seed.session(f"user{n}").add_interactions(
+                    [(f"old note {i} about trading topic{i % 50}", "ok") for i in range(args.history // args.sessions)])
+            seed.close()
+
+            m = (MemoryStore if opts.get("readers") else _Unpooled)(db, **opts)
+            latencies, lock = [], threading.Lock()
+
+            def session(n):
+                s = m.session(f"user{n}", f"bench{n}")
+                mine = []
+                for i in range(args.turns):
+                    t0 = time.perf_counter()
+                    s.recall_recent(6)
+                    s.recall_ranked([f"topic{i % 50}", "trading"], limit=4)
+                    s.add_interaction(f"question {i} about topic{i % 50}", f"answer {i}")
+                    mine.append((time.perf_counter() - t0) * 1000)
+                s.close()
+                with lock:
+                    latencies.extend(mine)
+
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(args.sessions) as pool:
+                list(pool.map(session, range(args.sessions)))
+            secs = time.perf_counter() - t0
+            m.close()
+        print(f"{label:<34} {args.sessions * args.turns / secs:>8,.0f} turns/s  "
+              f"p50 {percentile(latencies, 50):6.2f}  p95 {percentile(latencies, 95):6.2f}  "
+              f"p99 {percentile(latencies, 99):6.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# benchmarks/bench_startup.py
+"""
+MemoryStore open time as the DB grows.
+Usage:
+  python benchmarks/bench_startup.py [--sizes 100,10000,1000000] [--repeat 20]
+Fills a DB per size with add_interactions, then times MemoryStore(db) + close().
+"""
+
+import os, sys, time, argparse, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.memory import MemoryStore
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,10000,1000000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(f"{'turns':>10} {'open ms':>9}")
+    for n in [int(s) for s in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as d:
+            db = os.path.join(d, "mem.db")
+            m = MemoryStore(db, journal_mode="wal", synchronous="off")
+            batch = 50_000
+            for start in range(0, n // 2, batch):
+                m.add_interactions((f"user message {i} about topic{i % 97}", f"reply {i}")
+                                   for i in range(start, min(n // 2, start + batch)))
+            m.close()
+            times = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                MemoryStore(db).close()
+                times.append(time.perf_counter() - t0)
+            print(f"{n:>10} {min(times) * 1000:>9.3f}")
+
+if __name__ == "__main__":
+    main()
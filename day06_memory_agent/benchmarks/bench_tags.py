@@ -0,0 +1,83 @@
+# benchmarks/bench_tags.py
+"""
+Tag storage before/after the tag index: "#auto_tag" pseudo-turns vs tags/turn_tags.
+Usage:
+  python benchmarks/bench_tags.py [--interactions 100000] [--tags 5]
+Writes a DB the way the old agent did (each interaction preceded by one pseudo
+interaction per tag), measures it, opens it with MemoryStore (runs the migration)
+and measures again:
+  size     DB file size after VACUUM
+  recall   p50 of one tag lookup: FTS recall_keywords (old) vs recall_tagged (new)
+  recent   share of real turns in recall_recent(6)
+"""
+
+import os, sys, time, random, sqlite3, argparse, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.memory import MemoryStore, MIGRATIONS, _migrate_tags
+
+WORDS = ["oanda", "fees", "spreads", "python", "sqlite", "journal", "holiday", "budget", "garden",
+         "server", "invoice", "recipe", "travel", "deadline", "running", "meeting"] + [f"topic{i}" for i in range(500)]
+
+def _p50(fn, args):
+    times = []
+    for a in args:
+        t0 = time.perf_counter()
+        fn(a)
+        times.append((time.perf_counter() - t0) * 1000)
+    return sorted(times)[len(times) // 2]
+
+def _measure(m: MemoryStore, db: str, lookup, probes):
+    m.conn.execute("VACUUM")
+    recent = m.recall_recent(6)
+    real = sum(1 for t in recent if not t.text.startswith("#auto_tag") and t.text != "(auto-tag)")
+    return os.path.getsize(db), _p50(lookup, probes), real / len(recent)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--interactions", type=int, default=100000)
+    parser.add_argument("--tags", type=int, default=5, help="auto-tags per interaction")
+    args = parser.parse_args()
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as d:
+        db = os.path.join(d, "mem.db")
+        conn = sqlite3.connect(db)
+        before = MIGRATIONS.index(_migrate_tags)
+        for step in MIGRATIONS[:before]:
+            step(conn)
+        conn.execute(f"PRAGMA user_version={before}")
+        rows = []
+        for i in range(args.interactions):
+            tags = rng.sample(WORDS, args.tags)
+            for tag in tags:
+                rows += [("user", f"#auto_tag {tag}"), ("agent", "(auto-tag)")]
+            rows += [("user", f"question {i} about {' '.join(tags)}"), ("agent", f"answer {i}")]
+        with conn:
+            conn.executemany("INSERT INTO turns(role, text, ts) VALUES (?, ?, '2026-01-01T00:00:00')", rows)
+        conn.close()
+        probes = [rng.choice(WORDS) for _ in range(200)]
+
+        old = sqlite3.connect(db)
+        old.row_factory = sqlite3.Row
+        old.execute("VACUUM")
+        size_old = os.path.getsize(db)
+        p50_old = _p50(lambda t: old.execute(
+            "SELECT t.role, t.text, t.ts FROM turns_fts f JOIN turns t ON t.id = f.rowid "
+            "WHERE f.text MATCH ? ORDER BY t.id DESC LIMIT 6", (t,)).fetchall(), probes)
+        recent = old.execute("SELECT text FROM turns ORDER BY id DESC LIMIT 6").fetchall()
+        real_old = sum(1 for r in recent if not r["text"].startswith("#auto_tag") and r["text"] != "(auto-tag)") / 6
+        old.close()
+
+        t0 = time.perf_counter()
+        m = MemoryStore(db, semantic=False)
+        migrate = time.perf_counter() - t0
+        size_new, p50_new, real_new = _measure(m, db, lambda t: m.recall_tagged([t], limit=6), probes)
+        m.close()
+
+    print(f"{args.interactions:,} interactions, {args.tags} tags each; migration {migrate:.2f} s")
+    print(f"{'':<22} {'size MB':>9} {'tag recall p50 ms':>18} {'real turns in recent':>21}")
+    print(f"{'pseudo-turns + FTS':<22} {size_old / 2**20:>9.1f} {p50_old:>18.3f} {real_old:>21.0%}")
+    print(f"{'tags / turn_tags':<22} {size_new / 2**20:>9.1f} {p50_new:>18.3f} {real_new:>21.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# benchmarks/bench_writes.py
+"""
+MemoryStore write throughput: one commit per add_interaction vs batched writes.
+Usage:
+  python benchmarks/bench_writes.py [--turns 2000]
+Each mode writes --turns interactions into a fresh DB file and prints turns/second.
+"""
+
+import os, sys, time, argparse, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.memory import MemoryStore
+
+MODES = [
+    # (label, MemoryStore options, use add_interactions)
+    ("per-call commit (default journal)", {}, False),
+    ("per-call commit, WAL + synchronous=normal", {"journal_mode": "wal", "synchronous": "normal"}, False),
+    ("add_interactions (one transaction)", {}, True),
+    ("write-behind, flush every 64", {"write_behind": True}, False),
+    ("write-behind + WAL + synchronous=normal",
+     {"write_behind": True, "journal_mode": "wal", "synchronous": "normal"}, False),
+]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=2000)
+    args = parser.parse_args()
+    pairs = [(f"user message {i} about trading and memory", f"agent reply {i}") for i in range(args.turns)]
+    for label, opts, bulk in MODES:
+        with tempfile.TemporaryDirectory() as d:
+            m = MemoryStore(os.path.join(d, "mem.db"), **opts)
+            t0 = time.perf_counter()
+            if bulk:
+                m.add_interactions(pairs)
+            else:
+                for u, a in pairs:
+                    m.add_interaction(u, a)
+            m.close()
+            secs = time.perf_counter() - t0
+        print(f"{label:<45} {args.turns / secs:>10,.0f} turns/s")
+
+if __name__ == "__main__":
+    main()
@@ -4,20 +4,29 @@ Day 6: Persistent Memory Agent
 - Loads recent + relevant memory from SQLite
 - Uses that context to answer
 - Saves the new turn back to memory
+- Folds old turns into summaries a little at a time (see compaction.py)
+- Times each memory call, the commit and the model call as spans (shared/tracing.py)
 """
 
-from dotenv import load_dotenv
-load_dotenv()  # take environment variables from .env
 import os
 import sys
 from typing import List
-from openai import OpenAI
-from memory import MemoryStore, Turn
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.llm import get_client
+from shared.startup import load_env, run_agent, stream_chat
+from shared import tracing
+from memory import MemoryStore, Turn, Recall, Summary, DEFAULT_CONVERSATION
+from compaction import compact
 import re
 
 MODEL = "gpt-4o-mini"
 RECENT_K = 6           # include last K turns
-KEYWORD_LIMIT = 4      # include up to 4 keyword hits
+KEYWORD_LIMIT = 4      # include up to 4 ranked keyword hits (snippets)
+TAG_LIMIT = 2          # include up to 2 turns carrying one of the question's tags
+SEMANTIC_LIMIT = 3     # include up to 3 turns similar in meaning (vector recall)
+SUMMARY_LIMIT = 4      # include up to 4 summaries of compacted history
+MEMORY_TOKENS = 800    # budget for the whole memory block (~4 chars per token)
+COMPACT_BUDGET = 0.05  # seconds of compaction work after each answer
 
 def extract_keywords(text: str, min_len=4, max_len=15, limit=5):
     """
@@ -37,31 +46,70 @@ def extract_keywords(text: str, min_len=4, max_len=15, limit=5):
             seen.append(wl)
     return seen[:limit]
 
-def format_memory_block(recent: List[Turn], keywords: List[Turn]) -> str:
+def _tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+def format_memory_block(recent: List[Turn], keywords: List[Turn], summaries: List[Summary] = (),
+                        max_tokens: int = MEMORY_TOKENS, related: List[Recall] = ()) -> str:
+    """
+    Summaries go in first, then keyword snippets, then semantically related turns,
+    then recent turns (newest first); whatever does not fit in max_tokens is left out,
+    so raw text is what gets cut. Related turns already among the keyword hits are skipped.
+    """
     def fmt(ts: str, role: str, text: str) -> str:
         return f"[{ts}][{role}] {text}"
-    blocks = []
-    if recent:
-        blocks.append("Recent context:\n" + "\n".join(fmt(t.ts, t.role, t.text) for t in recent))
-    if keywords:
-        blocks.append("Keyword matches:\n" + "\n".join(fmt(t.ts, t.role, t.text) for t in keywords))
-    return "\n\n".join(blocks) if blocks else "(no prior context)"
+    budget = max_tokens
 
-def main():
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    mem = MemoryStore()  # memory.db in project root
+    def fit(lines: List[str]) -> List[str]:
+        nonlocal budget
+        kept = []
+        for line in lines:
+            cost = _tokens(line) + 1
+            if cost > budget:
+                break
+            kept.append(line)
+            budget -= cost
+        return kept
 
-    # Input prompt via CLI or interactive
-    user_input = " ".join(sys.argv[1:]) if len(sys.argv) > 1 else input("You: ")
+    history = fit([f"[{s.level} {s.period}] {s.text}" for s in reversed(summaries)])
+    matches = fit([fmt(t.ts, t.role, t.text) for t in keywords])
+    matched = {t.id for t in keywords}
+    similar = fit([fmt(t.ts, t.role, t.text) for t in related if t.id not in matched])
+    latest = fit([fmt(t.ts, t.role, t.text) for t in reversed(recent)])
+    blocks = []
+    if history:
+        blocks.append("Earlier (summarized):\n" + "\n".join(reversed(history)))
+    if latest:
+        blocks.append("Recent context:\n" + "\n".join(reversed(latest)))
+    if matches:
+        blocks.append("Keyword matches:\n" + "\n".join(matches))
+    if similar:
+        blocks.append("Related memories:\n" + "\n".join(similar))
+    return "\n\n".join(blocks) if blocks else "(no prior context)"
 
-    # Simple keyword heuristic: if the user adds tags like #topic, search those
+def answer_turn(client, mem: MemoryStore, user_input: str) -> str:
+    """Recall, answer (streamed), save the turn, compact a little; each step is a span."""
+    # Tags like #topic plus auto-detected keywords: turns tagged with them (index join),
+    # then the same terms ranked over all text, then turns similar in meaning; turns
+    # already shown are not repeated
     tags = [w[1:] for w in user_input.split() if w.startswith("#")]
-    keywords = []
-    for tag in tags:
-        keywords.extend(mem.recall_keywords(tag, limit=KEYWORD_LIMIT))
-
-    recent = mem.recall_recent(RECENT_K)
-    memory_block = format_memory_block(recent, keywords)
+    auto_tags = extract_keywords(user_input)
+    with tracing.span("memory.recall_recent"):
+        recent = mem.recall_recent(RECENT_K)
+    seen = [t.id for t in recent]
+    with tracing.span("memory.recall_tagged") as s:
+        tagged = mem.recall_tagged(tags + auto_tags, limit=TAG_LIMIT, exclude_ids=seen)
+        s.set(results=len(tagged))
+    seen += [t.id for t in tagged]
+    with tracing.span("memory.recall_ranked") as s:
+        keywords = mem.recall_ranked(tags + auto_tags, limit=KEYWORD_LIMIT, exclude_ids=seen)
+        s.set(results=len(keywords))
+    with tracing.span("memory.recall_semantic") as s:
+        related = mem.recall_semantic(user_input, limit=SEMANTIC_LIMIT, exclude_ids=seen)
+        s.set(results=len(related))
+    with tracing.span("memory.recall_summaries"):
+        summaries = mem.recall_summaries(SUMMARY_LIMIT)
+    memory_block = format_memory_block(recent, tagged + keywords, summaries, related=related)
 
     sys_prompt = (
         "You are an assistant that uses provided memory to stay consistent with the user's history. "
@@ -74,19 +122,28 @@ def main():
         {"role": "user", "content": f"Memory:\n{memory_block}\n\nCurrent request:\n{user_input}"}
     ]
 
-    resp = client.chat.completions.create(model=MODEL, messages=messages)
-    agent_text = resp.choices[0].message.content.strip()
+    # Streamed to the terminal; chat() still returns the whole answer for memory
+    agent_text = stream_chat(client, messages, MODEL)
 
-    print("Agent:", agent_text)
+    # Save the turn with its tags (explicit and auto-detected) in one transaction
+    with tracing.span("memory.add_interaction"):   # the SQLite commit
+        mem.add_interaction(user_input, agent_text, tags=tags + auto_tags)
+    with tracing.span("compact", budget=COMPACT_BUDGET):
+        compact(mem, budget=COMPACT_BUDGET)  # resumable; the rest happens on later turns
+    return agent_text
 
-    auto_tags = extract_keywords(user_input)
-    if auto_tags:
-        for tag in auto_tags:
-            mem.add_interaction(f"#auto_tag {tag}", "(auto-tag)")  # optional marker
+def main():
+    load_env(__file__)  # .env with OPENAI_API_KEY, if there is one
+    client = get_client()
+    # memory.db in project root; MEMORY_CONVERSATION keeps separate users/projects apart
+    with tracing.span("memory.open"):
+        mem = MemoryStore(conversation_id=os.getenv("MEMORY_CONVERSATION", DEFAULT_CONVERSATION), semantic=True)
 
-    # Save to memory
-    mem.add_interaction(user_input, agent_text)
+    # Input prompt via CLI or interactive
+    user_input = " ".join(sys.argv[1:]) if len(sys.argv) > 1 else input("You: ")
+    with tracing.span("turn"):
+        answer_turn(client, mem, user_input)
     mem.close()
 
 if __name__ == "__main__":
-    main()
+    run_agent(__file__, main)
@@ -0,0 +1,155 @@
+# src/compaction.py
+"""
+Tiered memory compaction for MemoryStore.
+- Turns older than keep_days are folded, one session at a time, into a 'session'
+  summary; the raw turns move to turns_archive (out of recall and the FTS index).
+- Session summaries of a finished day roll up into a 'day' summary, and days of a
+  finished month into a 'month' summary; rolled-up rows keep a parent_id.
+- Every fold is one short transaction and progress lives in the tables themselves,
+  so compaction can stop at any point (time budget, crash) and resume later.
+- Conversations are compacted separately; a session also ends when session_id changes.
+
+Usage:
+  python src/compaction.py [--keep-days 7] [--budget 0]   # 0 = run until done
+"""
+
+from __future__ import annotations
+import re
+import time
+import argparse
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+try:
+    from .memory import MemoryStore
+except ImportError:
+    from memory import MemoryStore
+
+KEEP_DAYS = 7           # raw turns newer than this are never compacted
+SESSION_GAP = 30 * 60   # seconds of silence that end a session
+MAX_SESSION_TURNS = 200 # longer sessions are folded in pieces
+SUMMARY_CHARS = 600     # extractive summaries are cut to this length
+
+Summarizer = Callable[[List[str], str], str]   # (texts, level) -> summary text
+
+def extractive_summary(texts: List[str], level: str) -> str:
+    """
+    Offline default: the first sentence of each text, de-duplicated, up to SUMMARY_CHARS.
+    agent.py can pass an LLM-backed summarizer instead.
+    """
+    out, seen, used = [], set(), 0
+    for t in texts:
+        first = re.split(r"(?<=[.!?])\s", t.strip(), maxsplit=1)[0].strip()
+        key = first.lower()
+        if not first or key in seen:
+            continue
+        if used + len(first) > SUMMARY_CHARS:
+            break
+        seen.add(key)
+        out.append(first)
+        used += len(first) + 2
+    return "; ".join(out)
+
+def _ts(s: str) -> datetime:
+    return datetime.fromisoformat(s)
+
+def _next_session(store: MemoryStore, cutoff: str) -> Tuple[str, List[Tuple[int, str, str, str]]]:
+    """(conversation_id, oldest run of its raw turns before cutoff with no gap over
+    SESSION_GAP and one session_id)."""
+    first = store.conn.execute("SELECT conversation_id FROM turns WHERE ts < ? ORDER BY ts, id LIMIT 1",
+                               (cutoff,)).fetchone()
+    if first is None:
+        return "", []
+    conv = first["conversation_id"]
+    rows = store.conn.execute(
+        "SELECT id, role, text, ts, session_id FROM turns WHERE conversation_id = ? AND ts < ? ORDER BY id LIMIT ?",
+        (conv, cutoff, MAX_SESSION_TURNS)).fetchall()
+    session = []
+    for r in rows:
+        if session and (r["session_id"] != rows[0]["session_id"]
+                        or (_ts(r["ts"]) - _ts(session[-1][3])).total_seconds() > SESSION_GAP):
+            break
+        session.append((r["id"], r["role"], r["text"], r["ts"]))
+    return conv, session
+
+def _fold_session(store: MemoryStore, summarize: Summarizer, cutoff: str) -> bool:
+    conv, session = _next_session(store, cutoff)
+    if not session:
+        return False
+    # user turns carry the facts; agent replies are kept only if there is nothing else
+    texts = [t for _, role, t, _ in session if role == "user"] or [t for _, _, t, _ in session]
+    first_id, last_id = session[0][0], session[-1][0]
+    with store.conn:
+        c = store.conn.cursor()
+        c.execute("INSERT INTO summaries(level, period, first_id, last_id, text, ts, conversation_id) "
+                  "VALUES ('session', ?, ?, ?, ?, ?, ?)",
+                  (session[0][3], first_id, last_id, summarize(texts, "session"), datetime.utcnow().isoformat(), conv))
+        sid = c.lastrowid
+        # other conversations may have turns inside the id range
+        c.execute("INSERT INTO turns_archive(id, role, text, ts, summary_id, conversation_id) "
+                  "SELECT id, role, text, ts, ?, conversation_id FROM turns "
+                  "WHERE conversation_id = ? AND id BETWEEN ? AND ?", (sid, conv, first_id, last_id))
+        c.execute("DELETE FROM turns WHERE conversation_id = ? AND id BETWEEN ? AND ?", (conv, first_id, last_id))
+    return True
+
+def _roll_up(store: MemoryStore, summarize: Summarizer, child: str, parent: str, key_len: int,
+             before: str) -> bool:
+    """Fold all open `child` summaries of the oldest period (first key_len chars) < before,
+    within one conversation."""
+    row = store.conn.execute(
+        f"SELECT conversation_id, substr(period, 1, {key_len}) AS p FROM summaries WHERE parent_id IS NULL "
+        f"AND level = ? AND substr(period, 1, {key_len}) < ? ORDER BY period LIMIT 1", (child, before)).fetchone()
+    if row is None:
+        return False
+    conv, period = row["conversation_id"], row["p"]
+    kids = store.conn.execute(
+        "SELECT id, text, first_id, last_id FROM summaries WHERE conversation_id = ? AND parent_id IS NULL "
+        "AND level = ? AND substr(period, 1, ?) = ? ORDER BY period", (conv, child, key_len, period)).fetchall()
+    with store.conn:
+        c = store.conn.cursor()
+        c.execute("INSERT INTO summaries(level, period, first_id, last_id, text, ts, conversation_id) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                  (parent, period, min(k["first_id"] for k in kids), max(k["last_id"] for k in kids),
+                   summarize([k["text"] for k in kids], parent), datetime.utcnow().isoformat(), conv))
+        pid = c.lastrowid
+        c.executemany("UPDATE summaries SET parent_id = ? WHERE id = ?", [(pid, k["id"]) for k in kids])
+    return True
+
+def compact_step(store: MemoryStore, summarize: Summarizer = extractive_summary,
+                 keep_days: float = KEEP_DAYS, now: Optional[datetime] = None) -> bool:
+    """Do one unit of work (one transaction); returns False when nothing is left."""
+    store.flush()
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=keep_days)
+    with store._lock:   # the writer connection is shared in pooled mode
+        if _fold_session(store, summarize, cutoff.isoformat()):
+            return True
+        # a day (month) is finished once it lies entirely before the raw-turn cutoff
+        if _roll_up(store, summarize, "session", "day", 10, cutoff.strftime("%Y-%m-%d")):
+            return True
+        return _roll_up(store, summarize, "day", "month", 7, cutoff.strftime("%Y-%m"))
+
+def compact(store: MemoryStore, summarize: Summarizer = extractive_summary, keep_days: float = KEEP_DAYS,
+            budget: float = 0.0, now: Optional[datetime] = None) -> int:
+    """Run steps until done or `budget` seconds have passed (0 = no limit); returns steps done."""
+    deadline = time.monotonic() + budget if budget > 0 else None
+    steps = 0
+    while compact_step(store, summarize, keep_days, now):
+        steps += 1
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+    return steps
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold old memory turns into summaries")
+    parser.add_argument("--db", default=None, help="memory DB (default: ./memory.db)")
+    parser.add_argument("--keep-days", type=float, default=KEEP_DAYS)
+    parser.add_argument("--budget", type=float, default=0.0, help="seconds to spend (0 = until done)")
+    args = parser.parse_args()
+    store = MemoryStore(args.db) if args.db else MemoryStore()
+    steps = compact(store, keep_days=args.keep_days, budget=args.budget)
+    print(f"Compacted in {steps} step(s); {store.count()} raw turns remain")
+    store.close()
+
+if __name__ == "__main__":
+    main()
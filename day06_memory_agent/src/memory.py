@@ -2,105 +2,721 @@
 """
 SQLite-backed conversation memory for an AI agent.
 - Stores user/agent messages with timestamps.
-- Recalls recent turns and keyword matches.
+- Recalls recent turns and keyword matches; recall_ranked scores many terms at once
+  with BM25 and a recency decay and returns highlighted snippets.
 - Falls back to LIKE-based search if FTS5 isn't available.
+- Batches writes: add_interactions commits many turns in one transaction, and the
+  optional write-behind mode queues turns until a size/time threshold, flush() or close().
+- Scopes turns by conversation and session; store.session(...) gives per-user views
+  over one store, and readers=N makes the store thread-safe (one writer connection,
+  N reader connections under WAL). AsyncMemoryStore wraps it for asyncio.
+- Tags live in tags/turn_tags, linked to the user turn they came from; recall_tagged
+  is an indexed join (the old "#auto_tag" pseudo-turns are migrated away).
+- With semantic=True (the agent), stores a local vector per turn (turns.vec, see vectors.py) and answers
+  recall_semantic from an in-memory ANN index, one per conversation, built on its
+  first search. Needs NumPy;
+  without it the column stays empty and semantic recall returns nothing.
+  vectors.py (and NumPy) is imported by the first store with semantic=True, asyncio
+  by the first AsyncMemoryStore.
 """
 
 from __future__ import annotations
 import os
+import re
+import copy
+import time
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import List, Tuple, Optional
+from typing import Callable, Iterable, Iterator, List, Tuple, Optional
 from datetime import datetime
 
+vectors = None   # vectors.py, imported by the first semantic store (it pulls in NumPy)
+
+def _load_vectors():
+    """The vectors module, imported on first use; None when NumPy is missing."""
+    global vectors
+    if vectors is None:
+        try:
+            from . import vectors as module
+        except ImportError:
+            try:
+                import vectors as module
+            except ImportError:   # NumPy missing: no semantic recall
+                return None
+        vectors = module
+    return vectors
+
 DEFAULT_DB = os.path.join(os.path.dirname(os.path.dirname(__file__)), "memory.db")
+FLUSH_SIZE = 64         # write-behind: flush once this many interactions are queued
+FLUSH_INTERVAL = 1.0    # write-behind: ... or when the oldest queued one is this old (seconds)
+JOURNAL_MODES = ("delete", "truncate", "persist", "memory", "wal", "off")
+SYNCHRONOUS = ("off", "normal", "full", "extra")
+HALF_LIFE_DAYS = 30.0   # recall_ranked: a match this old scores half as much as a fresh one
+CANDIDATES = 8          # recall_ranked: BM25 candidates fetched per requested result
+LIKE_WINDOW = 5000      # recall_ranked without FTS: only the newest turns are scanned
+SNIPPET_TOKENS = 16
+HIGHLIGHT = ("**", "**")
+DEFAULT_CONVERSATION = "default"
+DEFAULT_SESSION = "default"
+SEMANTIC_MIN = 0.2      # recall_semantic: cosine below this is not a match
+BACKFILL_BATCH = 1000   # turns embedded per transaction when vectors are backfilled
+PSEUDO_TAG = "#auto_tag "            # legacy tag rows, converted by _migrate_tags
+PSEUDO_LIKE = "#auto\\_tag %"
+PSEUDO_REPLY = "(auto-tag)"
 
 @dataclass
 class Turn:
     role: str
     text: str
     ts: str
+    id: Optional[int] = None
+
+@dataclass
+class Summary:
+    level: str      # 'session', 'day' or 'month'
+    period: str
+    text: str
+    first_id: int
+    last_id: int
+
+@dataclass
+class Recall(Turn):
+    """A ranked match: text is a highlighted snippet; score is relevance x recency."""
+    score: float = 0.0
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+def _fts_query(terms: Iterable[str], conversation_id: Optional[str] = None) -> str:
+    """OR of quoted terms in the text column, so user text can't inject FTS syntax;
+    optionally ANDed with a conversation filter evaluated inside the index."""
+    query = "text : (" + " OR ".join(_quote(t) for t in terms) + ")"
+    return query if conversation_id is None else f"conversation_id : {_quote(conversation_id)} AND {query}"
+
+def _age_days(ts: str, now: datetime) -> float:
+    try:
+        return max(0.0, (now - datetime.fromisoformat(ts)).total_seconds() / 86400)
+    except ValueError:
+        return 0.0
+
+def _like_snippet(text: str, terms: List[str], tokens: int = SNIPPET_TOKENS) -> str:
+    """Python counterpart of FTS5 snippet(): a window of words around the first match."""
+    words = text.split()
+    pattern = re.compile("|".join(re.escape(t) for t in terms), re.IGNORECASE)
+    first = next((i for i, w in enumerate(words) if pattern.search(w)), 0)
+    lo = max(0, first - tokens // 2)
+    hi = min(len(words), lo + tokens)
+    out = " ".join(pattern.sub(lambda m: f"{HIGHLIGHT[0]}{m.group(0)}{HIGHLIGHT[1]}", w) for w in words[lo:hi])
+    return ("..." if lo > 0 else "") + out + ("..." if hi < len(words) else "")
+
+def _head(text: str, tokens: int) -> str:
+    words = text.split()
+    return " ".join(words[:tokens]) + (" ..." if len(words) > tokens else "")
+
+def _rank(rows, limit: int, half_life_days: float, exclude_ids: Iterable[int]) -> List[Recall]:
+    """rows: (id, role, ts, relevance, snippet, text). Best first after recency decay,
+    one result per distinct text, exclude_ids skipped."""
+    now = datetime.utcnow()
+    skip = set(exclude_ids)
+    seen, out = set(), []
+    scored = sorted(((rel * 0.5 ** (_age_days(ts, now) / half_life_days), i, role, ts, snip, text)
+                     for i, role, ts, rel, snip, text in rows), key=lambda r: (-r[0], -r[1]))
+    for score, i, role, ts, snip, text in scored:
+        key = " ".join(text.lower().split())
+        if i in skip or key in seen:
+            continue
+        seen.add(key)
+        out.append(Recall(role, snip, ts, i, score))
+        if len(out) == limit:
+            break
+    return out
+
+def _migrate_base(conn: sqlite3.Connection):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS turns (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        role TEXT CHECK(role IN ('user','agent')) NOT NULL,
+        text TEXT NOT NULL,
+        ts   TEXT NOT NULL
+    );
+    """)
+
+def _migrate_fts_triggers(conn: sqlite3.Connection):
+    """
+    FTS5 index over turns.text, kept in sync by triggers instead of by hand.
+    The one-off 'rebuild' backfills (and repairs drift in) DBs from before triggers.
+    Builds without FTS5 skip this step and use the LIKE fallback.
+    """
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS turns_fts USING fts5(text, content='turns', content_rowid='id');")
+    except sqlite3.OperationalError:
+        return
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS turns_ai AFTER INSERT ON turns BEGIN
+        INSERT INTO turns_fts(rowid, text) VALUES (new.id, new.text);
+    END;""")
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS turns_ad AFTER DELETE ON turns BEGIN
+        INSERT INTO turns_fts(turns_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END;""")
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS turns_au AFTER UPDATE OF text ON turns BEGIN
+        INSERT INTO turns_fts(turns_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO turns_fts(rowid, text) VALUES (new.id, new.text);
+    END;""")
+    conn.execute("INSERT INTO turns_fts(turns_fts) VALUES ('rebuild')")
+
+def _migrate_compaction(conn: sqlite3.Connection):
+    """
+    Tables for compaction.py: summaries of folded turns (session -> day -> month;
+    parent_id is set once a summary has been rolled up) and the raw-turn archive,
+    which normal recall never reads.
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS summaries (
+        id        INTEGER PRIMARY KEY AUTOINCREMENT,
+        level     TEXT CHECK(level IN ('session','day','month')) NOT NULL,
+        period    TEXT NOT NULL,       -- session start ts, YYYY-MM-DD or YYYY-MM
+        first_id  INTEGER NOT NULL,    -- turn id range covered
+        last_id   INTEGER NOT NULL,
+        text      TEXT NOT NULL,
+        ts        TEXT NOT NULL,       -- when the summary was written
+        parent_id INTEGER REFERENCES summaries(id)
+    );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS summaries_open ON summaries(parent_id, level, period)")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS turns_archive (
+        id   INTEGER PRIMARY KEY,
+        role TEXT NOT NULL,
+        text TEXT NOT NULL,
+        ts   TEXT NOT NULL,
+        summary_id INTEGER NOT NULL REFERENCES summaries(id)
+    );
+    """)
+
+def _migrate_sessions(conn: sqlite3.Connection):
+    """
+    Conversation/session scoping; existing rows land in the default conversation.
+    turns_fts gets a conversation_id column, so a MATCH can be restricted to one
+    conversation inside the index instead of ranking every conversation's hits.
+    """
+    for table in ("turns", "summaries", "turns_archive"):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN conversation_id TEXT NOT NULL DEFAULT '{DEFAULT_CONVERSATION}'")
+    conn.execute(f"ALTER TABLE turns ADD COLUMN session_id TEXT NOT NULL DEFAULT '{DEFAULT_SESSION}'")
+    conn.execute("CREATE INDEX IF NOT EXISTS turns_conversation ON turns(conversation_id, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS turns_session ON turns(session_id, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS summaries_conversation ON summaries(conversation_id, parent_id, last_id)")
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name='turns_fts'").fetchone() is None:
+        return
+    for trigger in ("turns_ai", "turns_ad", "turns_au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("DROP TABLE turns_fts")
+    conn.execute("CREATE VIRTUAL TABLE turns_fts USING fts5(text, conversation_id, content='turns', content_rowid='id');")
+    conn.execute("""
+    CREATE TRIGGER turns_ai AFTER INSERT ON turns BEGIN
+        INSERT INTO turns_fts(rowid, text, conversation_id) VALUES (new.id, new.text, new.conversation_id);
+    END;""")
+    conn.execute("""
+    CREATE TRIGGER turns_ad AFTER DELETE ON turns BEGIN
+        INSERT INTO turns_fts(turns_fts, rowid, text, conversation_id)
+        VALUES ('delete', old.id, old.text, old.conversation_id);
+    END;""")
+    conn.execute("""
+    CREATE TRIGGER turns_au AFTER UPDATE OF text, conversation_id ON turns BEGIN
+        INSERT INTO turns_fts(turns_fts, rowid, text, conversation_id)
+        VALUES ('delete', old.id, old.text, old.conversation_id);
+        INSERT INTO turns_fts(rowid, text, conversation_id) VALUES (new.id, new.text, new.conversation_id);
+    END;""")
+    conn.execute("INSERT INTO turns_fts(turns_fts) VALUES ('rebuild')")
+
+def _migrate_vectors(conn: sqlite3.Connection):
+    """Per-turn vector BLOB for semantic recall; old rows are embedded on first use."""
+    conn.execute("ALTER TABLE turns ADD COLUMN vec BLOB")
+
+def _migrate_tags(conn: sqlite3.Connection):
+    """
+    Tag index replacing the "#auto_tag <tag>" / "(auto-tag)" pseudo-turns the agent
+    used to store just before each real turn. Each pseudo tag is linked to the next
+    real user turn of its conversation, then the pseudo-turns are deleted.
+    """
+    conn.execute("CREATE TABLE IF NOT EXISTS tags (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS turn_tags (
+        tag_id  INTEGER NOT NULL REFERENCES tags(id),
+        turn_id INTEGER NOT NULL REFERENCES turns(id),
+        PRIMARY KEY (tag_id, turn_id)
+    ) WITHOUT ROWID;
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS turn_tags_turn ON turn_tags(turn_id)")
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS turns_tags_ad AFTER DELETE ON turns BEGIN
+        DELETE FROM turn_tags WHERE turn_id = old.id;
+    END;""")
+    conn.execute(f"""
+    CREATE TEMP TABLE pseudo_tags AS
+    SELECT lower(trim(substr(p.text, {len(PSEUDO_TAG) + 1}))) AS name,
+           (SELECT MIN(t.id) FROM turns t
+            WHERE t.conversation_id = p.conversation_id AND t.id > p.id AND t.role = 'user'
+              AND t.text NOT LIKE ? ESCAPE '\\') AS turn_id
+    FROM turns p WHERE p.role = 'user' AND p.text LIKE ? ESCAPE '\\'
+    """, (PSEUDO_LIKE, PSEUDO_LIKE))
+    conn.execute("INSERT OR IGNORE INTO tags(name) SELECT DISTINCT name FROM pseudo_tags "
+                 "WHERE name != '' AND turn_id IS NOT NULL")
+    conn.execute("INSERT OR IGNORE INTO turn_tags(tag_id, turn_id) SELECT g.id, p.turn_id FROM pseudo_tags p "
+                 "JOIN tags g ON g.name = p.name WHERE p.turn_id IS NOT NULL")
+    conn.execute("DROP TABLE pseudo_tags")
+    for table in ("turns", "turns_archive"):
+        conn.execute(f"DELETE FROM {table} WHERE (role = 'user' AND text LIKE ? ESCAPE '\\') "
+                     f"OR (role = 'agent' AND text = ?)", (PSEUDO_LIKE, PSEUDO_REPLY))
+
+def _migrate_turns_ts(conn: sqlite3.Connection):
+    """Index for compaction's "oldest raw turn before the cutoff" probe, which otherwise scans turns."""
+    conn.execute("CREATE INDEX IF NOT EXISTS turns_ts ON turns(ts)")
+
+def _migrate_session_scope(conn: sqlite3.Connection):
+    """Session ids are only unique within a conversation, so the session index leads with it."""
+    conn.execute("DROP INDEX IF EXISTS turns_session")
+    conn.execute("CREATE INDEX IF NOT EXISTS turns_conversation_session ON turns(conversation_id, session_id, id)")
+
+# MIGRATIONS[i] upgrades a DB from user_version i to i + 1. Append only; never edit old steps.
+MIGRATIONS = [
+    _migrate_base,
+    _migrate_fts_triggers,
+    _migrate_compaction,
+    _migrate_sessions,
+    _migrate_vectors,
+    _migrate_tags,
+    _migrate_turns_ts,
+    _migrate_session_scope,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def _tag(name: str) -> str:
+    return name.strip().lstrip("#").lower()
+
+class _WriteQueue:
+    """Write-behind state shared by a store and its session views."""
+    def __init__(self):
+        self.rows: List[Tuple[str, str, str, str, str, Tuple[str, ...]]] = []
+        self.since = 0.0
+        self.timer: Optional[threading.Timer] = None   # flushes the queue flush_interval after its first row
+
+class _Semantic:
+    """Vector index shared by a store and its session views; conversations load on first search."""
+    def __init__(self):
+        self.index = None   # vectors.SemanticIndex, created with the embedder's dimension
+        self.lock = threading.Lock()
 
 class MemoryStore:
-    def __init__(self, db_path: str = DEFAULT_DB):
+    """
+    journal_mode / synchronous: SQLite pragmas (e.g. "wal" + "normal" trades the
+    per-commit fsync for one at checkpoint); None keeps SQLite's defaults.
+    write_behind: queue add_interaction calls and write them as one transaction when
+    flush_size are pending or the oldest is flush_interval seconds old; a timer thread
+    enforces the age limit even when no further call comes. Reads, flush() and close()
+    write the queue first, so callers always see their own turns.
+    conversation_id / session_id: scope of this handle. Writes are tagged with both;
+    recall covers the conversation (recall_recent can narrow to the session).
+    readers: 0 = one connection, for use from one thread (the classic mode). N > 0 =
+    pooled and thread-safe: WAL, writes serialized on the writer connection, reads
+    spread over N read-only connections.
+    semantic: store turn vectors and allow recall_semantic (needs NumPy); off by
+    default, the agent turns it on. embed: str -> unit float32 vector (default
+    vectors.embed, hashed word/trigram features).
+    vector_codec: "int8" or "float32" BLOBs.
+    """
+    def __init__(self, db_path: str = DEFAULT_DB, journal_mode: Optional[str] = None,
+                 synchronous: Optional[str] = None, write_behind: bool = False,
+                 flush_size: int = FLUSH_SIZE, flush_interval: float = FLUSH_INTERVAL,
+                 conversation_id: str = DEFAULT_CONVERSATION, session_id: str = DEFAULT_SESSION,
+                 readers: int = 0, semantic: bool = False, embed: Optional[Callable] = None,
+                 vector_codec: str = "int8"):
         self.db_path = db_path
-        self.conn = sqlite3.connect(self.db_path)
+        self.conversation_id = conversation_id
+        self.session_id = session_id
+        self.pooled = readers > 0
+        # the flush timer writes from its own thread; every use of conn is under _lock
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=not (self.pooled or write_behind))
         self.conn.row_factory = sqlite3.Row
+        self._set_pragmas("wal" if self.pooled and journal_mode is None else journal_mode, synchronous)
+        self.write_behind = write_behind
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._queue = _WriteQueue()
+        self._lock = threading.RLock()   # serializes writes (and all access when not pooled)
+        self._flush_lock = threading.RLock()   # one flush at a time, so queued batches land in order
+        self._view = False
+        self.embed = (embed or vectors.embed) if semantic and _load_vectors() else None
+        self.vector_codec = vector_codec
+        self._semantic = _Semantic()
         self._init_schema()
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(readers):
+            rc = sqlite3.connect(self.db_path, check_same_thread=False)
+            rc.row_factory = sqlite3.Row
+            rc.execute("PRAGMA query_only=1")
+            self._readers.put(rc)
 
-    def _init_schema(self):
-        c = self.conn.cursor()
-        # Base table
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS turns (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            role TEXT CHECK(role IN ('user','agent')) NOT NULL,
-            text TEXT NOT NULL,
-            ts   TEXT NOT NULL
-        );
-        """)
-        # Attempt to create FTS5 virtual table for fast search
+    def session(self, conversation_id: str, session_id: str = DEFAULT_SESSION) -> "MemoryStore":
+        """A handle scoped to another conversation/session, sharing connections and queue."""
+        view = copy.copy(self)
+        view.conversation_id = conversation_id
+        view.session_id = session_id
+        view._view = True
+        return view
+
+    @contextmanager
+    def _reading(self) -> Iterator[sqlite3.Connection]:
+        self.flush()
+        if not self.pooled:
+            with self._lock:
+                yield self.conn
+            return
+        conn = self._readers.get()
         try:
-            c.execute("CREATE VIRTUAL TABLE IF NOT EXISTS turns_fts USING fts5(text, content='turns', content_rowid='id');")
-            c.execute("INSERT INTO turns_fts(rowid, text) SELECT id, text FROM turns WHERE id NOT IN (SELECT rowid FROM turns_fts);")
-            self.conn.commit()
-            self.has_fts = True
-        except sqlite3.OperationalError:
-            self.conn.rollback()
-            self.has_fts = False
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def _set_pragmas(self, journal_mode: Optional[str], synchronous: Optional[str]):
+        if journal_mode is not None:
+            if journal_mode.lower() not in JOURNAL_MODES:
+                raise ValueError(f"journal_mode must be one of {JOURNAL_MODES}")
+            self.conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        if synchronous is not None:
+            if synchronous.lower() not in SYNCHRONOUS:
+                raise ValueError(f"synchronous must be one of {SYNCHRONOUS}")
+            self.conn.execute(f"PRAGMA synchronous={synchronous}")
 
-        self.conn.commit()
+    def _init_schema(self):
+        """
+        Run pending migrations (tracked in PRAGMA user_version), then detect FTS.
+        An up-to-date DB costs two tiny queries here, however many turns it holds.
+        """
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f"{self.db_path} has schema v{version}; this code supports up to v{SCHEMA_VERSION}")
+        while version < SCHEMA_VERSION:
+            # each step and its version bump commit together; IMMEDIATE keeps two
+            # processes opening an old DB from running the same step twice
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+                if version < SCHEMA_VERSION:
+                    MIGRATIONS[version](self.conn)
+                    version += 1
+                    self.conn.execute(f"PRAGMA user_version={version}")
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        self.has_fts = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='turns_fts'").fetchone() is not None
 
-    def add_interaction(self, user_text: str, agent_text: str):
+    def add_interaction(self, user_text: str, agent_text: str, tags: Iterable[str] = ()):
+        """tags are attached to the user turn (see recall_tagged)."""
         now = datetime.utcnow().isoformat()
-        c = self.conn.cursor()
-        # Insert user then agent
-        c.execute("INSERT INTO turns(role, text, ts) VALUES (?, ?, ?)", ("user", user_text, now))
-        user_id = c.lastrowid
-        c.execute("INSERT INTO turns(role, text, ts) VALUES (?, ?, ?)", ("agent", agent_text, now))
-        agent_id = c.lastrowid
-
-        if self.has_fts:
-            c.execute("INSERT INTO turns_fts(rowid, text) VALUES (?, ?)", (user_id, user_text))
-            c.execute("INSERT INTO turns_fts(rowid, text) VALUES (?, ?)", (agent_id, agent_text))
-
-        self.conn.commit()
-
-    def recall_recent(self, k: int = 6) -> List[Turn]:
-        c = self.conn.cursor()
-        c.execute("SELECT role, text, ts FROM turns ORDER BY id DESC LIMIT ?", (k,))
-        rows = [Turn(r["role"], r["text"], r["ts"]) for r in c.fetchall()]
+        row = (user_text, agent_text, now, self.conversation_id, self.session_id, tuple(tags))
+        if not self.write_behind:
+            self._write([row])
+            return
+        with self._lock:
+            q = self._queue
+            if not q.rows:
+                q.since = time.monotonic()
+                q.timer = threading.Timer(self.flush_interval, self._flush_due)
+                q.timer.daemon = True
+                q.timer.start()
+            q.rows.append(row)
+            due = len(q.rows) >= self.flush_size or time.monotonic() - q.since >= self.flush_interval
+        if due:
+            self.flush()
+
+    def add_interactions(self, pairs: Iterable[Tuple]):
+        """Store many (user_text, agent_text[, tags]) in one transaction (one commit)."""
+        now = datetime.utcnow().isoformat()
+        rows = [(p[0], p[1], now, self.conversation_id, self.session_id, tuple(p[2]) if len(p) > 2 else ())
+                for p in pairs]
+        with self._flush_lock:
+            self.flush()  # keep insertion order with anything queued earlier
+            self._write(rows)
+
+    def flush(self):
+        """Write queued interactions (write-behind mode) as one transaction."""
+        if not self.write_behind:
+            return
+        # held while the batch is embedded (outside _lock), so a reader waits for its own turns
+        with self._flush_lock:
+            with self._lock:
+                q = self._queue
+                pending, q.rows = q.rows, []
+                if q.timer is not None:
+                    q.timer.cancel()
+                    q.timer = None
+            self._write(pending)
+
+    def _flush_due(self):
+        """Timer thread: the oldest queued interaction is flush_interval old."""
+        try:
+            self.flush()
+        except sqlite3.ProgrammingError:   # the store was closed meanwhile
+            pass
+
+    def _vec(self, text: str) -> Optional[bytes]:
+        return vectors.encode(self.embed(text), self.vector_codec) if self.embed else None
+
+    def _write(self, rows: List[Tuple[str, str, str, str, str, Tuple[str, ...]]]):
+        if not rows:
+            return
+        # embed outside the lock so other writers are not held up
+        turns = [((role, text, ts, conv, sess, self._vec(text)), tags if role == "user" else ())
+                 for user_text, agent_text, ts, conv, sess, tags in rows
+                 for role, text in (("user", user_text), ("agent", agent_text))]   # user then agent
+        added = []
+        with self._lock:
+            with self.conn:  # one transaction; rolls back on error
+                c = self.conn.cursor()
+                for turn, tags in turns:
+                    c.execute("INSERT INTO turns(role, text, ts, conversation_id, session_id, vec) "
+                              "VALUES (?, ?, ?, ?, ?, ?)", turn)
+                    tid = c.lastrowid   # before the tag INSERTs below reuse the cursor
+                    added.append((tid, turn[3], turn[5]))
+                    names = [n for n in dict.fromkeys(_tag(t) for t in tags) if n]
+                    if names:
+                        c.executemany("INSERT OR IGNORE INTO tags(name) VALUES (?)", [(n,) for n in names])
+                        c.executemany("INSERT OR IGNORE INTO turn_tags(tag_id, turn_id) "
+                                      "SELECT id, ? FROM tags WHERE name = ?", [(tid, n) for n in names])
+            index = self._semantic.index   # conversations load under this lock, so no row is added twice
+            if index is not None:
+                for tid, conv, blob in added:
+                    if blob is not None:
+                        index.add(tid, conv, blob)
+
+    def recall_recent(self, k: int = 6, this_session: bool = False) -> List[Turn]:
+        """Last k turns of the conversation (or of this session), via the (scope, id) index."""
+        where, args = "conversation_id = ?", (self.conversation_id,)
+        if this_session:
+            where, args = "conversation_id = ? AND session_id = ?", (self.conversation_id, self.session_id)
+        with self._reading() as conn:
+            rows = conn.execute(f"SELECT id, role, text, ts FROM turns WHERE {where} "
+                                f"ORDER BY id DESC LIMIT ?", (*args, k)).fetchall()
+        rows = [Turn(r["role"], r["text"], r["ts"], r["id"]) for r in rows]
         rows.reverse()
         return rows
 
     def recall_keywords(self, query: str, limit: int = 6) -> List[Turn]:
-        c = self.conn.cursor()
-        if self.has_fts:
-            # Simple FTS query (tokenized)
-            c.execute("""
-            SELECT t.role, t.text, t.ts
-            FROM turns_fts f
-            JOIN turns t ON t.id = f.rowid
-            WHERE f.text MATCH ?
-            ORDER BY t.id DESC LIMIT ?;
-            """, (query, limit))
-        else:
-            # Fallback LIKE search
-            like = f"%{query}%"
-            c.execute("""
-            SELECT role, text, ts
-            FROM turns
-            WHERE text LIKE ?
-            ORDER BY id DESC LIMIT ?;
-            """, (like, limit))
-        rows = [Turn(r["role"], r["text"], r["ts"]) for r in c.fetchall()]
+        with self._reading() as conn:
+            if self.has_fts:
+                # Simple FTS query (tokenized)
+                rows = conn.execute("""
+                SELECT t.role, t.text, t.ts
+                FROM turns_fts f
+                JOIN turns t ON t.id = f.rowid
+                WHERE f.text MATCH ? AND t.conversation_id = ?
+                ORDER BY t.id DESC LIMIT ?;
+                """, (query, self.conversation_id, limit)).fetchall()
+            else:
+                # Fallback LIKE search
+                like = f"%{query}%"
+                rows = conn.execute("""
+                SELECT role, text, ts
+                FROM turns
+                WHERE conversation_id = ? AND text LIKE ?
+                ORDER BY id DESC LIMIT ?;
+                """, (self.conversation_id, like, limit)).fetchall()
+        rows = [Turn(r["role"], r["text"], r["ts"]) for r in rows]
+        rows.reverse()
+        return rows
+
+    def recall_ranked(self, terms: Iterable[str], limit: int = 6, half_life_days: float = HALF_LIFE_DAYS,
+                      exclude_ids: Iterable[int] = ()) -> List[Recall]:
+        """
+        One query for all terms (OR), best first. Score = BM25 relevance (with FTS5) or
+        matched-term count (LIKE fallback, newest LIKE_WINDOW turns only), times
+        0.5 ** (age / half_life_days). Identical texts and exclude_ids (e.g. turns
+        already in the recent block) are skipped.
+        """
+        terms = [t for t in dict.fromkeys(t.strip().lower() for t in terms) if t]
+        if not terms or limit <= 0:
+            return []
+        n = limit * CANDIDATES
+        with self._reading() as conn:
+            if self.has_fts:
+                rows = conn.execute(f"""
+                SELECT t.id, t.role, t.ts, -bm25(turns_fts, 1.0, 0.0) AS relevance,
+                       snippet(turns_fts, 0, ?, ?, '...', {int(SNIPPET_TOKENS)}) AS snip, t.text
+                FROM turns_fts
+                JOIN turns t ON t.id = turns_fts.rowid
+                WHERE turns_fts MATCH ? AND t.conversation_id = ?
+                ORDER BY bm25(turns_fts, 1.0, 0.0) LIMIT ?;
+                """, (*HIGHLIGHT, _fts_query(terms, self.conversation_id), self.conversation_id, n)).fetchall()
+                rows = [(r["id"], r["role"], r["ts"], r["relevance"], r["snip"], r["text"]) for r in rows]
+            else:
+                # newest LIKE_WINDOW turns of the conversation, through the (conversation_id, id) index
+                hits = " + ".join("(text LIKE ?)" for _ in terms)
+                likes = [f"%{t}%" for t in terms]
+                rows = conn.execute(f"""
+                SELECT id, role, ts, text, ({hits}) AS relevance
+                FROM (SELECT id, role, ts, text FROM turns WHERE conversation_id = ?
+                      ORDER BY id DESC LIMIT ?)
+                WHERE {hits.replace(' + ', ' OR ')}
+                ORDER BY relevance DESC, id DESC LIMIT ?;
+                """, (*likes, self.conversation_id, LIKE_WINDOW, *likes, n)).fetchall()
+                rows = [(r["id"], r["role"], r["ts"], float(r["relevance"]), _like_snippet(r["text"], terms), r["text"])
+                        for r in rows]
+
+        return _rank(rows, limit, half_life_days, exclude_ids)
+
+    def _semantic_index(self, dim: int):
+        """
+        The vector index with this conversation loaded. On its first search, the
+        conversation's turns stored without a vector of this dimension are embedded,
+        then its vectors are read (other conversations are not touched).
+        """
+        state = self._semantic
+        with state.lock:
+            if state.index is None:
+                state.index = vectors.SemanticIndex(dim)
+            index, conv = state.index, self.conversation_id
+            if conv in index:
+                return index
+            with self._lock:
+                last = 0
+                while True:
+                    todo = self.conn.execute(
+                        "SELECT id, text FROM turns WHERE conversation_id = ? AND id > ? "
+                        "AND (vec IS NULL OR length(vec) NOT IN (?, ?)) ORDER BY id LIMIT ?",
+                        (conv, last, dim + 4, 4 * dim, BACKFILL_BATCH)).fetchall()   # int8 / float32 sizes
+                    if not todo:
+                        break
+                    with self.conn:
+                        self.conn.executemany("UPDATE turns SET vec = ? WHERE id = ?",
+                                              [(self._vec(r["text"]), r["id"]) for r in todo])
+                    last = todo[-1]["id"]
+                rows = self.conn.execute("SELECT id, vec FROM turns WHERE conversation_id = ? AND vec IS NOT NULL",
+                                         (conv,)).fetchall()
+                index.load(conv, [(r["id"], r["vec"]) for r in rows])
+            return index
+
+    def recall_semantic(self, text: str, limit: int = 4, half_life_days: float = HALF_LIFE_DAYS,
+                        exclude_ids: Iterable[int] = (), min_score: float = SEMANTIC_MIN) -> List[Recall]:
+        """
+        Turns of the conversation closest to `text` by vector cosine (>= min_score),
+        times the same recency decay as recall_ranked. Text is cut to 2 * SNIPPET_TOKENS
+        words. Empty when vectors are disabled (semantic=False or no NumPy).
+        """
+        if self.embed is None or limit <= 0:
+            return []
+        self.flush()
+        exclude_ids = set(exclude_ids)
+        q = self.embed(text)
+        index = self._semantic_index(len(q))
+        hits = [(i, s) for i, s in index.search(q, self.conversation_id,
+                                                  limit * CANDIDATES + len(exclude_ids)) if s >= min_score]
+        if not hits:
+            return []
+        sims = dict(hits)
+        with self._reading() as conn:
+            found = conn.execute(f"SELECT id, role, ts, text FROM turns WHERE id IN ({','.join('?' * len(sims))})",
+                                 list(sims)).fetchall()   # compacted turns drop out here
+        rows = [(r["id"], r["role"], r["ts"], sims[r["id"]], _head(r["text"], 2 * SNIPPET_TOKENS), r["text"])
+                for r in found]
+        return _rank(rows, limit, half_life_days, exclude_ids)
+
+    def recall_tagged(self, tags: Iterable[str], limit: int = 6, exclude_ids: Iterable[int] = ()) -> List[Turn]:
+        """Newest turns of the conversation carrying any of the tags (index join), newest first."""
+        names = [n for n in dict.fromkeys(_tag(t) for t in tags) if n]
+        skip = list(set(exclude_ids))
+        if not names or limit <= 0:
+            return []
+        with self._reading() as conn:
+            rows = conn.execute(f"""
+            SELECT DISTINCT t.id, t.role, t.text, t.ts
+            FROM tags g
+            JOIN turn_tags tt ON tt.tag_id = g.id
+            JOIN turns t ON t.id = tt.turn_id
+            WHERE g.name IN ({','.join('?' * len(names))}) AND t.conversation_id = ?
+              AND t.id NOT IN ({','.join('?' * len(skip))})
+            ORDER BY t.id DESC LIMIT ?
+            """, (*names, self.conversation_id, *skip, limit)).fetchall()
+        return [Turn(r["role"], r["text"], r["ts"], r["id"]) for r in rows]
+
+    def tags_of(self, turn_id: int) -> List[str]:
+        with self._reading() as conn:
+            return [r["name"] for r in conn.execute(
+                "SELECT g.name FROM turn_tags tt JOIN tags g ON g.id = tt.tag_id WHERE tt.turn_id = ? ORDER BY g.name",
+                (turn_id,))]
+
+    def recall_summaries(self, limit: int = 6) -> List[Summary]:
+        """Newest top-level summaries (not yet rolled up) of the conversation, oldest first."""
+        with self._reading() as conn:
+            rows = conn.execute("""
+            SELECT level, period, text, first_id, last_id FROM summaries
+            WHERE conversation_id = ? AND parent_id IS NULL ORDER BY last_id DESC LIMIT ?
+            """, (self.conversation_id, limit)).fetchall()
+        rows = [Summary(r["level"], r["period"], r["text"], r["first_id"], r["last_id"]) for r in rows]
         rows.reverse()
         return rows
 
     def count(self) -> int:
-        c = self.conn.cursor()
-        c.execute("SELECT COUNT(*) AS n FROM turns")
-        return int(c.fetchone()["n"])
+        """Raw turns in the whole store (all conversations)."""
+        with self._reading() as conn:
+            return int(conn.execute("SELECT COUNT(*) AS n FROM turns").fetchone()["n"])
 
     def close(self):
+        """Flush; session views stop there, the owning store also closes connections."""
+        self.flush()
+        if self._view:
+            return
         self.conn.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+
+class AsyncMemoryStore:
+    """
+    asyncio facade over a pooled MemoryStore: every call runs in a worker thread, so
+    the event loop never waits on SQLite. Use MemoryStore(..., readers=N).
+    """
+    def __init__(self, store: MemoryStore):
+        if not store.pooled:
+            raise ValueError("AsyncMemoryStore needs a pooled store (readers > 0)")
+        import asyncio   # only asyncio callers pay for the import
+        self.store = store
+        self._to_thread = asyncio.to_thread
+
+    def session(self, conversation_id: str, session_id: str = DEFAULT_SESSION) -> "AsyncMemoryStore":
+        return AsyncMemoryStore(self.store.session(conversation_id, session_id))
+
+    async def add_interaction(self, user_text: str, agent_text: str, tags: Iterable[str] = ()):
+        await self._to_thread(self.store.add_interaction, user_text, agent_text, tuple(tags))
+
+    async def add_interactions(self, pairs: Iterable[Tuple]):
+        await self._to_thread(self.store.add_interactions, list(pairs))
+
+    async def recall_recent(self, k: int = 6, this_session: bool = False) -> List[Turn]:
+        return await self._to_thread(self.store.recall_recent, k, this_session)
+
+    async def recall_keywords(self, query: str, limit: int = 6) -> List[Turn]:
+        return await self._to_thread(self.store.recall_keywords, query, limit)
+
+    async def recall_ranked(self, terms: Iterable[str], limit: int = 6, **kwargs) -> List[Recall]:
+        return await self._to_thread(self.store.recall_ranked, list(terms), limit, **kwargs)
+
+    async def recall_semantic(self, text: str, limit: int = 4, **kwargs) -> List[Recall]:
+        return await self._to_thread(self.store.recall_semantic, text, limit, **kwargs)
+
+    async def recall_tagged(self, tags: Iterable[str], limit: int = 6, **kwargs) -> List[Turn]:
+        return await self._to_thread(self.store.recall_tagged, list(tags), limit, **kwargs)
+
+    async def recall_summaries(self, limit: int = 6) -> List[Summary]:
+        return await self._to_thread(self.store.recall_summaries, limit)
+
+    async def flush(self):
+        await self._to_thread(self.store.flush)
+
+    async def close(self):
+        await self._to_thread(self.store.close)
@@ -0,0 +1,210 @@
+# src/vectors.py
+"""
+Local turn vectors for semantic recall (no embedding API, NumPy only).
+- embed(): signed feature hashing of words and character trigrams into DIM floats,
+  L2-normalized. Trigrams make "trading"/"trader"/"trades" close without a model;
+  any callable str -> unit float32 vector can be used instead (of any fixed length;
+  SemanticIndex takes that length as its dim).
+- Vectors are stored per turn as a BLOB: int8 codes plus a float32 scale ("int8",
+  DIM + 4 bytes) or raw float32 ("float32", 4 * DIM bytes).
+- SemanticIndex keeps one index per conversation in memory, loaded from its BLOBs
+  the first time that conversation is searched. Small conversations are scanned
+  exactly; from IVF_MIN vectors on, an IVF (spherical k-means) limits a query to the
+  nprobe closest cells. New turns go to a small exact-scanned tail that is merged into
+  the cells from time to time. Nothing of the index is persisted: each process pays
+  the load (and IVF training) once per conversation it searches.
+"""
+
+from __future__ import annotations
+import re
+import zlib
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+DIM = 256              # 128 leaves too many hash collisions between short texts
+CODECS = ("int8", "float32")
+TRIGRAM_WEIGHT = 0.5   # relative to a whole-word feature
+MIN_WORD = 3           # shorter words ("I", "my", "to") only add hash noise
+IVF_MIN = 20000        # conversations below this many vectors are scanned exactly
+NPROBE = 8
+KMEANS_ITERS = 8
+KMEANS_SAMPLE = 64     # training vectors per cell
+TAIL_MERGE = 4096      # tail size that triggers a merge into the main arrays
+
+Embedder = Callable[[str], np.ndarray]
+
+def _features(text: str) -> List[Tuple[str, float]]:
+    out = []
+    for w in re.findall(r"\w+", text.lower()):
+        if len(w) < MIN_WORD:
+            continue
+        out.append((w, 1.0))
+        padded = f"#{w}#"
+        out.extend((padded[i:i + 3], TRIGRAM_WEIGHT) for i in range(len(padded) - 2))
+    return out
+
+def embed(text: str, dim: int = DIM) -> np.ndarray:
+    slots, weights = [], []
+    for feat, weight in _features(text):
+        h = zlib.crc32(feat.encode("utf-8"))   # stable across processes, unlike hash()
+        slots.append(h % dim)
+        weights.append(weight if h & 0x80000000 else -weight)
+    vec = np.bincount(slots, weights, minlength=dim).astype(np.float32) if slots else np.zeros(dim, np.float32)
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else vec
+
+def encode(vec: np.ndarray, codec: str = "int8") -> bytes:
+    if codec == "float32":
+        return vec.astype(np.float32).tobytes()
+    scale = float(np.abs(vec).max()) / 127 or 1.0
+    return np.float32(scale).tobytes() + np.round(vec / scale).astype(np.int8).tobytes()
+
+def decode(blob: bytes, dim: int = DIM) -> Tuple[np.ndarray, float]:
+    """(int8 codes, scale); float32 BLOBs are quantized on the way in."""
+    if len(blob) == 4 * dim:
+        vec = np.frombuffer(blob, dtype=np.float32)
+        scale = float(np.abs(vec).max()) / 127 or 1.0
+        return np.round(vec / scale).astype(np.int8), scale
+    return np.frombuffer(blob, dtype=np.int8, offset=4), float(np.frombuffer(blob[:4], dtype=np.float32)[0])
+
+def _kmeans(x: np.ndarray, n_clusters: int, seed: int = 0) -> np.ndarray:
+    """Spherical Lloyd iterations on a sample; returns (n_clusters, dim) unit centroids."""
+    rng = np.random.default_rng(seed)
+    if len(x) > n_clusters * KMEANS_SAMPLE:
+        x = x[rng.choice(len(x), n_clusters * KMEANS_SAMPLE, replace=False)]
+    centroids = x[rng.choice(len(x), n_clusters, replace=False)].copy()
+    for _ in range(KMEANS_ITERS):
+        assign = np.argmax(x @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        empty = np.bincount(assign, minlength=n_clusters) == 0
+        sums[empty] = x[rng.choice(len(x), int(empty.sum()))]   # reseed empty cells
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.where(norms == 0, 1.0, norms)
+    return centroids.astype(np.float32)
+
+def _assign(centroids: np.ndarray, codes: np.ndarray, batch: int = 65536) -> np.ndarray:
+    return np.concatenate([np.argmax(codes[i:i + batch].astype(np.float32) @ centroids.T, axis=1)
+                           for i in range(0, len(codes), batch)]) if len(codes) else np.empty(0, np.int64)
+
+class _Partition:
+    """Vectors of one conversation: main arrays (grouped by IVF cell) plus a tail."""
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.ids = np.empty(0, np.int64)
+        self.codes = np.empty((0, dim), np.int8)
+        self.scales = np.empty(0, np.float32)
+        self.centroids: Optional[np.ndarray] = None   # None: exact scan
+        self.cells = np.empty(0, np.int64)             # IVF cell of each main row (sorted)
+        self.list_ptr: Optional[np.ndarray] = None
+        self.trained_on = 0
+        self.tail: List[Tuple[int, np.ndarray, float]] = []
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.tail)
+
+    def extend(self, ids: np.ndarray, codes: np.ndarray, scales: np.ndarray):
+        """Merge new rows into the main arrays; (re)train the IVF when the size doubles."""
+        n = len(self.ids) + len(ids)
+        if self.centroids is not None and n <= 2 * self.trained_on:
+            cells = np.concatenate([self.cells, _assign(self.centroids, codes)])   # only new rows
+        ids = np.concatenate([self.ids, ids])
+        codes = np.concatenate([self.codes, codes])
+        scales = np.concatenate([self.scales, scales])
+        if n < IVF_MIN:
+            self.ids, self.codes, self.scales, self.centroids = ids, codes, scales, None
+            return
+        if self.centroids is None or n > 2 * self.trained_on:
+            nlist = int(np.sqrt(n) / 2)   # ~2 * sqrt(n) vectors per cell
+            sample = codes[np.random.default_rng(0).choice(n, min(n, nlist * KMEANS_SAMPLE), replace=False)]
+            self.centroids = _kmeans(sample.astype(np.float32), nlist)
+            self.trained_on = n
+            cells = _assign(self.centroids, codes)
+        order = np.argsort(cells, kind="stable")
+        self.cells = cells[order]
+        self.list_ptr = np.searchsorted(self.cells, np.arange(len(self.centroids) + 1))
+        self.ids, self.codes, self.scales = ids[order], codes[order], scales[order]
+
+    def flush_tail(self):
+        if self.tail:
+            tail, self.tail = self.tail, []
+            self.extend(np.array([t[0] for t in tail], np.int64), np.stack([t[1] for t in tail]),
+                        np.array([t[2] for t in tail], np.float32))
+
+    def search(self, q: np.ndarray, k: int, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self.centroids is None:
+            ids, codes, scales = self.ids, self.codes, self.scales
+        else:
+            cells = np.argsort(-(self.centroids @ q))[:nprobe]
+            rows = np.concatenate([np.arange(self.list_ptr[c], self.list_ptr[c + 1]) for c in cells])
+            ids, codes, scales = self.ids[rows], self.codes[rows], self.scales[rows]
+        if self.tail:
+            ids = np.concatenate([ids, [t[0] for t in self.tail]])
+            codes = np.concatenate([codes, np.stack([t[1] for t in self.tail])])
+            scales = np.concatenate([scales, [t[2] for t in self.tail]])
+        scores = (codes.astype(np.float32) @ q) * scales
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+            ids, scores = ids[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return ids[order], scores[order]
+
+class SemanticIndex:
+    """Per-conversation vector indexes; thread-safe (one lock around all of them)."""
+    def __init__(self, dim: int = DIM, nprobe: int = NPROBE):
+        self.dim = dim
+        self.nprobe = nprobe
+        self.parts: Dict[str, _Partition] = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Tuple[int, str, bytes]], dim: int = DIM, nprobe: int = NPROBE) -> "SemanticIndex":
+        """rows: (turn id, conversation_id, vec BLOB), e.g. straight from SQLite."""
+        index = cls(dim, nprobe)
+        groups: Dict[str, List[Tuple[int, bytes]]] = {}
+        for tid, conv, blob in rows:
+            groups.setdefault(conv, []).append((tid, blob))
+        for conv, items in groups.items():
+            index.load(conv, items)
+        return index
+
+    def load(self, conversation_id: str, rows: Sequence[Tuple[int, bytes]]):
+        """(Re)build one conversation's index from its (turn id, vec BLOB) rows."""
+        blobs = [b for _, b in rows]
+        dim = self.dim
+        if all(len(b) == dim + 4 for b in blobs):   # int8: decode the whole group at once
+            raw = np.frombuffer(b"".join(blobs), dtype=np.uint8).reshape(len(blobs), dim + 4)
+            codes, scales = raw[:, 4:].view(np.int8), raw[:, :4].copy().view(np.float32).ravel()
+        else:
+            decoded = [decode(b, dim) for b in blobs]
+            codes, scales = np.stack([c for c, _ in decoded]), np.array([s for _, s in decoded], np.float32)
+        part = _Partition(dim)
+        part.extend(np.array([t for t, _ in rows], np.int64), codes, scales)
+        with self.lock:
+            self.parts[conversation_id] = part
+
+    def __contains__(self, conversation_id: str) -> bool:
+        return conversation_id in self.parts
+
+    def add(self, tid: int, conversation_id: str, blob: bytes):
+        """Add one vector to a loaded conversation; others pick it up when they are loaded."""
+        codes, scale = decode(blob, self.dim)
+        with self.lock:
+            part = self.parts.get(conversation_id)
+            if part is None:
+                return
+            part.tail.append((tid, codes, scale))
+            if len(part.tail) >= TAIL_MERGE:
+                part.flush_tail()
+
+    def search(self, q: np.ndarray, conversation_id: str, k: int) -> List[Tuple[int, float]]:
+        with self.lock:
+            part = self.parts.get(conversation_id)
+            if part is None or not len(part):
+                return []
+            ids, scores = part.search(q.astype(np.float32), k, self.nprobe)
+        return [(int(i), float(s)) for i, s in zip(ids, scores)]
+
+    def __len__(self) -> int:
+        return sum(len(p) for p in self.parts.values())
@@ -0,0 +1,71 @@
+# tests/test_compaction.py
+import os
+from datetime import datetime, timedelta
+from src.memory import MemoryStore
+from src.compaction import compact, compact_step
+
+def _backdate(m, ts_by_id):
+    m.conn.executemany("UPDATE turns SET ts = ? WHERE id = ?", [(ts, i) for i, ts in ts_by_id.items()])
+    m.conn.commit()
+
+def test_folds_sessions_days_and_months(tmp_path):
+    m = MemoryStore(os.path.join(str(tmp_path), "mem.db"))
+    m.add_interactions([(f"Fact number {i}. More detail.", f"reply {i}") for i in range(6)] + [("fresh", "turn")])
+    now = datetime(2026, 3, 15, 12, 0)
+    stamps = ["2026-01-10T09:00:00", "2026-01-10T09:10:00",   # session A, Jan 10
+              "2026-01-10T15:00:00", "2026-01-10T15:05:00",   # session B, Jan 10
+              "2026-02-02T08:00:00", "2026-02-02T08:01:00",   # Feb 2
+              "2026-02-20T08:00:00", "2026-02-20T08:01:00",
+              "2026-03-01T08:00:00", "2026-03-01T08:01:00",   # March: day done, month open
+              "2026-03-05T08:00:00", "2026-03-05T08:01:00",
+              "2026-03-14T08:00:00", "2026-03-14T08:01:00"]   # within keep_days: stays raw
+    _backdate(m, {i + 1: ts for i, ts in enumerate(stamps)})
+
+    assert compact_step(m, now=now)                           # one session per step
+    assert m.conn.execute("SELECT COUNT(*) FROM turns_archive").fetchone()[0] == 2
+    compact(m, now=now)
+    assert not compact_step(m, now=now)
+
+    assert [t.text for t in m.recall_recent(10)] == ["fresh", "turn"]
+    assert m.recall_keywords("Fact") == []                    # archived turns leave FTS
+    top = [(s.level, s.period) for s in m.recall_summaries(10)]
+    assert top == [("month", "2026-01"), ("month", "2026-02"), ("day", "2026-03-01"), ("day", "2026-03-05")]
+    assert "Fact number 0." in m.recall_summaries(10)[0].text
+    assert m.conn.execute("SELECT COUNT(*) FROM turns_archive").fetchone()[0] == 12
+    m.close()
+
+def test_budget_stops_and_resumes(tmp_path):
+    m = MemoryStore(os.path.join(str(tmp_path), "mem.db"))
+    m.add_interactions([(f"note {i}", "ok") for i in range(5)])
+    base = datetime(2026, 1, 1)
+    _backdate(m, {i: (base + timedelta(hours=i)).isoformat() for i in range(1, 11)})
+    now = datetime(2026, 3, 1)
+    assert compact(m, budget=1e-9, now=now) == 1
+    assert compact(m, now=now) > 0
+    assert m.count() == 0
+    m.close()
+
+def test_conversations_compact_separately(tmp_path):
+    m = MemoryStore(os.path.join(str(tmp_path), "mem.db"))
+    alice, bob = m.session("alice", "s1"), m.session("bob")
+    alice.add_interaction("Alice fact.", "ok")
+    bob.add_interaction("Bob fact.", "ok")                     # interleaved ids, same minute
+    m.session("alice", "s2").add_interaction("Alice later.", "ok")
+    _backdate(m, {i: "2026-01-10T09:00:00" for i in range(1, 7)})
+    now = datetime(2026, 3, 1)
+    assert compact_step(m, now=now)
+    assert [r[0] for r in m.conn.execute("SELECT id FROM turns_archive ORDER BY id")] == [1, 2]
+    compact(m, now=now)
+    assert m.count() == 0
+    assert [s.text for s in bob.recall_summaries()] == ["Bob fact."]
+    assert "Alice later." in alice.recall_summaries()[0].text and "Bob" not in alice.recall_summaries()[0].text
+    m.close()
+
+def test_oldest_turn_probe_uses_the_ts_index(tmp_path):
+    m = MemoryStore(os.path.join(str(tmp_path), "mem.db"))
+    m.add_interactions([(f"recent {i}", "ok") for i in range(50)])   # nothing old enough to fold
+    plan = m.conn.execute("EXPLAIN QUERY PLAN SELECT conversation_id FROM turns WHERE ts < ? "
+                          "ORDER BY ts, id LIMIT 1", ("2026-01-01",)).fetchall()
+    assert "turns_ts" in " ".join(r[-1] for r in plan)
+    assert not compact_step(m, now=datetime(2026, 1, 1))
+    m.close()
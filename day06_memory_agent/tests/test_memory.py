@@ -1,5 +1,6 @@
 # tests/test_memory.py
 import os
+import time
 import tempfile
 from src.memory import MemoryStore
 
@@ -23,3 +24,236 @@ def test_keyword_search_like():
         hits = m.recall_keywords("lists", limit=5)
         assert any("lists" in t.text.lower() for t in hits)
         m.close()
+
+def test_bulk_and_write_behind():
+    with tempfile.TemporaryDirectory() as d:
+        db = os.path.join(d, "mem.db")
+        m = MemoryStore(db, journal_mode="wal", synchronous="normal", write_behind=True,
+                        flush_size=3, flush_interval=60)
+        m.add_interaction("first", "one")
+        m.add_interaction("second", "two")
+        other = MemoryStore(db)
+        assert other.count() == 0          # still queued
+        m.add_interaction("third", "three")
+        assert other.count() == 6          # size threshold flushed one transaction
+        m.add_interaction("fourth", "four")
+        m.add_interactions([("fifth", "five"), ("sixth", "six")])
+        assert [t.text for t in m.recall_recent(4)] == ["fifth", "five", "sixth", "six"]
+        m.add_interaction("seventh", "seven")
+        m.close()                          # close flushes the queue
+        assert other.count() == 14
+        assert other.recall_recent(1)[0].text == "seven"
+
+def test_write_behind_flushes_an_idle_queue():
+    with tempfile.TemporaryDirectory() as d:
+        db = os.path.join(d, "mem.db")
+        m = MemoryStore(db, write_behind=True, flush_size=100, flush_interval=0.05)
+        other = MemoryStore(db)
+        m.add_interaction("only one", "then silence")
+        assert other.count() == 0
+        deadline = time.time() + 5
+        while other.count() < 2 and time.time() < deadline:
+            time.sleep(0.02)
+        assert other.count() == 2          # written by the timer, with no further call on m
+        assert m._queue.timer is None
+        m.close()
+        other.close()
+
+def test_legacy_db_migrates_once_and_triggers_keep_fts_in_sync():
+    import sqlite3
+    from src.memory import SCHEMA_VERSION
+    with tempfile.TemporaryDirectory() as d:
+        db = os.path.join(d, "mem.db")
+        legacy = sqlite3.connect(db)   # pre-migration layout: no triggers, no user_version
+        legacy.execute("CREATE TABLE turns (id INTEGER PRIMARY KEY AUTOINCREMENT, role TEXT NOT NULL, "
+                       "text TEXT NOT NULL, ts TEXT NOT NULL)")
+        legacy.execute("INSERT INTO turns(role, text, ts) VALUES ('user', 'old note about OANDA', 'x')")
+        legacy.commit()
+        legacy.close()
+
+        m = MemoryStore(db)
+        assert m.conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert [t.text for t in m.recall_keywords("OANDA")] == ["old note about OANDA"]
+        m.add_interaction("new note about OANDA", "ok")
+        assert len(m.recall_keywords("OANDA")) == 2
+        m.conn.execute("DELETE FROM turns WHERE text = 'old note about OANDA'")
+        m.conn.commit()
+        assert [t.text for t in m.recall_keywords("OANDA")] == ["new note about OANDA"]
+        m.close()
+
+        reopened = MemoryStore(db)     # already current: no migration work
+        assert reopened.conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert reopened.count() == 2
+        reopened.close()
+
+def test_recall_ranked_orders_dedupes_and_snippets():
+    from src.memory import HIGHLIGHT
+    with tempfile.TemporaryDirectory() as d:
+        m = MemoryStore(os.path.join(d, "mem.db"))
+        m.add_interactions([
+            ("OANDA fees and OANDA spreads compared with OANDA margin rules", "noted"),
+            ("my trading journal mentions OANDA once", "ok"),
+            ("lunch plans", "sandwich"),
+            ("my trading journal mentions OANDA once", "ok"),
+        ])
+        hits = m.recall_ranked(["oanda", "spreads", "missing"], limit=5)
+        assert [h.role for h in hits] == ["user", "user"]           # duplicate text collapsed
+        assert hits[0].text.count(HIGHLIGHT[0] + "OANDA") == 3       # snippet with highlights
+        assert hits[0].score > hits[1].score
+        assert m.recall_ranked(["oanda"], exclude_ids=[hits[0].id])[0].id != hits[0].id
+
+        old = "2000-01-01T00:00:00"
+        m.conn.execute("UPDATE turns SET ts = ? WHERE id = ?", (old, hits[0].id))
+        m.conn.commit()
+        assert m.recall_ranked(["oanda"], limit=1)[0].id != hits[0].id  # decayed below a fresh match
+
+        m.has_fts = False                                            # LIKE fallback ranks too
+        like = m.recall_ranked(["oanda", "spreads"], half_life_days=1e9, limit=2)
+        assert like[0].id == hits[0].id
+        assert HIGHLIGHT[0] + "OANDA" in like[0].text
+        m.close()
+
+def test_this_session_stays_in_its_conversation():
+    with tempfile.TemporaryDirectory() as d:
+        store = MemoryStore(os.path.join(d, "mem.db"))
+        alice, bob = store.session("alice", "2026-10-17"), store.session("bob", "2026-10-17")
+        alice.add_interaction("alice today", "ok")
+        bob.add_interaction("bob today", "ok")
+        assert [t.text for t in alice.recall_recent(10, this_session=True)] == ["alice today", "ok"]
+        assert [t.text for t in bob.recall_recent(10, this_session=True)] == ["bob today", "ok"]
+        plan = store.conn.execute("EXPLAIN QUERY PLAN SELECT id FROM turns WHERE conversation_id = ? "
+                                  "AND session_id = ? ORDER BY id DESC LIMIT 5", ("bob", "2026-10-17")).fetchall()
+        assert "turns_conversation_session" in " ".join(r[-1] for r in plan)
+        store.close()
+
+def test_sessions_are_scoped_and_pooled_store_is_thread_safe():
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from src.memory import AsyncMemoryStore
+    with tempfile.TemporaryDirectory() as d:
+        m = MemoryStore(os.path.join(d, "mem.db"), readers=2, write_behind=True, flush_size=8)
+        a1, a2, b = m.session("alice", "s1"), m.session("alice", "s2"), m.session("bob")
+        a1.add_interaction("alice likes OANDA", "noted")
+        a2.add_interaction("alice second session", "ok")
+        b.add_interaction("bob likes OANDA too", "noted")
+        assert [t.text for t in a2.recall_recent(10)] == ["alice likes OANDA", "noted", "alice second session", "ok"]
+        assert [t.text for t in a2.recall_recent(10, this_session=True)] == ["alice second session", "ok"]
+        assert [t.text for t in b.recall_keywords("OANDA")] == ["bob likes OANDA too"]
+        assert [h.text for h in a1.recall_ranked(["oanda"])] == ["alice likes **OANDA**"]
+        plan = m.conn.execute("EXPLAIN QUERY PLAN SELECT id FROM turns WHERE conversation_id = ? "
+                              "ORDER BY id DESC LIMIT 5", ("alice",)).fetchall()
+        assert "turns_conversation" in " ".join(r[-1] for r in plan)
+
+        def chat(n):
+            s = m.session(f"user{n % 4}", f"s{n}")
+            for i in range(20):
+                s.add_interaction(f"message {i}", "reply")
+                s.recall_recent(4)
+            s.close()                      # a view only flushes
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(chat, range(16)))
+        assert m.count() == 6 + 16 * 20 * 2
+        assert len(m.session("user1").recall_recent(1000)) == 4 * 20 * 2
+
+        async def run():
+            am = AsyncMemoryStore(m).session("carol")
+            await asyncio.gather(*(am.add_interaction(f"async {i}", "ok") for i in range(10)))
+            return await am.recall_recent(100)
+        assert len(asyncio.run(run())) == 20
+        m.close()
+
+def test_semantic_recall_vectors_and_incremental_index():
+    import sqlite3
+    from src import vectors
+    with tempfile.TemporaryDirectory() as d:
+        db = os.path.join(d, "mem.db")
+        assert MemoryStore(os.path.join(d, "plain.db")).embed is None       # off unless asked for
+        m = MemoryStore(db, semantic=True)
+        m.add_interactions([("I trade EURUSD with tight stops", "understood"),
+                            ("my sister visits next week", "lovely")])
+        blob = m.conn.execute("SELECT vec FROM turns WHERE id = 1").fetchone()[0]
+        assert len(blob) == vectors.DIM + 4                       # int8 codes + scale
+        hits = m.recall_semantic("what stops do I use when trading?", limit=2)
+        assert [h.id for h in hits] == [1]                        # shared stems; the rest is below min_score
+        m.add_interaction("trading journal: EURUSD long", "ok")    # goes straight into the built index
+        assert 5 in [h.id for h in m.recall_semantic("EURUSD trading", exclude_ids=[1])]
+        assert m.session("other").recall_semantic("EURUSD trading") == []
+        m.close()
+
+        plain = sqlite3.connect(db)                                # rows written without vectors are backfilled
+        plain.execute("UPDATE turns SET vec = NULL")
+        plain.commit()
+        plain.close()
+        m = MemoryStore(db, semantic=True, vector_codec="float32")
+        assert m.recall_semantic("EURUSD trading")[0].id in (1, 5)
+        assert m.conn.execute("SELECT COUNT(*) FROM turns WHERE vec IS NULL").fetchone()[0] == 0
+        m.close()
+        assert MemoryStore(db, semantic=False).recall_semantic("EURUSD") == []
+
+def test_semantic_index_loads_one_conversation_at_a_time():
+    import numpy as np
+    def embed(text):   # a custom 8-dim embedder: one slot per first letter
+        vec = np.zeros(8, np.float32)
+        vec[ord(text[0]) % 8] = 1.0
+        return vec
+    with tempfile.TemporaryDirectory() as d:
+        db = os.path.join(d, "mem.db")
+        MemoryStore(db, semantic=True).session("bob").add_interaction("bob's turn, default vectors", "ok")
+        m = MemoryStore(db, semantic=True, embed=embed)
+        alice = m.session("alice")
+        alice.add_interaction("apples", "zzz")
+        assert [h.text for h in alice.recall_semantic("avocado", min_score=0.5)] == ["apples"]
+        assert "alice" in m._semantic.index and "bob" not in m._semantic.index
+        assert [h.text for h in m.session("bob").recall_semantic("bob", min_score=0.5)] == \
+            ["bob's turn, default vectors"]                     # re-embedded at the new dimension
+        m.close()
+
+def test_vector_index_ivf_matches_exact_scan(monkeypatch):
+    import numpy as np
+    from src import vectors
+    monkeypatch.setattr(vectors, "IVF_MIN", 500)
+    monkeypatch.setattr(vectors, "TAIL_MERGE", 64)
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((2000, vectors.DIM)).astype(np.float32)
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    index = vectors.SemanticIndex.from_rows([(i, "c", vectors.encode(v)) for i, v in enumerate(x[:1000])])
+    for i in range(1000, 2000):
+        index.add(i, "c", vectors.encode(x[i]))                   # tail, merged every 64
+    part = index.parts["c"]
+    assert part.centroids is not None and len(part) == 2000
+    found = sum(index.search(x[i], "c", 1)[0][0] == i for i in range(0, 2000, 20))
+    assert found >= 95
+
+def test_pseudo_tag_turns_migrate_to_tag_index():
+    import sqlite3
+    from src.memory import MIGRATIONS, SCHEMA_VERSION, _migrate_tags
+    with tempfile.TemporaryDirectory() as d:
+        db = os.path.join(d, "mem.db")
+        old = sqlite3.connect(db)      # a v(n-1) DB written by the old agent
+        before = MIGRATIONS.index(_migrate_tags)
+        for step in MIGRATIONS[:before]:
+            step(old)
+        old.execute(f"PRAGMA user_version={before}")
+        rows = [("user", "#auto_tag oanda"), ("agent", "(auto-tag)"), ("user", "#auto_tag fees"),
+                ("agent", "(auto-tag)"), ("user", "OANDA fees are high"), ("agent", "noted"),
+                ("user", "#auto_tag oanda"), ("agent", "(auto-tag)"), ("user", "OANDA again"), ("agent", "ok")]
+        old.executemany("INSERT INTO turns(role, text, ts) VALUES (?, ?, '2026-01-01T00:00:00')", rows)
+        old.commit()
+        old.close()
+
+        m = MemoryStore(db)
+        assert m.conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert [t.text for t in m.recall_recent(10)] == ["OANDA fees are high", "noted", "OANDA again", "ok"]
+        assert m.recall_keywords("auto_tag") == []                 # gone from FTS too
+        assert m.tags_of(5) == ["fees", "oanda"]
+        assert [t.text for t in m.recall_tagged(["#OANDA"])] == ["OANDA again", "OANDA fees are high"]
+        assert [t.text for t in m.recall_tagged(["oanda", "fees"], exclude_ids=[9])] == ["OANDA fees are high"]
+
+        m.add_interaction("new fees question", "answer", tags=["Fees", "#broker", ""])
+        assert [t.role for t in m.recall_tagged(["broker"])] == ["user"]
+        assert m.tags_of(m.recall_recent(2)[0].id) == ["broker", "fees"]   # linked to the new turn's id
+        assert m.session("other").recall_tagged(["fees"]) == []
+        m.conn.execute("DELETE FROM turns WHERE id = 5")          # compaction deletes turns the same way
+        m.conn.commit()
+        assert m.conn.execute("SELECT COUNT(*) FROM turn_tags WHERE turn_id = 5").fetchone()[0] == 0
+        m.close()
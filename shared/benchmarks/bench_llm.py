@@ -0,0 +1,68 @@
+# shared/benchmarks/bench_llm.py
+"""
+End-to-end LLM call cost against a local OpenAI-compatible stub (no API key, no network).
+Usage:
+  python shared/benchmarks/bench_llm.py [--requests 300] [--distinct 60] [--latency 40] [--rate-limit-every 25]
+The stub (stub_server.py) answers after --latency ms and returns a 429
+(Retry-After: 0.05) on every Nth request. Requests cycle through --distinct prompts,
+the way repeated questions reach the agents. Modes:
+  new client per call   what day01-day06 did: OpenAI() per run, SDK retries
+  shared, cache off     one LLMClient: pooled connection, backoff on 429
+  shared, cache cold    + response cache, starting empty
+  shared, cache warm    + the same cache file again (a second run of the same prompts)
+Reported: wall time, calls/s, p50/p99 latency, TCP connections and upstream requests.
+"""
+
+import os, sys, time, argparse, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.llm import LLMClient, ResponseCache
+from shared.tracing import percentile
+from stub_server import Stub
+
+def _run(call, prompts):
+    times = []
+    t0 = time.perf_counter()
+    for p in prompts:
+        t = time.perf_counter()
+        call([{"role": "user", "content": p}])
+        times.append((time.perf_counter() - t) * 1000)
+    return time.perf_counter() - t0, times
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--distinct", type=int, default=60, help="distinct prompts cycled through")
+    parser.add_argument("--latency", type=float, default=40, help="stub response time, ms")
+    parser.add_argument("--rate-limit-every", type=int, default=25, help="every Nth request gets a 429 (0: never)")
+    args = parser.parse_args()
+    from openai import OpenAI
+
+    stub = Stub(args.latency / 1000, args.rate_limit_every).start()
+    base_url = stub.base_url
+    prompts = [f"question {i % args.distinct}: what does this config option do?" for i in range(args.requests)]
+
+    def per_call(messages):
+        client = OpenAI(api_key="stub", base_url=base_url)
+        return client.chat.completions.create(model="gpt-4o-mini", messages=messages).choices[0].message.content
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "llm.db")
+        modes = [
+            ("new client per call", per_call),
+            ("shared, cache off", LLMClient(None, None, api_key="stub", base_url=base_url).chat),
+            ("shared, cache cold", LLMClient(None, ResponseCache(path), api_key="stub", base_url=base_url).chat),
+            ("shared, cache warm", LLMClient(None, ResponseCache(path), api_key="stub", base_url=base_url).chat),
+        ]
+        print(f"{args.requests} calls, {args.distinct} distinct prompts, stub latency {args.latency:g} ms, "
+              f"429 every {args.rate_limit_every or 'never'}")
+        print(f"{'':<22} {'wall s':>7} {'calls/s':>8} {'p50 ms':>7} {'p99 ms':>7} {'conns':>6} {'upstream':>9}")
+        for label, call in modes:
+            stub.requests = stub.connections = 0
+            secs, times = _run(call, prompts)
+            print(f"{label:<22} {secs:>7.2f} {args.requests / secs:>8.1f} {percentile(times, 50):>7.2f} "
+                  f"{percentile(times, 99):>7.2f} {stub.connections:>6} {stub.requests:>9}")
+    stub.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# shared/benchmarks/bench_startup.py
+"""
+Cold-start budgets for the agent entry points, against the local stub (no API key).
+Usage:
+  python shared/benchmarks/bench_startup.py [--runs 7] [--slack 1.0]
+Each path below is run --runs times as a fresh `python src/agent.py ...` process
+(response cache off, stub answering at once) and its median wall time is compared
+with the median of `python -c pass` plus the path's budget (times --slack, for slower
+machines). One extra run under -X importtime checks that modules the path must not
+need are not imported. Exits 1 if any path is over budget or imports one of them.
+day05 is skipped when it has no index (python day05_knowledge_agent/src/ingest.py);
+day06 is left out because every run writes a turn to its memory.db.
+"""
+
+import os, sys, time, argparse, statistics, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+from shared.startup import parse_importtime
+from stub_server import Stub
+
+PROMPT = "What is a list?\n"   # stdin, for agents that ask for input
+# label, script, args, budget (ms over a bare interpreter), modules it must not import
+PATHS = [
+    ("day01 LLM", "day01_hello_agent/src/agent.py", [], 1500, ["sklearn", "numpy", "pypdf"]),
+    ("day03 LLM", "day03_cli_agent/src/agent.py", ["What is a list?"], 1500, ["sklearn", "numpy", "pypdf"]),
+    ("day04 math", "day04_calculator_agent/src/agent.py", ["2+3"], 60,
+     ["shared.llm", "openai", "httpx", "dotenv", "asyncio"]),
+    ("day04 LLM", "day04_calculator_agent/src/agent.py", ["tell me a joke"], 1500, ["sklearn", "numpy"]),
+    ("day05 RAG", "day05_knowledge_agent/src/agent.py", ["--no-cache", "--no-stream", "standpipe outlet spacing"],
+     2000, ["sklearn", "pypdf"]),
+    ("day05 no hit", "day05_knowledge_agent/src/agent.py", ["--no-cache", "zzyzx qwxv"], 400,
+     ["sklearn", "pypdf", "shared.llm", "openai", "urllib.request"]),   # probe for server.py, retrieval, no LLM call
+]
+
+def _env(stub: Stub) -> dict:
+    env = dict(os.environ, OPENAI_BASE_URL=stub.base_url, OPENAI_API_KEY="stub", LLM_CACHE="off",
+               LLM_STREAM="off", DAY05_SERVER="127.0.0.1:9")   # discard port: no server.py to forward to
+    env.pop("PYTHONPATH", None)
+    return env
+
+def _time(cmd, env, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        proc = subprocess.run(cmd, env=env, input=PROMPT, capture_output=True, text=True)
+        times.append((time.perf_counter() - t0) * 1000)
+        if proc.returncode:
+            raise RuntimeError(f"{' '.join(cmd)} exited {proc.returncode}:\n{proc.stderr[-2000:]}")
+    return statistics.median(times)
+
+def _imported(cmd, env) -> set:
+    proc = subprocess.run([cmd[0], "-X", "importtime", *cmd[1:]], env=env, input=PROMPT,
+                          capture_output=True, text=True)
+    return {name for name, _, _ in parse_importtime(proc.stderr)[0]}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--slack", type=float, default=1.0, help="multiplier for every budget")
+    args = parser.parse_args()
+    stub = Stub(0).start()
+    env = _env(stub)
+    base = _time([sys.executable, "-c", "pass"], env, args.runs)
+
+    print(f"median of {args.runs} runs; interpreter alone {base:.0f} ms")
+    print(f"{'path':<12} {'ms':>7} {'over':>7} {'budget':>7}  result")
+    failed = False
+    for label, script, argv, budget, forbidden in PATHS:
+        if label.startswith("day05") and not os.path.exists(os.path.join(ROOT, "day05_knowledge_agent", "tfidf.index")):
+            print(f"{label:<12} {'':>7} {'':>7} {'':>7}  skipped (no index)")
+            continue
+        cmd = [sys.executable, os.path.join(ROOT, script), *argv]
+        ms = _time(cmd, env, args.runs)
+        imported = _imported(cmd, env)
+        bad = sorted(m for m in forbidden if m in imported)
+        over = ms - base
+        problems = (["over budget"] if over > budget * args.slack else []) + [f"imports {m}" for m in bad]
+        failed |= bool(problems)
+        print(f"{label:<12} {ms:>7.0f} {over:>7.0f} {budget * args.slack:>7.0f}  {', '.join(problems) or 'ok'}")
+    stub.shutdown()
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# shared/benchmarks/bench_stream.py
+"""
+Time to first token vs total latency, whole replies vs streaming, against the local stub.
+Usage:
+  python shared/benchmarks/bench_stream.py [--calls 10] [--latency 200] [--tokens 150] [--token-ms 10]
+The stub (stub_server.py) waits --latency ms before the first token, then sends
+--tokens more at --token-ms intervals. Modes (response cache off, except the last):
+  whole reply      chat() without on_token: nothing to show until the reply is complete
+  streamed         chat(on_token=...): first piece as soon as the stub sends it
+  streamed, cached the same prompt again with the cache on (one piece, from SQLite)
+"Time to first token" is when the agent could first print something.
+"""
+
+import os, sys, time, argparse, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.llm import LLMClient, ResponseCache
+from shared.tracing import percentile
+from stub_server import Stub
+
+def _measure(llm: LLMClient, calls: int, stream: bool, prompt=None):
+    first, total = [], []
+    for i in range(calls):
+        seen = []
+        t0 = time.perf_counter()
+        on_token = (lambda piece: seen.append(time.perf_counter()) if not seen else None) if stream else None
+        llm.chat([{"role": "user", "content": prompt or f"question {i}"}], on_token=on_token)
+        end = time.perf_counter()
+        first.append(((seen[0] if seen else end) - t0) * 1000)
+        total.append((end - t0) * 1000)
+    return first, total
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=200, help="ms before the first token")
+    parser.add_argument("--tokens", type=int, default=150, help="tokens after the first")
+    parser.add_argument("--token-ms", type=float, default=10, help="ms between tokens")
+    args = parser.parse_args()
+    stub = Stub(args.latency / 1000, tokens=args.tokens, token_delay=args.token_ms / 1000).start()
+    llm = LLMClient(None, None, api_key="stub", base_url=stub.base_url)
+    llm.chat([{"role": "user", "content": "warm-up"}])   # connection and SDK import out of the way
+
+    with tempfile.TemporaryDirectory() as d:
+        cached = LLMClient(None, ResponseCache(os.path.join(d, "llm.db")), api_key="stub", base_url=stub.base_url)
+        cached.chat([{"role": "user", "content": "repeat"}])
+        rows = [
+            ("whole reply", _measure(llm, args.calls, stream=False)),
+            ("streamed", _measure(llm, args.calls, stream=True)),
+            ("streamed, cached", _measure(cached, args.calls, stream=True, prompt="repeat")),
+        ]
+        cached.cache.close()
+    print(f"{args.calls} calls; stub: {args.latency:g} ms to first token, then {args.tokens} tokens "
+          f"every {args.token_ms:g} ms")
+    print(f"{'':<18} {'first token p50':>16} {'p99':>8} {'total p50':>10} {'p99':>8}  (ms)")
+    for label, (first, total) in rows:
+        print(f"{label:<18} {percentile(first, 50):>16.1f} {percentile(first, 99):>8.1f} "
+              f"{percentile(total, 50):>10.1f} {percentile(total, 99):>8.1f}")
+    stub.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# shared/benchmarks/bench_tracing.py
+"""
+Cost of one span (shared/tracing.py), per mode:
+  no span          the bare loop body, for reference
+  disabled         span() while tracing is off (the default): returns the shared no-op
+  metrics          configure(metrics=True): histograms and counters only (server.py)
+  trace file       configure(path): one JSON line per span, plus metrics
+Usage:
+  python shared/benchmarks/bench_tracing.py [--spans 200000]
+A traced answer has about 10 spans, so multiply by 10 for the cost per question.
+"""
+
+import os, sys, time, argparse, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared import tracing
+
+def _loop(n: int, traced: bool) -> float:
+    span = tracing.span
+    t0 = time.perf_counter()
+    if traced:
+        for i in range(n):
+            with span("retrieve", k=5) as s:
+                s.set(cache="miss")
+    else:
+        for i in range(n):
+            pass
+    return (time.perf_counter() - t0) / n * 1e9
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--spans", type=int, default=200000)
+    args = parser.parse_args()
+    tracing.configure()
+    rows = [("no span", _loop(args.spans, False)), ("disabled", _loop(args.spans, True))]
+    tracing.configure(metrics=True)
+    rows.append(("metrics", _loop(args.spans, True)))
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "trace.jsonl")
+        tracing.configure(path, metrics=True)
+        rows.append(("trace file", _loop(args.spans, True)))
+        tracing.configure()
+        size = os.path.getsize(path)
+    print(f"{args.spans} spans; trace file {size / args.spans:.0f} bytes per span")
+    print(f"{'mode':<12} {'ns/span':>9}")
+    for label, ns in rows:
+        print(f"{label:<12} {ns:>9.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# shared/benchmarks/stub_server.py
+"""
+Local OpenAI-compatible stub for the benchmarks (no API key, no network).
+- POST /v1/chat/completions answers "Answer to: <last message>" plus `tokens` filler words.
+- latency: seconds before the first token; token_delay: seconds between tokens, so a
+  whole answer takes latency + tokens * token_delay, streamed or not.
+- stream=true is answered as server-sent events, one chat.completion.chunk per token,
+  plus a usage chunk when stream_options.include_usage is set.
+- Every rate_limit_every-th request gets a 429 with Retry-After: 0.05.
+- Counts requests and TCP connections (keep-alive is on).
+"""
+
+import json, time, socket, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class Stub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.04, rate_limit_every: int = 0, tokens: int = 0, token_delay: float = 0.0):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.tokens = tokens
+        self.token_delay = token_delay
+        self.requests = self.connections = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def start(self) -> "Stub":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, so pooling is visible
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)   # headers and body are two writes
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: dict, headers=()):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in headers:
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, n: int, model: str, pieces, include_usage: bool = False):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(data: str):
+            payload = f"data: {data}\n\n".encode()
+            self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+            self.wfile.flush()
+
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(self.server.token_delay)
+            event(json.dumps({"id": f"chatcmpl-{n}", "object": "chat.completion.chunk", "created": int(time.time()),
+                              "model": model, "choices": [{"index": 0, "delta": {"content": piece},
+                                                           "finish_reason": None}]}))
+        if include_usage:
+            event(json.dumps({"id": f"chatcmpl-{n}", "object": "chat.completion.chunk", "created": int(time.time()),
+                              "model": model, "choices": [], "usage": {"prompt_tokens": 10, "completion_tokens": len(pieces),
+                                                                       "total_tokens": 10 + len(pieces)}}))
+        event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.requests += 1
+            n = self.server.requests
+        if self.server.rate_limit_every and n % self.server.rate_limit_every == 0:
+            return self._send(429, {"error": {"message": "rate limited", "type": "rate_limit_error"}},
+                              [("Retry-After", "0.05")])
+        time.sleep(self.server.latency)
+        pieces = ["Answer to: " + request["messages"][-1]["content"]] + [f" word{i}" for i in range(self.server.tokens)]
+        if request.get("stream"):
+            return self._stream(n, request["model"], pieces, (request.get("stream_options") or {}).get("include_usage"))
+        time.sleep(self.server.token_delay * (len(pieces) - 1))
+        self._send(200, {
+            "id": f"chatcmpl-{n}", "object": "chat.completion", "created": int(time.time()), "model": request["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "".join(pieces)}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": len(pieces), "total_tokens": 10 + len(pieces)},
+        })
@@ -0,0 +1,266 @@
+# shared/llm.py
+"""
+One LLM client layer for every agent (day01-day06 import it from the repo root).
+- get_client() returns a process-wide LLMClient: one OpenAI client, so one pooled
+  HTTP connection (keep-alive) instead of a new client and TLS handshake per call.
+- chat(messages, model=..., **params) returns the reply text. Responses are cached
+  on disk, content-addressed by SHA-256 of (model, messages, params); cache=False
+  skips the cache for one call, LLM_CACHE=off for the whole process.
+- The cache is one SQLite file bounded to max_bytes; least recently used entries
+  are evicted first. Safe to share between threads and processes.
+- Rate limits (429), 5xx and connection errors are retried with exponential
+  backoff and jitter; a Retry-After header is honoured. The SDK's own retries are off.
+- chat(..., on_token=fn) streams (stream=True): fn gets each piece of text as it
+  arrives and chat still returns the whole reply, which is what gets cached. A cache
+  hit is passed to fn in one piece. StreamPrinter writes the pieces to the terminal.
+- openai is imported on the first cache miss, so cached answers never load it.
+- Every chat() is an "llm.chat" span (tracing.py): cache hit/miss, token usage,
+  retries and, when streaming, time to first token.
+
+Environment:
+  LLM_CACHE=path|off      cache file (default: llm_cache.db in the repo root)
+  LLM_CACHE_MB=64         cache size bound
+  LLM_STREAM=off          StreamPrinter prints whole replies instead of streaming
+  OPENAI_API_KEY / OPENAI_BASE_URL as usual
+"""
+
+from __future__ import annotations
+import os, sys, json, time, random, sqlite3, hashlib, threading
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional, TextIO
+
+from . import tracing
+
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "llm_cache.db")
+CACHE_MB = 64
+EVICT_TO = 0.9          # evict down to 90% of max_bytes, not one entry per put
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5      # seconds before the first retry, doubled each time
+BACKOFF_MAX = 20.0
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+def cache_key(model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    """Same request, same key: canonical JSON (sorted keys) of everything sent."""
+    body = json.dumps({"model": model, "messages": messages, "params": params},
+                      sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+@dataclass
+class LLMStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    retries: int = 0       # backoff sleeps after a retryable error
+    calls: int = 0         # requests sent upstream (including retried ones)
+
+class ResponseCache:
+    """Reply text by cache_key, in SQLite; LRU by last use, bounded in bytes."""
+    def __init__(self, path: str = DEFAULT_CACHE, max_bytes: int = CACHE_MB * 2**20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS responses(key TEXT PRIMARY KEY, text TEXT NOT NULL, "
+                          "size INTEGER NOT NULL, used REAL NOT NULL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses(used)")
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.conn.execute("SELECT text FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.conn.execute("UPDATE responses SET used = ? WHERE key = ?", (time.time(), key))
+        return row[0] if row else None
+
+    def put(self, key: str, text: str) -> int:
+        """Store text; returns how many entries were evicted to stay within max_bytes."""
+        size = len(key) + len(text.encode("utf-8"))
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO responses(key, text, size, used) VALUES (?, ?, ?, ?)",
+                              (key, text, size, time.time()))
+            total = self.conn.execute("SELECT total(size) FROM responses").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            evict = []
+            for old, old_size in self.conn.execute("SELECT key, size FROM responses ORDER BY used"):
+                if total <= self.max_bytes * EVICT_TO:
+                    break
+                evict.append((old,))
+                total -= old_size
+            self.conn.executemany("DELETE FROM responses WHERE key = ?", evict)
+            return len(evict)
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT count(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+def _retryable(e: Exception) -> bool:
+    if getattr(e, "status_code", None) in RETRY_STATUS:
+        return True
+    try:
+        import openai
+    except ImportError:
+        return False
+    return isinstance(e, openai.APIConnectionError)   # includes timeouts
+
+def _retry_after(e: Exception) -> Optional[float]:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class LLMClient:
+    """
+    Cached, retrying chat completions. client: an OpenAI() (created on first use if
+    None) or anything with .chat.completions.create; cache: a ResponseCache or None.
+    """
+    def __init__(self, client=None, cache: Optional[ResponseCache] = None, model: str = DEFAULT_MODEL,
+                 max_retries: int = MAX_RETRIES, sleep: Callable[[float], None] = time.sleep,
+                 **client_kwargs):
+        self._client = client
+        self._client_kwargs = client_kwargs
+        self._client_lock = threading.Lock()
+        self.cache = cache
+        self.model = model
+        self.max_retries = max_retries
+        self.sleep = sleep
+        self.stats = LLMStats()
+
+    @property
+    def client(self):
+        with self._client_lock:
+            if self._client is None:
+                with tracing.span("llm.client_init"):   # openai import and SSL context, once per process
+                    from openai import OpenAI
+                    kwargs = dict({"api_key": os.getenv("OPENAI_API_KEY")}, **self._client_kwargs)
+                    self._client = OpenAI(max_retries=0, **kwargs)   # backoff is done here
+            return self._client
+
+    def chat(self, messages: List[Dict[str, Any]], model: Optional[str] = None, cache: bool = True,
+             on_token: Optional[Callable[[str], None]] = None, timeout: Optional[float] = None,
+             **params) -> str:
+        """
+        Reply text for messages; extra params (temperature, max_tokens, ...) are part of
+        the key. With on_token the reply is streamed; streamed and whole replies share entries.
+        timeout (seconds per attempt) is not part of the key.
+        """
+        model = model or self.model
+        with tracing.span("llm.chat", model=model, stream=on_token is not None) as s:
+            return self._chat(s, messages, model, cache, on_token, timeout, params)
+
+    def _chat(self, s, messages, model, cache, on_token, timeout, params) -> str:
+        use = cache and self.cache is not None
+        key = cache_key(model, messages, params) if use else None
+        if use:
+            text = self.cache.get(key)
+            if text is not None:
+                self.stats.hits += 1
+                s.set(cache="hit")
+                if on_token is not None:
+                    on_token(text)
+                return text
+            self.stats.misses += 1
+            s.set(cache="miss")
+        if timeout is not None:
+            params = dict(params, timeout=timeout)
+        retries = self.stats.retries
+        if on_token is None:
+            resp = self._create(model=model, messages=messages, **params)
+            text = resp.choices[0].message.content or ""
+            usage = getattr(resp, "usage", None)
+        else:
+            # retried until the stream opens; an error mid-stream raises and nothing is cached
+            if tracing.enabled() and "stream_options" not in params:
+                params = dict(params, stream_options={"include_usage": True})   # token counts for the trace
+            pieces, usage, t0 = [], None, time.perf_counter()
+            for chunk in self._create(model=model, messages=messages, stream=True, **params):
+                piece = chunk.choices[0].delta.content if chunk.choices else None
+                if piece:
+                    if not pieces:
+                        s.set(first_token_ms=round((time.perf_counter() - t0) * 1000, 3))
+                    pieces.append(piece)
+                    on_token(piece)
+                usage = getattr(chunk, "usage", None) or usage
+            text = "".join(pieces)
+        if usage is not None:
+            s.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+        if self.stats.retries > retries:
+            s.set(retries=self.stats.retries - retries)
+        if use:
+            self.stats.evictions += self.cache.put(key, text)
+        return text
+
+    def _create(self, **request):
+        for attempt in range(self.max_retries + 1):
+            self.stats.calls += 1
+            try:
+                return self.client.chat.completions.create(**request)
+            except Exception as e:
+                if attempt == self.max_retries or not _retryable(e):
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+                self.stats.retries += 1
+                self.sleep(delay)
+
+    def stats_dict(self) -> Dict[str, Any]:
+        out = asdict(self.stats)
+        if self.cache is not None:
+            out["entries"] = len(self.cache)
+        return out
+
+class StreamPrinter:
+    """
+    on_token callback that prints a reply as it streams, after prefix; leading
+    whitespace is dropped like the .strip() of a whole reply. on_token is None when
+    streaming is off (LLM_STREAM=off), and finish() then prints the whole reply.
+    """
+    def __init__(self, prefix: str = "Agent:", enabled: Optional[bool] = None, out: Optional[TextIO] = None):
+        if enabled is None:
+            enabled = os.getenv("LLM_STREAM", "on").lower() not in ("off", "0", "no", "false")
+        self.prefix = prefix
+        self.out = out or sys.stdout
+        self.started = False
+        self.on_token = self._write if enabled else None
+
+    def _write(self, piece: str):
+        if not self.started:
+            piece = piece.lstrip()
+            if not piece:
+                return
+            self.out.write(f"{self.prefix} " if self.prefix else "")
+            self.started = True
+        self.out.write(piece)
+        self.out.flush()
+
+    def finish(self, text: str):
+        if self.started:
+            self.out.write("\n")
+        else:
+            self.out.write(f"{self.prefix} {text.strip()}\n" if self.prefix else f"{text.strip()}\n")
+        self.out.flush()
+
+_shared: Optional[LLMClient] = None
+_shared_lock = threading.Lock()
+
+def open_cache() -> Optional[ResponseCache]:
+    """ResponseCache from LLM_CACHE / LLM_CACHE_MB, or None if LLM_CACHE=off."""
+    path = os.getenv("LLM_CACHE", DEFAULT_CACHE)
+    if path.lower() in ("off", "0", "no", "false", ""):
+        return None
+    return ResponseCache(path, int(float(os.getenv("LLM_CACHE_MB", CACHE_MB)) * 2**20))
+
+def get_client() -> LLMClient:
+    """The process-wide client; every agent's LLM calls go through it."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = LLMClient(cache=open_cache())
+        return _shared
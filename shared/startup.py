@@ -0,0 +1,91 @@
+# shared/startup.py
+"""
+Cheap start-up helpers for the agent entry points (standard library only).
+- load_env(): finds the nearest .env above the calling script and loads it with
+  python-dotenv; when there is none, dotenv (~20 ms with its logging import) is skipped.
+- profile_startup(): `python src/agent.py --profile-startup ...` reruns the same command
+  under `python -X importtime` and prints where start-up time went, by top-level
+  package, and which heavy dependencies the run loaded. The command really runs,
+  so an LLM path makes its call (point OPENAI_BASE_URL at a stub to avoid that).
+- run_agent(__file__, main) is the `if __name__ == "__main__"` body of every agent: it
+  profiles the run when PROFILE_FLAG is given and calls main() otherwise.
+- stream_chat() is the agents' LLM call: the reply is printed as it arrives
+  (LLM_STREAM=off: printed whole) and returned stripped. shared.llm is imported on
+  the first call, so paths that never reach the LLM do not load it.
+"""
+
+import os, sys, time, subprocess
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+PROFILE_FLAG = "--profile-startup"
+HEAVY = ("openai", "httpx", "numpy", "scipy", "sklearn", "pypdf", "asyncio", "dotenv")   # worth reporting
+PROFILE_TOP = 12   # packages listed
+
+def load_env(script: str) -> Optional[str]:
+    """Load the nearest .env at or above script's directory; returns its path, if any."""
+    d = os.path.dirname(os.path.abspath(script))
+    while True:
+        path = os.path.join(d, ".env")
+        if os.path.isfile(path):
+            from dotenv import load_dotenv
+            load_dotenv(path)
+            return path
+        parent = os.path.dirname(d)
+        if parent == d:
+            return None
+        d = parent
+
+def run_agent(script: str, main: Callable[[], object]) -> None:
+    """Call main(), or with PROFILE_FLAG in argv rerun script under -X importtime and exit."""
+    if PROFILE_FLAG in sys.argv:
+        sys.exit(profile_startup(script))
+    main()
+
+def stream_chat(client, messages: List[dict], model: str, prefix: str = "Agent:") -> str:
+    """client.chat() printing the reply after prefix as it streams; returns the stripped reply."""
+    from .llm import StreamPrinter
+    out = StreamPrinter(prefix)
+    reply = client.chat(messages, model=model, on_token=out.on_token).strip()
+    out.finish(reply)
+    return reply
+
+def parse_importtime(stderr: str) -> Tuple[List[Tuple[str, int, int]], List[str]]:
+    """(module, self us, cumulative us) per import, plus the stderr lines that were not importtime output."""
+    imports, other = [], []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            other.append(line)
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue   # the header line
+        imports.append((parts[2].strip(), int(parts[0]), int(parts[1])))
+    return imports, other
+
+def imported_packages(imports: List[Tuple[str, int, int]]) -> Set[str]:
+    return {name.split(".")[0] for name, _, _ in imports}
+
+def profile_startup(script: str, argv: Optional[List[str]] = None, top: int = PROFILE_TOP) -> int:
+    args = [a for a in (sys.argv[1:] if argv is None else argv) if a != PROFILE_FLAG]
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", script, *args], stderr=subprocess.PIPE, text=True)
+    wall = (time.perf_counter() - t0) * 1000
+    imports, other = parse_importtime(proc.stderr)
+    if other:
+        print("\n".join(other), file=sys.stderr)
+
+    by_package: Dict[str, List[int]] = {}
+    for name, self_us, _ in imports:
+        entry = by_package.setdefault(name.split(".")[0], [0, 0])
+        entry[0] += self_us
+        entry[1] += 1
+    total = sum(s for s, _ in by_package.values())
+    print(f"\n=== Start-up profile: {os.path.basename(script)} {' '.join(args)} ===", file=sys.stderr)
+    print(f"whole run {wall:.0f} ms (interpreter, imports, work); imports {total / 1000:.1f} ms "
+          f"in {len(imports)} modules", file=sys.stderr)
+    print(f"{'package':<24} {'ms':>8} {'modules':>8}", file=sys.stderr)
+    for package, (self_us, n) in sorted(by_package.items(), key=lambda kv: -kv[1][0])[:top]:
+        print(f"{package:<24} {self_us / 1000:>8.1f} {n:>8}", file=sys.stderr)
+    loaded = [p for p in HEAVY if p in by_package]
+    print(f"heavy dependencies loaded: {', '.join(loaded) or 'none'}", file=sys.stderr)
+    return proc.returncode
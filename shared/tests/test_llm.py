@@ -0,0 +1,107 @@
+# shared/tests/test_llm.py
+import io
+from types import SimpleNamespace
+import pytest
+from shared.llm import LLMClient, ResponseCache, StreamPrinter, cache_key
+
+class RateLimited(Exception):
+    status_code = 429
+    def __init__(self, retry_after=None):
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers={"retry-after": retry_after} if retry_after else {})
+
+class FakeOpenAI:
+    """Stands in for OpenAI(): records requests, raises the queued errors first."""
+    def __init__(self, errors=()):
+        self.requests = []
+        self.errors = list(errors)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, stream=False, **request):
+        self.requests.append(request)
+        if self.errors:
+            raise self.errors.pop(0)
+        text = f"reply {len(self.requests)}"
+        if stream:
+            pieces = ["  ", *text.partition(" "), None]   # leading whitespace, then words; a None delta
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=p))]) for p in pieces]
+                        + [SimpleNamespace(choices=[])])   # usage-only chunk
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+MESSAGES = [{"role": "user", "content": "What is a list?"}]
+
+def test_cache_hits_skip_the_api_and_survive_reopening(tmp_path):
+    path = str(tmp_path / "llm.db")
+    fake = FakeOpenAI()
+    llm = LLMClient(fake, ResponseCache(path))
+    assert llm.chat(MESSAGES) == "reply 1"
+    assert llm.chat(MESSAGES) == "reply 1"
+    assert llm.chat(MESSAGES, temperature=0) == "reply 2"      # params are part of the key
+    assert llm.chat(MESSAGES, model="gpt-4o") == "reply 3"
+    assert llm.chat(MESSAGES, cache=False) == "reply 4"       # per-call opt-out
+    assert len(fake.requests) == 4
+    assert (llm.stats.hits, llm.stats.misses) == (1, 3)
+
+    again = LLMClient(FakeOpenAI(), ResponseCache(path))
+    assert again.chat(MESSAGES) == "reply 1"
+    assert again.stats.calls == 0
+
+def test_key_ignores_dict_order_but_not_content():
+    a = cache_key("m", [{"role": "user", "content": "hi"}], {"temperature": 0, "max_tokens": 5})
+    b = cache_key("m", [{"content": "hi", "role": "user"}], {"max_tokens": 5, "temperature": 0})
+    assert a == b
+    assert a != cache_key("m", [{"role": "user", "content": "hi!"}], {"temperature": 0, "max_tokens": 5})
+
+def test_cache_evicts_least_recently_used_within_max_bytes(tmp_path):
+    cache = ResponseCache(str(tmp_path / "llm.db"), max_bytes=1000)
+    for key in "abc":
+        cache.put(key * 64, "x" * 200)       # 264 bytes each
+    assert cache.get("a" * 64) is not None   # a is now the most recently used
+    evicted = cache.put("d" * 64, "x" * 200)
+    assert evicted == 1
+    assert cache.get("b" * 64) is None
+    assert cache.get("a" * 64) is not None and cache.get("d" * 64) is not None
+
+def test_rate_limits_are_retried_with_backoff():
+    sleeps = []
+    fake = FakeOpenAI([RateLimited(), RateLimited(), RateLimited(retry_after="7")])
+    llm = LLMClient(fake, None, sleep=sleeps.append)
+    assert llm.chat(MESSAGES) == "reply 4"
+    assert len(sleeps) == 3 and llm.stats.retries == 3
+    assert 0.25 <= sleeps[0] <= 0.5 and 0.5 <= sleeps[1] <= 1.0   # doubling, with jitter
+    assert sleeps[2] == 7.0                                        # Retry-After wins
+
+def test_gives_up_after_max_retries_and_never_retries_client_errors():
+    llm = LLMClient(FakeOpenAI([RateLimited()] * 3), None, max_retries=2, sleep=lambda s: None)
+    with pytest.raises(RateLimited):
+        llm.chat(MESSAGES)
+    assert llm.stats.calls == 3
+
+    bad = ValueError("400: invalid request")
+    llm = LLMClient(FakeOpenAI([bad]), None, sleep=lambda s: pytest.fail("should not retry"))
+    with pytest.raises(ValueError):
+        llm.chat(MESSAGES)
+
+def test_streaming_returns_and_caches_the_whole_reply(tmp_path):
+    llm = LLMClient(FakeOpenAI(), ResponseCache(str(tmp_path / "llm.db")))
+    pieces = []
+    assert llm.chat(MESSAGES, on_token=pieces.append) == "  reply 1"
+    assert pieces == ["  ", "reply", " ", "1"]
+    pieces.clear()
+    assert llm.chat(MESSAGES, on_token=pieces.append) == "  reply 1"   # hit: one piece
+    assert pieces == ["  reply 1"]
+    assert llm.chat(MESSAGES) == "  reply 1"                           # shared with whole replies
+
+def test_stream_printer_strips_leading_whitespace_and_can_be_off():
+    out = io.StringIO()
+    printer = StreamPrinter("Agent:", enabled=True, out=out)
+    for piece in ["\n ", " Hello", ", world"]:
+        printer.on_token(piece)
+    printer.finish("ignored")
+    assert out.getvalue() == "Agent: Hello, world\n"
+
+    out = io.StringIO()
+    printer = StreamPrinter("Agent:", enabled=False, out=out)
+    assert printer.on_token is None
+    printer.finish("  whole reply\n")
+    assert out.getvalue() == "Agent: whole reply\n"
@@ -0,0 +1,47 @@
+# shared/tests/test_startup.py
+import os, sys, subprocess
+from shared.startup import load_env, parse_importtime, imported_packages, run_agent, stream_chat
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def test_parse_importtime_splits_imports_from_other_output():
+    stderr = ("import time: self [us] | cumulative | imported package\n"
+              "import time:       120 |        120 |   numpy._core\n"
+              "import time:        80 |        200 | numpy\n"
+              "Traceback (most recent call last):\n")
+    imports, other = parse_importtime(stderr)
+    assert imports == [("numpy._core", 120, 120), ("numpy", 80, 200)]
+    assert other == ["Traceback (most recent call last):"]
+    assert imported_packages(imports) == {"numpy"}
+
+def test_load_env_finds_the_nearest_env_file(tmp_path, monkeypatch):
+    (tmp_path / ".env").write_text("STARTUP_TEST_VAR=found\n")
+    script = tmp_path / "day99" / "src" / "agent.py"
+    script.parent.mkdir(parents=True)
+    monkeypatch.delenv("STARTUP_TEST_VAR", raising=False)
+    assert load_env(str(script)) == str(tmp_path / ".env")
+    assert os.environ["STARTUP_TEST_VAR"] == "found"
+
+def test_calculator_path_does_not_import_the_llm_client():
+    proc = subprocess.run([sys.executable, "-X", "importtime",
+                           os.path.join(ROOT, "day04_calculator_agent", "src", "agent.py"), "2+3"],
+                          capture_output=True, text=True)
+    assert proc.returncode == 0 and "5" in proc.stdout
+    names = {name for name, _, _ in parse_importtime(proc.stderr)[0]}
+    assert not {"shared.llm", "openai", "dotenv"} & names
+
+def test_stream_chat_prints_and_returns_the_stripped_reply(capsys, monkeypatch):
+    class Client:
+        def chat(self, messages, model=None, on_token=None):
+            for piece in ("  Hel", "lo "):
+                on_token(piece)
+            return "  Hello "
+    monkeypatch.delenv("LLM_STREAM", raising=False)
+    assert stream_chat(Client(), [{"role": "user", "content": "hi"}], "m") == "Hello"
+    assert capsys.readouterr().out == "Agent: Hello \n"
+
+def test_run_agent_calls_main_without_the_profile_flag(monkeypatch):
+    calls = []
+    monkeypatch.setattr(sys, "argv", ["agent.py", "2+3"])
+    run_agent("agent.py", lambda: calls.append(1))
+    assert calls == [1]
@@ -0,0 +1,73 @@
+# shared/tests/test_tracing.py
+from types import SimpleNamespace
+import pytest
+from shared import tracing
+from shared.llm import LLMClient, ResponseCache
+from shared.tests.test_llm import FakeOpenAI, MESSAGES
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = str(tmp_path / "trace.jsonl")
+    tracing.configure(path, metrics=True)
+    yield path
+    tracing.configure()   # off again
+
+def test_disabled_spans_are_one_shared_no_op():
+    assert not tracing.enabled()
+    with tracing.span("retrieve", k=5) as s:
+        s.set(cache="hit")
+    assert s is tracing.NO_SPAN
+    assert tracing.render_metrics() == ""
+
+def test_spans_nest_and_record_errors(trace_file):
+    with tracing.span("query"):
+        with tracing.span("retrieve", k=5) as s:
+            s.set(cache="miss")
+        with pytest.raises(KeyError):
+            with tracing.span("format_context"):
+                raise KeyError("x")
+    records = tracing.read_trace(trace_file)
+    assert [r["name"] for r in records] == ["retrieve", "format_context", "query"]
+    retrieve, fmt, query = records
+    assert retrieve["parent"] == fmt["parent"] == query["span"] and query["parent"] is None
+    assert {r["trace"] for r in records} == {query["span"]}
+    assert retrieve["k"] == 5 and retrieve["cache"] == "miss" and fmt["error"] == "KeyError"
+
+    rows = {row["stage"]: row for row in tracing.summarize(records)}
+    assert rows["query"]["self_ms"] == pytest.approx(query["ms"] - retrieve["ms"] - fmt["ms"], abs=1e-3)
+    assert rows["retrieve"]["misses"] == 1 and rows["format_context"]["errors"] == 1
+
+def test_llm_calls_report_cache_and_tokens(trace_file, tmp_path):
+    fake = FakeOpenAI()
+    create = fake.create
+    def with_usage(**request):
+        resp = create(**request)
+        if not request.get("stream"):
+            resp.usage = SimpleNamespace(prompt_tokens=12, completion_tokens=3)
+        return resp
+    fake.chat.completions.create = with_usage
+    llm = LLMClient(fake, ResponseCache(str(tmp_path / "llm.db")))
+    llm.chat(MESSAGES)
+    llm.chat(MESSAGES)
+    llm.chat(MESSAGES, temperature=0, on_token=lambda piece: None)
+    assert fake.requests[-1]["stream_options"] == {"include_usage": True}   # only while tracing
+
+    first, second, streamed = tracing.read_trace(trace_file)
+    assert (first["cache"], first["prompt_tokens"], first["completion_tokens"]) == ("miss", 12, 3)
+    assert second["cache"] == "hit" and "prompt_tokens" not in second
+    assert streamed["stream"] is True and streamed["first_token_ms"] >= 0
+    text = tracing.render_metrics()
+    assert 'agent_stage_seconds_count{stage="llm.chat"} 3' in text
+    assert 'agent_tokens_total{stage="llm.chat",kind="prompt"} 12' in text
+    assert 'agent_cache_total{stage="llm.chat",result="hit"} 1' in text
+    assert 'agent_stage_quantile_seconds{stage="llm.chat",quantile="0.99"}' in text
+
+def test_histogram_quantiles_interpolate_within_buckets():
+    hist = tracing.Histogram((10, 20, 40))
+    for ms in [5] * 50 + [15] * 45 + [30] * 5:
+        hist.observe(ms)
+    assert hist.quantile(0.5) == pytest.approx(10.0)
+    assert hist.quantile(0.95) == pytest.approx(20.0)
+    assert 20 < hist.quantile(0.99) <= 40
+    hist.observe(1000)   # beyond the last bucket
+    assert hist.counts[-1] == 1
@@ -0,0 +1,317 @@
+# shared/tracing.py
+"""
+Per-stage tracing and latency metrics for the agents (standard library only).
+- with span("retrieve", k=5) as s: ... times one stage; s.set(cache="hit",
+  prompt_tokens=...) adds attributes. Spans nest per thread (parent ids), so a trace
+  file shows which stage ran inside which.
+- AGENT_TRACE=trace.jsonl appends one JSON line per finished span: name, ms, start
+  time, trace/span/parent ids, attributes and the exception type if it raised.
+- AGENT_METRICS=metrics.prom writes Prometheus text when the process exits: a latency
+  histogram per stage, estimated p50/p95/p99, token and cache hit/miss counters.
+  Long-running processes (day05 server.py) call configure(metrics=True) and serve
+  render_metrics() instead.
+- Disabled (the default), span() returns one shared no-op object: a global lookup
+  per stage, no clock reads, no allocation.
+
+Usage:
+  AGENT_TRACE=trace.jsonl python day05_knowledge_agent/src/agent.py "..."
+  python shared/tracing.py summary trace.jsonl      # per-stage breakdown
+  python shared/tracing.py metrics trace.jsonl      # Prometheus text from a trace file
+"""
+
+from __future__ import annotations
+import os, sys, json, time, atexit, itertools, threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TRACE_ENV = "AGENT_TRACE"        # JSONL trace file
+METRICS_ENV = "AGENT_METRICS"    # Prometheus text file, written at exit
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+QUANTILES = (0.5, 0.95, 0.99)
+TOKEN_ATTRS = ("prompt_tokens", "completion_tokens")   # summed into agent_tokens_total
+
+class _NoSpan:
+    """What span() returns while tracing is off."""
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NO_SPAN = _NoSpan()
+
+class Span:
+    __slots__ = ("tracer", "name", "attrs", "id", "parent", "trace", "start", "t0")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = self.tracer.stack()
+        self.id = self.tracer.new_id()
+        self.parent = stack[-1].id if stack else None
+        self.trace = stack[0].id if stack else self.id
+        stack.append(self)
+        self.start = time.time()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ms = (time.perf_counter() - self.t0) * 1000
+        stack = self.tracer.stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        record = {"name": self.name, "ms": round(ms, 3), "ts": round(self.start, 6), "trace": self.trace,
+                  "span": self.id, "parent": self.parent, **self.attrs}
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        self.tracer.finish(record)
+        return False
+
+class Histogram:
+    """Cumulative-bucket latency histogram (ms), Prometheus style."""
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # last: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, ms: float):
+        i = 0
+        while i < len(self.buckets) and ms > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += ms
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Linear interpolation inside the bucket holding the q-th observation (as histogram_quantile does)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lo = self.buckets[i - 1] if i else 0.0
+                return lo + (self.buckets[i] - lo) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+class Metrics:
+    """Per-stage histograms plus token and cache counters, fed with span records."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency: Dict[str, Histogram] = {}
+        self.tokens: Dict[Tuple[str, str], int] = {}
+        self.cache: Dict[Tuple[str, str], int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def observe(self, record: dict):
+        name = record["name"]
+        with self.lock:
+            hist = self.latency.get(name)
+            if hist is None:
+                hist = self.latency[name] = Histogram()
+            hist.observe(record["ms"])
+            for attr in TOKEN_ATTRS:
+                if record.get(attr):
+                    key = (name, attr.split("_")[0])
+                    self.tokens[key] = self.tokens.get(key, 0) + record[attr]
+            if record.get("cache") in ("hit", "miss"):
+                key = (name, record["cache"])
+                self.cache[key] = self.cache.get(key, 0) + 1
+            if "error" in record:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def render(self) -> str:
+        lines = ["# HELP agent_stage_seconds Time spent per stage.", "# TYPE agent_stage_seconds histogram"]
+        with self.lock:
+            for name, hist in sorted(self.latency.items()):
+                seen = 0
+                for le, n in zip(hist.buckets, hist.counts):
+                    seen += n
+                    lines.append(f'agent_stage_seconds_bucket{{stage="{name}",le="{le / 1000:g}"}} {seen}')
+                lines.append(f'agent_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {hist.count}')
+                lines.append(f'agent_stage_seconds_sum{{stage="{name}"}} {hist.sum / 1000:.6f}')
+                lines.append(f'agent_stage_seconds_count{{stage="{name}"}} {hist.count}')
+            lines += ["# HELP agent_stage_quantile_seconds p50/p95/p99 per stage, estimated from the histogram.",
+                      "# TYPE agent_stage_quantile_seconds gauge"]
+            for name, hist in sorted(self.latency.items()):
+                for q in QUANTILES:
+                    lines.append(f'agent_stage_quantile_seconds{{stage="{name}",quantile="{q:g}"}} '
+                                 f'{hist.quantile(q) / 1000:.6f}')
+            lines += ["# HELP agent_tokens_total LLM tokens per stage.", "# TYPE agent_tokens_total counter"]
+            lines += [f'agent_tokens_total{{stage="{name}",kind="{kind}"}} {n}'
+                      for (name, kind), n in sorted(self.tokens.items())]
+            lines += ["# HELP agent_cache_total Cache lookups per stage.", "# TYPE agent_cache_total counter"]
+            lines += [f'agent_cache_total{{stage="{name}",result="{result}"}} {n}'
+                      for (name, result), n in sorted(self.cache.items())]
+            lines += ["# HELP agent_stage_errors_total Stages that raised.", "# TYPE agent_stage_errors_total counter"]
+            lines += [f'agent_stage_errors_total{{stage="{name}"}} {n}' for name, n in sorted(self.errors.items())]
+        return "\n".join(lines) + "\n"
+
+class Tracer:
+    """Where finished spans go: a JSONL file, a Metrics registry, or both."""
+    def __init__(self, trace_path: Optional[str] = None, metrics: bool = False):
+        self.trace_path = trace_path
+        self.metrics = Metrics() if metrics else None
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+        self._prefix = f"{os.getpid():x}-{int(time.time() * 1000) & 0xffffff:x}"
+        self._lock = threading.Lock()
+        self._out = open(trace_path, "a", encoding="utf-8") if trace_path else None
+
+    def stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def new_id(self) -> str:
+        return f"{self._prefix}-{next(self._ids)}"
+
+    def finish(self, record: dict):
+        if self.metrics is not None:
+            self.metrics.observe(record)
+        if self._out is not None:
+            line = json.dumps(record, default=str) + "\n"
+            with self._lock:
+                self._out.write(line)
+                self._out.flush()
+
+    def close(self):
+        with self._lock:
+            if self._out is not None:
+                self._out.close()
+                self._out = None
+
+_tracer: Optional[Tracer] = None
+
+def span(name: str, **attrs):
+    """Context manager timing one stage; NO_SPAN while tracing is off."""
+    if _tracer is None:
+        return NO_SPAN
+    return Span(_tracer, name, attrs)
+
+def enabled() -> bool:
+    return _tracer is not None
+
+def configure(trace_path: Optional[str] = None, metrics: bool = False,
+              metrics_path: Optional[str] = None) -> Optional[Tracer]:
+    """
+    Replace the process tracer. metrics_path implies metrics and is written at exit.
+    With no trace_path and no metrics, tracing is off again.
+    """
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+    metrics = metrics or bool(metrics_path)
+    _tracer = Tracer(trace_path, metrics) if trace_path or metrics else None
+    atexit.unregister(write_metrics)
+    if metrics_path:
+        atexit.register(write_metrics, metrics_path)
+    return _tracer
+
+def render_metrics() -> str:
+    return _tracer.metrics.render() if _tracer is not None and _tracer.metrics is not None else ""
+
+def write_metrics(path: str):
+    text = render_metrics()
+    if text:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+def read_trace(path: str) -> List[dict]:
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue   # a line cut off by a crash
+    return records
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank q-th percentile (0-100) of raw samples; 0.0 for none. Shared by the benchmarks."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))] if values else 0.0
+
+def summarize(records: Iterable[dict]) -> List[dict]:
+    """
+    One row per stage: calls, total and self ms (minus child spans), exact p50/p95/p99,
+    cache hits/misses, tokens, errors. Sorted by self time, the stage's own cost.
+    """
+    records = list(records)
+    child_ms: Dict[str, float] = {}
+    for r in records:
+        if r.get("parent"):
+            child_ms[r["parent"]] = child_ms.get(r["parent"], 0.0) + r["ms"]
+    rows: Dict[str, dict] = {}
+    durations: Dict[str, List[float]] = {}
+    for r in records:
+        row = rows.setdefault(r["name"], {"stage": r["name"], "calls": 0, "total_ms": 0.0, "self_ms": 0.0,
+                                          "hits": 0, "misses": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                          "errors": 0})
+        row["calls"] += 1
+        row["total_ms"] += r["ms"]
+        row["self_ms"] += max(0.0, r["ms"] - child_ms.get(r.get("span"), 0.0))
+        row["hits"] += r.get("cache") == "hit"
+        row["misses"] += r.get("cache") == "miss"
+        for attr in TOKEN_ATTRS:
+            row[attr] += r.get(attr) or 0
+        row["errors"] += "error" in r
+        durations.setdefault(r["name"], []).append(r["ms"])
+    for name, row in rows.items():
+        for q in (50, 95, 99):
+            row[f"p{q}"] = percentile(durations[name], q)
+    return sorted(rows.values(), key=lambda row: -row["self_ms"])
+
+def format_summary(rows: List[dict]) -> str:
+    wall = sum(row["self_ms"] for row in rows)
+    out = [f"{'stage':<24} {'calls':>6} {'total ms':>10} {'self ms':>10} {'self %':>7} {'p50':>8} {'p95':>8} "
+           f"{'p99':>8} {'cache hit':>10} {'tokens in/out':>14} {'errors':>6}"]
+    for row in rows:
+        looked_up = row["hits"] + row["misses"]
+        hit = f"{row['hits']}/{looked_up}" if looked_up else ""
+        tokens = f"{row['prompt_tokens']}/{row['completion_tokens']}" if row["prompt_tokens"] or row["completion_tokens"] else ""
+        share = 100 * row["self_ms"] / wall if wall else 0.0
+        out.append(f"{row['stage']:<24} {row['calls']:>6} {row['total_ms']:>10.1f} {row['self_ms']:>10.1f} "
+                   f"{share:>6.1f}% {row['p50']:>8.1f} {row['p95']:>8.1f} {row['p99']:>8.1f} {hit:>10} "
+                   f"{tokens:>14} {row['errors'] or '':>6}")
+    return "\n".join(out)
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Summarize an agent trace file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("summary", help="per-stage breakdown").add_argument("trace")
+    sub.add_parser("metrics", help="Prometheus text for the spans in a trace file").add_argument("trace")
+    args = parser.parse_args(argv)
+    records = read_trace(args.trace)
+    if args.command == "summary":
+        traces = len({r.get("trace") for r in records})
+        print(f"{len(records)} spans in {traces} traces; times in ms, sorted by self time")
+        print(format_summary(summarize(records)))
+    else:
+        metrics = Metrics()
+        for r in records:
+            metrics.observe(r)
+        sys.stdout.write(metrics.render())
+
+if os.getenv(TRACE_ENV) or os.getenv(METRICS_ENV):
+    configure(os.getenv(TRACE_ENV) or None, metrics_path=os.getenv(METRICS_ENV) or None)
+
+if __name__ == "__main__":
+    main()